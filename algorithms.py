@@ -17,12 +17,23 @@ See the 'Arrival generation algorithms' and 'Elevator moving algorithsm'
 sections of the assignment handout for a complete description of each algorithm
 you are expected to implement in this file.
 """
+from collections import OrderedDict
 import csv
 from enum import Enum
+import hashlib
+import heapq
+import itertools
+import math
 import random
-from typing import Dict, List, Optional
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-from entities import Person, Elevator
+from entities import Person, Elevator, PersonPool, AnyPerson
+
+
+# The pool ArrivalGenerator.draw takes people from, and gives them back to as
+# soon as their trips have been read.
+_DRAW_POOL = PersonPool()
 
 
 ###############################################################################
@@ -37,6 +48,8 @@ class ArrivalGenerator:
                beyond this floor.
     num_people: The number of people to generate, or None if this is left
                 up to the algorithm itself.
+    person_pool: The pool new people are taken from, or None if every new
+                 person is a freshly created Person sprite.
 
     === Representation Invariants ===
     max_floor >= 2
@@ -44,6 +57,7 @@ class ArrivalGenerator:
     """
     max_floor: int
     num_people: Optional[int]
+    person_pool: Optional[PersonPool]
 
     def __init__(self, max_floor: int, num_people: Optional[int]) -> None:
         """Initialize a new ArrivalGenerator.
@@ -54,6 +68,7 @@ class ArrivalGenerator:
         """
         self.max_floor = max_floor
         self.num_people = num_people
+        self.person_pool = None
 
     def generate(self, round_num: int) -> Dict[int, List[Person]]:
         """Return the new arrivals for the simulation at the given round.
@@ -61,10 +76,68 @@ class ArrivalGenerator:
         The returned dictionary maps floor number to the people who
         arrived starting at that floor.
 
-        You can choose whether to include floors where no people arrived.
+        Only floors where at least one person arrived should be included, so
+        that a round costs time in the number of arrivals rather than the
+        number of floors. Wrap generators that include every floor in a
+        SparseArrivals.
         """
         raise NotImplementedError
 
+    def draw(self, round_num: int) -> List[Tuple[int, int]]:
+        """Return the (start, target) trips of the people arriving in the
+        given round, without creating Person sprites for them.
+
+        By default the round is generated with people taken from a private
+        PersonPool, which generators that create their people with
+        _new_person all do.
+        """
+        pool, self.person_pool = self.person_pool, _DRAW_POOL
+        try:
+            people = self.generate(round_num)
+        finally:
+            self.person_pool = pool
+        trips = []
+        for floor in people.values():
+            for person in floor:
+                trips.append((person.start, person.target))
+                _DRAW_POOL.release(person)
+        return trips
+
+    def reset(self) -> None:
+        """Rewind this generator, so that it generates its arrivals again
+        from round 0.
+
+        This does nothing for generators whose arrivals only depend on the
+        round number, or that can't be rewound (like RandomArrivals, which
+        draws from the random module).
+        """
+
+    def fingerprint(self) -> Optional[str]:
+        """Return a string that identifies the arrivals this generator
+        generates from round 0, so that two generators with the same
+        fingerprint generate the same people, or None if its arrivals can't
+        be repeated.
+
+        Generators that draw from the random module are only repeated if it
+        is seeded the same way first (see is_deterministic).
+        """
+        return None
+
+    def is_deterministic(self) -> bool:
+        """Return whether this generator generates the same arrivals from
+        round 0 every time, whatever state the random module is in.
+
+        A generator that wraps another one is only deterministic if the one
+        it wraps is. Generators are assumed not to be unless they say so.
+        """
+        return False
+
+    def _new_person(self, start: int, target: int) -> AnyPerson:
+        """Return a new arrival, taken from person_pool if there is one."""
+        if self.person_pool is None:
+            return Person(start, target)
+        return self.person_pool.acquire(start, target)
+
 
 class RandomArrivals(ArrivalGenerator):
     """Generate a fixed number of random people each round.
@@ -79,7 +152,8 @@ class RandomArrivals(ArrivalGenerator):
 
     === Attributes ===
     people: A Dictionary that has the floor number as the keys and a List of
-        people as the values
+        people as the values, for the floors people arrived on in the last
+        round
     num_floor: The number of floors int he simulation
 
     === Representation Invariants ===
@@ -104,47 +178,53 @@ class RandomArrivals(ArrivalGenerator):
     def generate(self, round_num: int) -> Dict[int, List[Person]]:
         """Refer to the Parent class
         """
-        for num in range(1, self.num_floor + 1):
-            self.people[num] = []
-        person_location = []
-        person_destination = []
-        if self.num_people == 0:
-            return self.people
-        else:
-            i = 0
-            while i < self.num_people:
-                floors = list(range(1, self.max_floor + 1))
-                location = random.sample(floors, 1)
-                person_location += location
-                floors.pop(floors.index(location[0]))
-                destination = random.sample(floors, 1)
-                person_destination += destination
-                i += 1
-            while len(person_location) > 0:
-                cur_loc = person_location[0]
-                cur_dest = person_destination[0]
-                self.people[cur_loc] += [Person(cur_loc, cur_dest)]
-                person_destination.pop(0)
-                person_location.pop(0)
-            return self.people
+        self.people = {}
+        for start, target in self.draw(round_num):
+            self.people.setdefault(start, []).append(
+                self._new_person(start, target))
+        return self.people
+
+    def draw(self, round_num: int) -> List[Tuple[int, int]]:
+        """Refer to the Parent class
+        """
+        trips = []
+        for _ in range(self.num_people or 0):
+            start = random.sample(range(1, self.max_floor + 1), 1)[0]
+            # Draw from the other floors, as if start had been taken out.
+            target = random.sample(range(1, self.max_floor), 1)[0]
+            if target >= start:
+                target += 1
+            trips.append((start, target))
+        return trips
+
+    def fingerprint(self) -> Optional[str]:
+        """Refer to the Parent class
+        """
+        return f'RandomArrivals {self.max_floor} {self.num_people}'
 
 
 class FileArrivals(ArrivalGenerator):
     """Generate arrivals from a CSV file.
 
+    The file is read and indexed by round once, when the generator is
+    created, so generating a round only takes time in the number of people
+    arriving in it.
+
     === Attributes ===
     file_content: The contents of the file are stored line by line into a list
     people: A Dictionary that has the floor number as the keys and a List of
-        people as the values
+        people as the values, for the floors people arrived on in the last
+        round
     round_number: The round number to store when people are spawned
 
     === Representation Invariants ===
     people keys are floor numbers
     round_number >= 0
     """
-    file_content: List[int]
+    file_content: List[List[str]]
     people: Dict[int, List[Person]]
     round_number: int
+    _trips: Dict[int, List[Tuple[int, int]]]
 
     def __init__(self, max_floor: int, filename: str) -> None:
         """Initialize a new FileArrivals algorithm from the given file.
@@ -152,6 +232,10 @@ class FileArrivals(ArrivalGenerator):
         The num_people attribute of every FileArrivals instance is set to None,
         since the number of arrivals depends on the given file.
 
+        Several lines may have the same round, and several people in a round
+        may start on the same floor; people arrive in the order they appear
+        in the file.
+
         Precondition:
             <filename> refers to a valid CSV file, following the specified
             format and restrictions from the assignment handout.
@@ -165,6 +249,7 @@ class FileArrivals(ArrivalGenerator):
         # We've provided some of the "reading from csv files" boilerplate code
         # for you to help you get started.
         self.file_content = []
+        self._trips = {}
         with open(filename, 'r') as csvfile:
             reader = csv.reader(csvfile)
             for line in reader:
@@ -172,28 +257,438 @@ class FileArrivals(ArrivalGenerator):
                     self.file_content.append(line)
                 else:
                     raise Exception('Incorrect number of inputs in csv file.')
+                values = list(map(int, line))
+                self._trips.setdefault(values[0], []).extend(
+                    zip(values[1::2], values[2::2]))
 
     def generate(self, round_num: int) -> Dict[int, List[Person]]:
         """Refer to the Parent Class
         """
-        for num in range(1, self.max_floor + 1):
-            self.people[num] = []
-        file = []
-        for line in self.file_content:
-            file.append(list(map(int, line)))
-        for line in file:
-            if line[0] == round_num:
-                line.pop(0)
-                for thing in line[0::2]:
-                    loc = thing
-                    dest = line[line.index(thing) + 1]
-                    self.people[thing] = [Person(loc, dest)]
-                    line.pop(0)  # remove first location
-                    line.pop(0)  # remove first destination
-            elif line[0] != round_num:
-                continue
+        self.people = {}
+        for start, target in self._trips.get(round_num, ()):
+            self.people.setdefault(start, []).append(
+                self._new_person(start, target))
         return self.people
 
+    def draw(self, round_num: int) -> List[Tuple[int, int]]:
+        """Refer to the Parent class
+        """
+        return list(self._trips.get(round_num, ()))
+
+    def fingerprint(self) -> Optional[str]:
+        """Refer to the Parent class
+        """
+        digest = hashlib.sha256(repr(self.file_content).encode()).hexdigest()
+        return f'FileArrivals {self.max_floor} {digest}'
+
+    def is_deterministic(self) -> bool:
+        """Refer to the Parent class
+        """
+        return True
+
+
+class SparseArrivals(ArrivalGenerator):
+    """Adapt a generator that includes floors where nobody arrived to the
+    sparse arrivals that generate should return.
+
+    === Attributes ===
+    generator: the generator whose arrivals are adapted
+    """
+    generator: ArrivalGenerator
+
+    def __init__(self, generator: ArrivalGenerator) -> None:
+        """Initialize an adapter of the given generator."""
+        ArrivalGenerator.__init__(self, generator.max_floor,
+                                  generator.num_people)
+        self.generator = generator
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """Refer to the Parent class
+        """
+        self.generator.person_pool = self.person_pool
+        return {floor: people for floor, people
+                in self.generator.generate(round_num).items() if people}
+
+    def draw(self, round_num: int) -> List[Tuple[int, int]]:
+        """Refer to the Parent class
+        """
+        return self.generator.draw(round_num)
+
+    def reset(self) -> None:
+        """Refer to the Parent class
+        """
+        self.generator.reset()
+
+    def fingerprint(self) -> Optional[str]:
+        """Refer to the Parent class
+        """
+        return self.generator.fingerprint()
+
+    def is_deterministic(self) -> bool:
+        """Refer to the Parent class
+        """
+        return self.generator.is_deterministic()
+
+
+class TraceTrips:
+    """The trips in a CSV arrival file (in the format FileArrivals reads), as
+    (round, start, target) tuples, read a line at a time every time they are
+    iterated over.
+
+    === Attributes ===
+    filename: the name of the file
+
+    === Representation Invariants ===
+    the rounds of the file's lines are in non-decreasing order
+    """
+    filename: str
+
+    def __init__(self, filename: str) -> None:
+        """Initialize the trips of the given file."""
+        self.filename = filename
+
+    def __iter__(self) -> Iterator[Tuple[int, int, int]]:
+        with open(self.filename, 'r') as csvfile:
+            for line in csv.reader(csvfile):
+                values = list(map(int, line))
+                for start, target in zip(values[1::2], values[2::2]):
+                    yield values[0], start, target
+
+
+class GeneratedTrips:
+    """The trips of the people a generator generates in its first num_rounds
+    rounds, as (round, start, target) tuples.
+
+    The generator is reset every time the trips are iterated over, and its
+    rounds are drawn (see ArrivalGenerator.draw), so no Person sprites are
+    created.
+
+    === Attributes ===
+    generator: the generator whose trips these are
+    num_rounds: the number of rounds drawn from the generator
+
+    === Representation Invariants ===
+    num_rounds >= 0
+    """
+    generator: ArrivalGenerator
+    num_rounds: int
+
+    def __init__(self, generator: ArrivalGenerator, num_rounds: int) -> None:
+        """Initialize the trips of the first num_rounds rounds of the given
+        generator.
+
+        Precondition: num_rounds >= 0
+        """
+        self.generator = generator
+        self.num_rounds = num_rounds
+
+    def __iter__(self) -> Iterator[Tuple[int, int, int]]:
+        self.generator.reset()
+        for round_num in range(self.num_rounds):
+            for start, target in self.generator.draw(round_num):
+                yield round_num, start, target
+
+
+class MergedArrivals(ArrivalGenerator):
+    """Generate the arrivals of several sources of trips combined, e.g. a
+    recorded trace, synthetic background traffic and scheduled meetings:
+
+        MergedArrivals(max_floor, [TraceTrips('badges.csv'),
+                                   GeneratedTrips(background, 3600),
+                                   [(540, 1, 7)] * 12],
+                       scales=[1, 0.5, 1], offsets=[0, 0, 3600])
+
+    A source is anything whose iterators give (round, start, target) trips in
+    order of round, and is iterated over again whenever the generator is
+    reset. The sources are merged lazily with a heap, one trip at a time, so
+    only the next trip of each source is ever held in memory.
+
+    The trips of each source are moved offsets[i] rounds later (or earlier,
+    if negative; trips moved before round 0 are dropped), and scaled:
+    each trip stands for scales[i] people, rounded so that the number of
+    people from a source is always within one of scales[i] times its number
+    of trips, e.g. a scale of 0.5 keeps every other trip, and 2 doubles them.
+
+    === Attributes ===
+    sources: the sources of trips
+    scales: the number of people each trip of each source stands for
+    offsets: the number of rounds each source's trips are moved by
+
+    === Representation Invariants ===
+    len(scales) == len(offsets) == len(sources)
+    every scale is >= 0
+    """
+    sources: List[Iterable[Tuple[int, int, int]]]
+    scales: List[float]
+    offsets: List[int]
+    _merged: Iterator[Tuple[int, int, int]]
+    _next: Optional[Tuple[int, int, int]]
+
+    def __init__(self, max_floor: int,
+                 sources: List[Iterable[Tuple[int, int, int]]],
+                 scales: Optional[List[float]] = None,
+                 offsets: Optional[List[int]] = None) -> None:
+        """Initialize a generator of the merged arrivals of sources, which by
+        default aren't scaled or moved.
+
+        Preconditions:
+            max_floor >= 2
+            every trip of every source is between floors 1 and max_floor
+            scales and offsets are None, or have an entry for every source
+        """
+        ArrivalGenerator.__init__(self, max_floor, None)
+        self.sources = sources
+        self.scales = [1.0] * len(sources) if scales is None else scales
+        self.offsets = [0] * len(sources) if offsets is None else offsets
+        self.reset()
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """Refer to the Parent class
+
+        Rounds must be generated in increasing order; the trips of rounds
+        that are skipped are dropped.
+        """
+        people = {}
+        while self._next is not None and self._next[0] <= round_num:
+            arrival, start, target = self._next
+            if arrival == round_num:
+                people.setdefault(start, []).append(
+                    self._new_person(start, target))
+            self._next = next(self._merged, None)
+        return people
+
+    def reset(self) -> None:
+        """Refer to the Parent class
+
+        Every source is iterated over from its start again.
+        """
+        self._merged = heapq.merge(
+            *[_adjusted(source, scale, offset) for source, scale, offset
+              in zip(self.sources, self.scales, self.offsets)],
+            key=lambda trip: trip[0])
+        self._next = next(self._merged, None)
+
+
+def _adjusted(source: Iterable[Tuple[int, int, int]], scale: float,
+              offset: int) -> Iterator[Tuple[int, int, int]]:
+    """Return the trips of source, moved offset rounds later and scaled by
+    scale (see MergedArrivals).
+    """
+    owed = 0.0
+    for arrival, start, target in source:
+        owed += scale
+        copies = int(owed)
+        owed -= copies
+        for _ in range(copies):
+            yield arrival + offset, start, target
+
+
+class AliasTable:
+    """A table for drawing random indices with given weights in constant time,
+    using Vose's alias method.
+
+    Index i is drawn with probability weights[i] / sum(weights). Building the
+    table takes time proportional to the number of weights; every draw after
+    that takes a single random number, however many weights there are.
+
+    === Attributes ===
+    probability: the chance of keeping index i when column i is picked
+    alias: the index drawn instead of i when it isn't kept
+
+    === Representation Invariants ===
+    len(probability) == len(alias) >= 1
+    """
+    probability: List[float]
+    alias: List[int]
+
+    def __init__(self, weights: List[float]) -> None:
+        """Initialize a table for the given weights.
+
+        Precondition: every weight is >= 0, and at least one is > 0
+        """
+        n = len(weights)
+        total = sum(weights)
+        scaled = [weight * n / total for weight in weights]
+        self.probability = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i in range(n) if scaled[i] < 1]
+        large = [i for i in range(n) if scaled[i] >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            if scaled[more] < 1:
+                small.append(more)
+            else:
+                large.append(more)
+        # Whatever is left over is 1 up to rounding errors, so it is always
+        # kept, which is how probability and alias were initialized.
+
+    def sample(self, rng: random.Random) -> int:
+        """Return a random index, drawn with rng."""
+        u = rng.random() * len(self.probability)
+        i = int(u)
+        if u - i < self.probability[i]:
+            return i
+        return self.alias[i]
+
+
+def od_weights(max_floor: int, origins: Optional[Dict[int, float]] = None,
+               destinations: Optional[Dict[int, float]] = None) \
+        -> List[List[float]]:
+    """Return an origin/destination weight matrix for WeightedArrivals.
+
+    Every floor has an origin weight and a destination weight of 1, except
+    for the floors given in origins and destinations. The weight of a trip is
+    the product of its origin's and its destination's weights, and trips that
+    start and end on the same floor have weight 0. For example, an up-peak
+    morning where most people come in from the lobby is
+    od_weights(max_floor, origins={1: 20}), and a busy cafeteria on floor 7
+    is od_weights(max_floor, destinations={7: 5}).
+
+    Precondition: max_floor >= 2
+    """
+    origins = origins or {}
+    destinations = destinations or {}
+    return [[0.0 if start == target else
+             origins.get(start, 1.0) * destinations.get(target, 1.0)
+             for target in range(1, max_floor + 1)]
+            for start in range(1, max_floor + 1)]
+
+
+class WeightedArrivals(ArrivalGenerator):
+    """Generate people whose number and trips vary with the time of day.
+
+    The number of people arriving in a round is Poisson distributed with mean
+    rates[round_num % len(rates)], so the rate profile repeats every
+    len(rates) rounds. Their trips are drawn from an origin/destination
+    weight matrix: the weight in row start - 1 and column target - 1 is
+    proportional to the chance of a trip from start to target (see
+    od_weights). The profile is split into len(matrices) equal phases, each
+    with its own matrix, e.g. an up-peak morning followed by a down-peak
+    evening.
+
+    All the sampling goes through alias tables built once, so each person is
+    drawn in constant time however tall the building is.
+
+    === Attributes ===
+    rates: the mean number of arrivals in each round of the profile
+    matrices: the origin/destination weight matrix of each phase
+    seed: the seed of this generator's random numbers, or None to draw
+        from the random module, so that seeding it repeats the arrivals
+
+    === Representation Invariants ===
+    len(rates) >= len(matrices) >= 1
+    every rate is >= 0
+    """
+    rates: List[float]
+    matrices: List[List[List[float]]]
+    seed: Optional[int]
+    _rng: Optional[random.Random]
+    _origins: List[AliasTable]
+    _targets: List[Dict[int, AliasTable]]
+
+    def __init__(self, max_floor: int, matrices: List[List[List[float]]],
+                 rates: List[float], seed: Optional[int] = None) -> None:
+        """Initialize a new WeightedArrivals generator.
+
+        A single matrix for the whole profile is passed as [matrix].
+
+        Preconditions:
+            max_floor >= 2
+            each matrix has max_floor rows of max_floor non-negative weights,
+                with at least one positive weight
+            len(rates) >= len(matrices) >= 1
+        """
+        ArrivalGenerator.__init__(self, max_floor, None)
+        self.rates = rates
+        self.matrices = matrices
+        self.seed = seed
+        self._rng = None if seed is None else random.Random(seed)
+        self._origins = []
+        self._targets = []
+        for matrix in matrices:
+            self._origins.append(AliasTable([sum(row) for row in matrix]))
+            self._targets.append({start: AliasTable(row)
+                                  for start, row in enumerate(matrix, 1)
+                                  if sum(row) > 0})
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """Refer to the Parent class
+
+        Only floors where at least one person arrived are included.
+        """
+        people = {}
+        for start, target in self.draw(round_num):
+            people.setdefault(start, []).append(
+                self._new_person(start, target))
+        return people
+
+    def draw(self, round_num: int) -> List[Tuple[int, int]]:
+        """Refer to the Parent class
+        """
+        position = round_num % len(self.rates)
+        phase = position * len(self.matrices) // len(self.rates)
+        origins = self._origins[phase]
+        targets = self._targets[phase]
+        rng = self._random()
+        trips = []
+        for _ in range(self._poisson(self.rates[position])):
+            start = origins.sample(rng) + 1
+            trips.append((start, targets[start].sample(rng) + 1))
+        return trips
+
+    def reset(self) -> None:
+        """Refer to the Parent class
+
+        The random numbers start over from seed, unless seed is None, in
+        which case they only start over if the random module is seeded again.
+        """
+        if self._rng is not None:
+            self._rng.seed(self.seed)
+
+    def fingerprint(self) -> Optional[str]:
+        """Refer to the Parent class
+
+        There is none unless seed is given.
+        """
+        if self.seed is None:
+            return None
+        digest = hashlib.sha256(
+            repr((self.rates, self.matrices)).encode()).hexdigest()
+        return f'WeightedArrivals {self.max_floor} {self.seed} {digest}'
+
+    def is_deterministic(self) -> bool:
+        """Refer to the Parent class
+
+        It is unless seed is None, in which case it draws from the random
+        module.
+        """
+        return self.seed is not None
+
+    def _random(self) -> random.Random:
+        """Return what this generator draws its random numbers from: its own
+        Random if it has a seed, or else the random module, which has the
+        same methods.
+        """
+        return random if self._rng is None else self._rng
+
+    def _poisson(self, mean: float) -> int:
+        """Return a Poisson distributed number with the given mean."""
+        rng = self._random()
+        if mean > 30:
+            # The normal approximation is close enough, and doesn't take
+            # time proportional to the mean.
+            return max(round(rng.gauss(mean, math.sqrt(mean))), 0)
+        limit = math.exp(-mean)
+        count = 0
+        product = rng.random()
+        while product > limit:
+            count += 1
+            product *= rng.random()
+        return count
+
 
 ###############################################################################
 # Elevator moving algorithms
@@ -235,6 +730,27 @@ class MovingAlgorithm:
         """
         raise NotImplementedError
 
+    def fingerprint(self) -> Optional[str]:
+        """Return a string that identifies how this algorithm moves
+        elevators, so that two algorithms with the same fingerprint make the
+        same moves from the same state, or None if that can't be promised.
+
+        Only what the algorithm was configured with goes into it, not the
+        counters or caches it keeps while it runs. Algorithms that draw from
+        the random module only repeat their moves if it is seeded the same way
+        first (see is_deterministic).
+        """
+        return None
+
+    def is_deterministic(self) -> bool:
+        """Return whether this algorithm makes the same moves from the same
+        state every time, whatever state the random module is in.
+
+        An algorithm that falls back on another one is only deterministic if
+        that one is. Algorithms are assumed not to be unless they say so.
+        """
+        return False
+
     def update_elevators(self, elevator: Elevator, movement: Direction) -> None:
         """Update the location of each elevator and its passengers before it
         moves visually to the next floor.
@@ -270,6 +786,11 @@ class RandomAlgorithm(MovingAlgorithm):
             self.update_elevators(elevator, choice)
         return elev_direction
 
+    def fingerprint(self) -> Optional[str]:
+        """Refer to the Parent class
+        """
+        return type(self).__name__
+
 
 class PushyPassenger(MovingAlgorithm):
     """A moving algorithm that preferences the first passenger on each elevator.
@@ -312,6 +833,16 @@ class PushyPassenger(MovingAlgorithm):
             self.update_elevators(elevator, choice)
         return elev_direction
 
+    def fingerprint(self) -> Optional[str]:
+        """Refer to the Parent class
+        """
+        return type(self).__name__
+
+    def is_deterministic(self) -> bool:
+        """Refer to the Parent class
+        """
+        return True
+
 
 class ShortSighted(MovingAlgorithm):
     """A moving algorithm that preferences the closest possible choice.
@@ -346,13 +877,13 @@ class ShortSighted(MovingAlgorithm):
                     choice = Direction.UP
             else:
                 floor_num, decision = max_floor + 1, max_floor + 1
-                floor = 1
-                while floor < max_floor + 1:
+                # Only the floors in waiting are looked at, so an elevator
+                # that serves a zone of the building ignores the rest of it.
+                for floor in waiting:
                     diff = abs(floor - elevator.current_floor)
                     if diff < decision and len(waiting[floor]) != 0:
                         decision = diff
                         floor_num = floor
-                    floor += 1
                 if floor_num == max_floor + 1:
                     elev_direction.append(Direction.STAY)
                     choice = Direction.STAY
@@ -365,6 +896,375 @@ class ShortSighted(MovingAlgorithm):
             self.update_elevators(elevator, choice)
         return elev_direction
 
+    def fingerprint(self) -> Optional[str]:
+        """Refer to the Parent class
+        """
+        return type(self).__name__
+
+    def is_deterministic(self) -> bool:
+        """Refer to the Parent class
+        """
+        return True
+
+
+class ExternalAlgorithm(MovingAlgorithm):
+    """A moving algorithm whose moves are decided outside the simulation,
+    e.g. by a policy being trained.
+
+    Set actions to the directions of the next round before each round is
+    run. A direction that would take an elevator below floor 1 or above the
+    top floor is replaced by Direction.STAY.
+
+    === Attributes ===
+    actions: the direction each elevator moves in next, in order, or an
+        empty list to keep every elevator still
+    """
+    actions: List[Direction]
+
+    def __init__(self) -> None:
+        """Initialize an algorithm that keeps every elevator still until it
+        is given actions.
+        """
+        self.actions = []
+
+    def move_elevators(self, elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]], max_floor: int) -> \
+            List[Direction]:
+        """Refer to the Parent class
+        """
+        elev_direction = []
+        for i, elevator in enumerate(elevators):
+            choice = self.actions[i] if self.actions else Direction.STAY
+            if (choice == Direction.DOWN and elevator.current_floor == 1) or \
+                    (choice == Direction.UP and
+                     elevator.current_floor == max_floor):
+                choice = Direction.STAY
+            elev_direction.append(choice)
+            self.update_elevators(elevator, choice)
+        return elev_direction
+
+
+# The state LookaheadPlanner searches over: the floor of each elevator, the
+# sorted targets of each elevator's passengers, the targets of the people
+# waiting on each floor that has anyone waiting (as sorted (floor, targets)
+# pairs), the number of waiting people, and the value of the Direction each
+# elevator last moved in.
+_PlanState = Tuple[Tuple[int, ...], Tuple[Tuple[int, ...], ...],
+                   Tuple[Tuple[int, Tuple[int, ...]], ...], int,
+                   Tuple[int, ...]]
+
+
+def _sweeps(floor: int, stops: Dict[int, int]) -> List[Tuple[int, int, int]]:
+    """Return the two ways an elevator on the given floor can serve its stops
+    by sweeping to one end of them and then to the other: down first, then up
+    first.
+
+    stops maps each floor the elevator has to stop on to the number of people
+    it stops there for. Each way is a tuple of the total time people wait for
+    their stop, the time the sweep takes, and the floor it ends on.
+    """
+    lowest = min(min(stops, default=floor), floor)
+    highest = max(max(stops, default=floor), floor)
+    down_first = up_first = 0
+    for stop, count in stops.items():
+        if stop <= floor:
+            down_first += (floor - stop) * count
+            up_first += (2 * highest - floor - stop) * count
+        else:
+            down_first += (floor + stop - 2 * lowest) * count
+            up_first += (stop - floor) * count
+    return [(down_first, floor + highest - 2 * lowest, highest),
+            (up_first, 2 * highest - floor - lowest, lowest)]
+
+
+class _OutOfTime(Exception):
+    """Raised when a LookaheadPlanner search runs past its deadline."""
+
+
+class LookaheadPlanner(MovingAlgorithm):
+    """A moving algorithm that plans the moves of all elevators together,
+    a few rounds ahead.
+
+    The planner searches every combination of moves of the elevators, horizon
+    rounds deep, on a lightweight copy of the simulation: elevator floors and
+    directions, the targets of their passengers, and the targets of the
+    people waiting (only the first few on each floor, as many as the largest
+    elevator could pick up). Each round of a plan costs the number of people
+    still in the building after it, and the state a plan ends in costs an
+    estimate of the time its people still need (see _estimate). The first
+    moves of the cheapest plan are made. No new arrivals are assumed.
+
+    The search deepens one round at a time, and stops when the time budget
+    of the call runs out: the moves of the deepest finished search are used,
+    or the fallback algorithm's if not even one round could be searched.
+    Without a time budget, every call searches horizon rounds deep, so the
+    planner's moves don't depend on how fast the machine is.
+    Evaluated states are kept in a transposition table between calls, and the
+    least recently used ones are evicted once it holds table_size states.
+
+    === Attributes ===
+    horizon: the number of rounds to look ahead
+    time_budget: the number of seconds each call to move_elevators may take,
+        or None if it may take as long as it needs
+    table_size: the largest number of states kept in the transposition table
+    fallback: the algorithm used when not even one round can be searched
+    fallbacks: the number of calls that used the fallback algorithm
+
+    === Representation Invariants ===
+    horizon >= 1
+    time_budget is None or time_budget > 0
+    table_size >= 0
+    fallbacks >= 0
+    """
+    horizon: int
+    time_budget: Optional[float]
+    table_size: int
+    fallback: MovingAlgorithm
+    fallbacks: int
+    _table: OrderedDict
+    _capacities: Tuple[int, ...]
+    _max_floor: int
+    _headings: Tuple[int, ...]
+    _deadline: float
+
+    def __init__(self, horizon: int = 3,
+                 time_budget: Optional[float] = 0.05,
+                 table_size: int = 100000,
+                 fallback: Optional[MovingAlgorithm] = None) -> None:
+        """Initialize a new LookaheadPlanner.
+
+        The fallback algorithm is ShortSighted unless another one is given.
+
+        Preconditions:
+            horizon >= 1
+            time_budget is None or time_budget > 0
+            table_size >= 0
+        """
+        self.horizon = horizon
+        self.time_budget = time_budget
+        self.table_size = table_size
+        self.fallback = ShortSighted() if fallback is None else fallback
+        self.fallbacks = 0
+        self._table = OrderedDict()
+        self._capacities = ()
+        self._max_floor = 0
+        self._headings = ()
+        self._deadline = 0.0
+
+    def move_elevators(self, elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]], max_floor: int) -> \
+            List[Direction]:
+        """Refer to the Parent class
+        """
+        if self.time_budget is None:
+            self._deadline = float('inf')
+        else:
+            self._deadline = time.perf_counter() + self.time_budget
+        capacities = tuple(elevator.maximum_capacity for elevator in elevators)
+        if capacities != self._capacities or max_floor != self._max_floor:
+            # States of a different building can't be compared.
+            self._table.clear()
+            self._capacities = capacities
+            self._max_floor = max_floor
+            self._headings = (Direction.STAY.value,) * len(elevators)
+
+        state = self._plan_state(elevators, waiting)
+        ranking = list(self._joint_moves(state))
+        best = None
+        try:
+            for depth in range(1, self.horizon + 1):
+                ranking = self._rank_moves(state, depth, ranking)
+                best = ranking[0]
+        except _OutOfTime:
+            pass
+        if best is None:
+            self.fallbacks += 1
+            elev_direction = self.fallback.move_elevators(elevators, waiting,
+                                                          max_floor)
+        else:
+            elev_direction = []
+            for elevator, move in zip(elevators, best):
+                choice = Direction(move)
+                elev_direction.append(choice)
+                self.update_elevators(elevator, choice)
+        self._headings = tuple(choice.value for choice in elev_direction)
+        return elev_direction
+
+    def fingerprint(self) -> Optional[str]:
+        """Refer to the Parent class
+
+        There is none if the planner has a time budget, since how deep it
+        searches then depends on the machine, or if the fallback algorithm has
+        none.
+        """
+        fallback = self.fallback.fingerprint()
+        if self.time_budget is not None or fallback is None:
+            return None
+        return (f'LookaheadPlanner {self.horizon} {self.time_budget} '
+                f'{self.table_size} ({fallback})')
+
+    def is_deterministic(self) -> bool:
+        """Refer to the Parent class
+        """
+        return self.time_budget is None and self.fallback.is_deterministic()
+
+    def _plan_state(self, elevators: List[Elevator],
+                    waiting: Dict[int, List[Person]]) -> _PlanState:
+        """Return the lightweight copy of the simulation to plan on."""
+        visible = max(self._capacities)
+        queues = []
+        num_waiting = 0
+        for floor, people in waiting.items():
+            if people:
+                queues.append((floor, tuple(person.target
+                                            for person in people[:visible])))
+                num_waiting += len(people)
+        return (tuple(elevator.current_floor for elevator in elevators),
+                tuple(tuple(sorted(person.target
+                                   for person in elevator.passengers))
+                      for elevator in elevators),
+                tuple(sorted(queues)),
+                num_waiting,
+                self._headings)
+
+    def _joint_moves(self, state: _PlanState) -> Iterator[Tuple[int, ...]]:
+        """Yield every valid combination of moves of the elevators in state,
+        as Direction values.
+
+        Like real elevators, an elevator with passengers never stops between
+        floors, and keeps going the way it was going while any of them are
+        going that way; only an empty elevator may stay where it is.
+        """
+        floors, cars, _, _, headings = state
+        options = []
+        for floor, car, heading in zip(floors, cars, headings):
+            if car and heading != Direction.STAY.value and any(
+                    (target - floor) * heading > 0 for target in car):
+                options.append([heading])
+                continue
+            moves = [] if car else [Direction.STAY.value]
+            if floor < self._max_floor:
+                moves.append(Direction.UP.value)
+            if floor > 1:
+                moves.append(Direction.DOWN.value)
+            options.append(moves)
+        return itertools.product(*options)
+
+    def _step(self, state: _PlanState, moves: Tuple[int, ...]) \
+            -> Tuple[_PlanState, int]:
+        """Return the state after the given moves and the round after them
+        (people leaving, then boarding, like in the simulation), and the cost
+        of that round.
+        """
+        floors, cars, queues, num_waiting, _ = state
+        floors = tuple(floor + move for floor, move in zip(floors, moves))
+        new_cars = [[target for target in car if target != floor]
+                    for floor, car in zip(floors, cars)]
+        waiting = dict(queues)
+        for i, floor in enumerate(floors):
+            room = self._capacities[i] - len(new_cars[i])
+            if room > 0 and floor in waiting:
+                boarding = waiting[floor][:room]
+                new_cars[i].extend(boarding)
+                num_waiting -= len(boarding)
+                if len(waiting[floor]) > room:
+                    waiting[floor] = waiting[floor][room:]
+                else:
+                    del waiting[floor]
+        riding = sum(len(car) for car in new_cars)
+        return ((floors, tuple(tuple(sorted(car)) for car in new_cars),
+                 tuple(sorted(waiting.items())), num_waiting, moves),
+                riding + num_waiting)
+
+    def _estimate(self, state: _PlanState) -> int:
+        """Return an estimate of the time people still need in the given
+        state.
+
+        Waiting people are picked up by the nearest elevator with room for
+        them. Each elevator sweeps to one end of the floors it has to stop on
+        and then to the other, and people need the time until it stops for
+        them. People no elevator has room for are picked up by the first
+        elevator to finish its sweep and come to them. Waiting people then need
+        the length of their trip.
+        """
+        floors, cars, queues, _, _ = state
+        stops = [{} for _ in floors]
+        rooms = []
+        for i, car in enumerate(cars):
+            for target in car:
+                stops[i][target] = stops[i].get(target, 0) + 1
+            rooms.append(self._capacities[i] - len(car))
+        total = 0
+        left_behind = []
+        for floor, targets in queues:
+            for target in targets:
+                total += abs(target - floor)
+            count = len(targets)
+            while count > 0 and any(rooms):
+                nearest = min((i for i, room in enumerate(rooms) if room),
+                              key=lambda i: abs(floors[i] - floor))
+                picked_up = min(count, rooms[nearest])
+                stops[nearest][floor] = (stops[nearest].get(floor, 0) +
+                                         picked_up)
+                rooms[nearest] -= picked_up
+                count -= picked_up
+            if count > 0:
+                left_behind.append((floor, count))
+
+        # Each elevator sweeps whichever way round is quicker for the people
+        # it has to stop for and the people left behind together.
+        sweeps = []
+        for floor, car_stops in zip(floors, stops):
+            sweeps.append(min(
+                _sweeps(floor, car_stops),
+                key=lambda sweep: sweep[0] + sum(
+                    count * (sweep[1] + abs(sweep[2] - other))
+                    for other, count in left_behind)))
+        for cost, _, _ in sweeps:
+            total += cost
+        for floor, count in left_behind:
+            total += count * min(length + abs(end - floor)
+                                 for _, length, end in sweeps)
+        return total
+
+    def _rank_moves(self, state: _PlanState, depth: int,
+                    ranking: List[Tuple[int, ...]]) -> List[Tuple[int, ...]]:
+        """Return the first moves of plans depth rounds deep from state,
+        cheapest plan first.
+
+        Moves whose plans cost the same keep their order in ranking, the
+        order of the shallower search. Otherwise waiting a round and moving
+        after would often look as good as moving now, and the elevators would
+        put off moving forever.
+        """
+        costs = {}
+        for moves in ranking:
+            child, cost = self._step(state, moves)
+            costs[moves] = cost + self._search(child, depth - 1)
+        return sorted(ranking, key=costs.__getitem__)
+
+    def _search(self, state: _PlanState, depth: int) -> float:
+        """Return the cost of the cheapest plan depth rounds deep from state,
+        plus the estimate of the state it ends in.
+        """
+        if time.perf_counter() > self._deadline:
+            raise _OutOfTime
+        if depth == 0:
+            return self._estimate(state)
+        key = (state, depth)
+        if key in self._table:
+            self._table.move_to_end(key)
+            return self._table[key]
+
+        best = math.inf
+        for moves in self._joint_moves(state):
+            child, cost = self._step(state, moves)
+            best = min(best, cost + self._search(child, depth - 1))
+        self._table[key] = best
+        if len(self._table) > self.table_size:
+            self._table.popitem(last=False)
+        return best
+
 
 if __name__ == '__main__':
     # Don't forget to check your work regularly with python_ta!
@@ -373,7 +1273,9 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-attributes': 12,
         'allowed-io': ['__init__'],
-        'extra-imports': ['entities', 'random', 'csv', 'enum'],
+        'extra-imports': ['entities', 'random', 'csv', 'enum', 'math',
+                          'collections', 'itertools', 'time', 'hashlib',
+                          'heapq'],
         'max-nested-blocks': 4,
         'disable': ['R0201']
     })
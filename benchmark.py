@@ -0,0 +1,187 @@
+"""CSC148 Assignment 1 - Benchmarks
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains small benchmarks for the simulation. Run it directly to
+print their results:
+
+    python benchmark.py
+
+bench_memory compares what a Person sprite and a CompactPerson cost, and how
+many people a headless simulation has to allocate when finished people are
+recycled through a PersonPool.
+
+bench_metrics compares the speed of a headless simulation with and without a
+metrics writer, recording every round or only some of them. Recording every
+Nth round, for N = SAMPLED_INTERVAL, is meant to cost at most
+METRICS_OVERHEAD_BUDGET of the simulation's time, which check_metrics_overhead
+checks (this is timing, so it is run with the benchmarks rather than the unit
+tests).
+"""
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, Tuple
+
+import algorithms
+from entities import Person, CompactPerson
+from metrics import JSONLMetricsWriter, CSVMetricsWriter
+from simulation import Simulation
+
+
+# The interval between recorded rounds whose metrics overhead is budgeted,
+# and the most that recording them may add to the time of a headless run.
+SAMPLED_INTERVAL = 100
+METRICS_OVERHEAD_BUDGET = 0.05
+
+
+def _traced_bytes_per_object(make: Any, count: int) -> float:
+    """Return the number of bytes traced by tracemalloc per object, when
+    count objects are made by calling make().
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [make() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding the objects isn't part of their cost.
+    list_bytes = objects.__sizeof__()
+    return (after - before - list_bytes) / len(objects)
+
+
+def bench_memory(num_people: int = 100000, num_sprites: int = 100,
+                 num_rounds: int = 10000) -> Dict[str, Any]:
+    """Measure the memory used per person and the allocation rate of a
+    headless run, and return the measurements.
+
+    Person sprites are slow to create (each one loads and scales an image), so
+    only num_sprites of them are measured. Their image pixels live in SDL's
+    memory, which tracemalloc can't see, so they are added separately.
+    """
+    compact = _traced_bytes_per_object(lambda: CompactPerson(1, 2),
+                                       num_people)
+    sprite = _traced_bytes_per_object(lambda: Person(1, 2), num_sprites)
+    image = Person(1, 2).image
+    pixels = image.get_width() * image.get_height() * image.get_bytesize()
+
+    sim = Simulation(_headless_config(10, 4, 2))
+    start = time.perf_counter()
+    stats = sim.run(num_rounds)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'compact_person_bytes': compact,
+        'sprite_person_bytes': sprite + pixels,
+        'people_generated': stats['total_people'],
+        'people_allocated': sim.person_pool.created,
+        'people_reused': sim.person_pool.reused,
+        'rounds_per_second': num_rounds / elapsed
+    }
+
+
+def _headless_config(num_floors: int, num_elevators: int,
+                     num_people: int) -> Dict[str, Any]:
+    """Return the configuration of a headless ShortSighted simulation with
+    random arrivals.
+    """
+    return {
+        'num_floors': num_floors,
+        'num_elevators': num_elevators,
+        'elevator_capacity': 10,
+        'num_people_per_round': num_people,
+        'arrival_generator': algorithms.RandomArrivals(num_floors, num_people),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': False
+    }
+
+
+def bench_metrics(num_rounds: int = 20000, repeats: int = 5,
+                  intervals: Tuple[int, ...] = (1, 10, SAMPLED_INTERVAL)) \
+        -> Dict[str, Any]:
+    """Return the rounds per second of a headless simulation without a
+    metrics sink, and with each of the metrics writers recording every
+    interval-th round for each of the given intervals, along with the
+    overhead of each writer: the fraction of the time without a sink that it
+    adds.
+
+    Every configuration simulates the same arrivals, and is run repeats
+    times, taking turns and with the garbage collector off (as timeit does),
+    and its fastest run is kept, so that the overheads aren't skewed by
+    whatever else the machine or the process is doing. Arrivals are light
+    enough that queues stay short, so the simulation itself stays fast and
+    any overhead of the writers is easy to see.
+
+    Precondition: num_rounds >= 1 and repeats >= 1
+    """
+    runs = [('none', None, 1)]
+    for every in intervals:
+        runs.append((f'jsonl_every_{every}', JSONLMetricsWriter, every))
+        runs.append((f'csv_every_{every}', CSVMetricsWriter, every))
+    fastest = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for _ in range(repeats):
+            for name, writer, every in runs:
+                config = _headless_config(10, 4, 1)
+                if writer is not None:
+                    config['metrics_sink'] = writer(
+                        os.path.join(directory, name), every=every)
+                sim = Simulation(config)
+                random.seed(148)
+                gc.collect()
+                gc.disable()
+                try:
+                    start = time.perf_counter()
+                    sim.run(num_rounds)
+                    elapsed = time.perf_counter() - start
+                finally:
+                    gc.enable()
+                if writer is not None:
+                    config['metrics_sink'].close()
+                fastest[name] = min(fastest.get(name, elapsed), elapsed)
+
+    results = {}
+    for name, elapsed in fastest.items():
+        results[f'{name}_rounds_per_second'] = num_rounds / elapsed
+        if name != 'none':
+            results[f'{name}_overhead'] = elapsed / fastest['none'] - 1
+    return results
+
+
+def check_metrics_overhead(tries: int = 3) -> float:
+    """Return the overhead of the slower metrics writer when recording every
+    SAMPLED_INTERVAL-th round, and raise an AssertionError if it is over
+    METRICS_OVERHEAD_BUDGET.
+
+    A busy machine can slow down a whole measurement, so it gets the given
+    number of tries; a writer that is really over budget fails all of them.
+
+    Precondition: tries >= 1
+    """
+    every = SAMPLED_INTERVAL
+    for _ in range(tries):
+        speeds = bench_metrics(num_rounds=10000, repeats=7, intervals=(every,))
+        overhead = max(speeds[f'jsonl_every_{every}_overhead'],
+                       speeds[f'csv_every_{every}_overhead'])
+        if overhead <= METRICS_OVERHEAD_BUDGET:
+            break
+    assert overhead <= METRICS_OVERHEAD_BUDGET, \
+        f'metrics overhead {overhead:.1%} is over budget'
+    return overhead
+
+
+if __name__ == '__main__':
+    for bench in [bench_memory, bench_metrics]:
+        for name, value in bench().items():
+            if name.endswith('_overhead'):
+                print(f'{name:>34}: {value:.1%}')
+            else:
+                print(f'{name:>34}: {value:,.1f}')
+    print(f'{"metrics_overhead_budget_check":>34}: '
+          f'{check_metrics_overhead():.1%}')
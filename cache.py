@@ -0,0 +1,246 @@
+"""CSC148 Assignment 1 - Results Cache
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains ResultsCache, an on-disk cache of the results of headless
+simulation runs, so that sweeps and notebooks that run the same configuration
+again get its results back instantly:
+
+    cache = ResultsCache('.results_cache')
+    results = cache.run(config, num_rounds, seed=148)
+
+Results are stored under a hash of everything they depend on: the building
+(num_floors, num_elevators, elevator_capacity, num_people_per_round and
+served_floors), the fingerprints of the arrival generator and the moving
+algorithm (see ArrivalGenerator.fingerprint and MovingAlgorithm.fingerprint),
+the number of rounds, the seed, and the source code of the modules the
+simulation runs.
+
+Each entry is its own JSON file, written to a temporary file and renamed into
+place, so any number of processes can share a cache directory: a reader only
+ever sees complete entries, and two processes storing the same entry store
+the same results. Reading an entry touches its modification time, and the
+least recently used entries are deleted once the cache is larger than
+max_bytes.
+"""
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from simulation import Simulation
+
+
+# The config keys that describe the building, rather than where its results
+# are recorded or how it is shown.
+_BUILDING_KEYS = ('num_floors', 'num_elevators', 'elevator_capacity',
+                  'num_people_per_round', 'served_floors')
+
+# The modules every simulation runs, whatever its generator and algorithm.
+_CORE_MODULES = ('algorithms', 'entities', 'simulation')
+
+# The SHA-256 of the source of every module hashed so far, by file name.
+_source_hashes = {}
+
+
+def _describe(value: Any) -> Any:
+    """Return a JSON-serializable description of value, which only depends
+    on its contents: objects are described by their class and their public
+    attributes, and sets and ranges are sorted lists.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, dict):
+        return [[_describe(key), _describe(item)]
+                for key, item in sorted(value.items(), key=repr)]
+    if isinstance(value, (set, frozenset)):
+        return sorted(_describe(item) for item in value)
+    if isinstance(value, (list, tuple, range)):
+        return [_describe(item) for item in value]
+    return {'class': type(value).__qualname__,
+            'attributes': _describe({name: item
+                                     for name, item in vars(value).items()
+                                     if not name.startswith('_')})}
+
+
+def _source_hash(module_name: str) -> str:
+    """Return the SHA-256 of the source of the given imported module."""
+    filename = sys.modules[module_name].__file__
+    if filename not in _source_hashes:
+        with open(filename, 'rb') as file:
+            _source_hashes[filename] = hashlib.sha256(file.read()).hexdigest()
+    return _source_hashes[filename]
+
+
+class ResultsCache:
+    """A size-bounded cache of simulation results in a directory.
+
+    === Attributes ===
+    directory: the directory the entries are stored in
+    max_bytes: the most bytes of entries kept once an entry is stored
+    hits: the number of runs whose results were found in the cache
+    misses: the number of runs that were simulated
+
+    === Representation Invariants ===
+    max_bytes >= 0
+    hits >= 0
+    misses >= 0
+    """
+    directory: str
+    max_bytes: int
+    hits: int
+    misses: int
+
+    def __init__(self, directory: str, max_bytes: int = 64 << 20) -> None:
+        """Initialize a cache in directory, creating it if it doesn't exist.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, config: Dict[str, Any], num_rounds: int,
+            seed: Optional[int] = None) -> Optional[str]:
+        """Return the key that the results of running config for num_rounds
+        rounds with the given seed are stored under, or None if they can't be
+        cached because they wouldn't be repeated: the generator or the
+        algorithm has no fingerprint, or one of them isn't deterministic (it
+        draws from the random module, or wraps something that does) and there
+        is no seed.
+        """
+        generator = config['arrival_generator']
+        algorithm = config['moving_algorithm']
+        fingerprint = generator.fingerprint()
+        moves = algorithm.fingerprint()
+        if fingerprint is None or moves is None or seed is None and not (
+                generator.is_deterministic() and
+                algorithm.is_deterministic()):
+            return None
+        modules = sorted(set(_CORE_MODULES) | {type(generator).__module__,
+                                               type(algorithm).__module__})
+        description = {
+            'building': {name: _describe(config.get(name))
+                         for name in _BUILDING_KEYS},
+            'arrivals': fingerprint,
+            'algorithm': moves,
+            'num_rounds': num_rounds,
+            'seed': seed,
+            'code': [_source_hash(module) for module in modules]
+        }
+        return hashlib.sha256(json.dumps(
+            description, sort_keys=True).encode()).hexdigest()
+
+    def run(self, config: Dict[str, Any], num_rounds: int,
+            seed: Optional[int] = None) -> Dict[str, Any]:
+        """Return the results of a headless run of config for num_rounds
+        rounds, from the cache if they are in it.
+
+        On a miss, the random module is seeded with seed if it is given, the
+        simulation is run from its initial state (see Simulation.run) and its
+        results are stored, if they can be (see key). Nothing is recorded to
+        the config's metrics sink or event log on a hit.
+
+        Precondition: num_rounds >= 1
+        """
+        key = self.key(config, num_rounds, seed)
+        if key is not None:
+            results = self._load(key)
+            if results is not None:
+                self.hits += 1
+                return results
+
+        self.misses += 1
+        if seed is not None:
+            random.seed(seed)
+        sim = Simulation(dict(config, visualize=False))
+        results = sim.run(num_rounds)
+        if key is not None:
+            self._store(key, results)
+        return results
+
+    def clear(self) -> None:
+        """Delete every entry in this cache."""
+        for path in self._entries():
+            _remove(path)
+
+    def _path(self, key: str) -> str:
+        """Return the path of the entry with the given key."""
+        return os.path.join(self.directory, key + '.json')
+
+    def _entries(self) -> List[str]:
+        """Return the paths of every entry in this cache."""
+        return [os.path.join(self.directory, name)
+                for name in os.listdir(self.directory)
+                if name.endswith('.json')]
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the results stored under key, or None if there are none,
+        and mark them as used.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r') as file:
+                results = json.load(file)
+            os.utime(path)
+        except (OSError, ValueError):
+            # The entry was never stored, or was evicted by another process
+            # since it was opened.
+            return None
+        return results
+
+    def _store(self, key: str, results: Dict[str, Any]) -> None:
+        """Store results under key, then evict the least recently used
+        entries until the cache fits in max_bytes.
+        """
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory,
+                                                 suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'w') as file:
+                json.dump(results, file)
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            _remove(temporary)
+            raise
+
+        entries = []
+        for path in self._entries():
+            try:
+                status = os.stat(path)
+            except OSError:
+                continue
+            entries.append((status.st_mtime, path, status.st_size))
+        total = sum(size for _, _, size in entries)
+        for _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
+
+
+def _remove(path: str) -> None:
+    """Delete the file at path, unless another process already has."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-attributes': 12,
+        'allowed-io': ['_source_hash', '_load', '_store'],
+        'extra-imports': ['simulation', 'hashlib', 'json', 'os',
+                          'random', 'sys', 'tempfile'],
+        'max-nested-blocks': 4,
+        'disable': ['R0201']
+    })
@@ -0,0 +1,189 @@
+"""CSC148 Assignment 1 - Campus
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains run_campus, which simulates a campus of independent
+buildings at once by sharing them out between worker processes. Each building
+is an ordinary headless Simulation with its own configuration.
+
+While a building runs, its per-round aggregates (see FIELDS) are written
+straight into one multiprocessing.shared_memory block that holds every
+building's rounds, so the parent reads them without anything being pickled.
+Only each building's final results dict is sent back through the pool.
+"""
+from __future__ import annotations
+from array import array
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from metrics import MetricsSink
+from simulation import Simulation
+
+
+# The aggregates recorded for every round of every building, in order:
+# people who arrived, boarded and reached their target floor that round, and
+# the number of people waiting and riding at the end of it.
+FIELDS = ('arrivals', 'boardings', 'exits', 'waiting', 'riding')
+
+
+class SharedMemorySink(MetricsSink):
+    """A sink that writes one building's per-round aggregates into a shared
+    array of signed 64-bit integers.
+
+    The array holds num_rounds rows of len(FIELDS) values for every building,
+    building after building.
+
+    === Attributes ===
+    building: the index of the building being recorded
+    num_rounds: the number of rounds each building has room for
+    """
+    building: int
+    num_rounds: int
+    _values: memoryview
+
+    def __init__(self, buffer: memoryview, building: int,
+                 num_rounds: int) -> None:
+        """Initialize a sink for the given building that writes into buffer.
+        """
+        self.building = building
+        self.num_rounds = num_rounds
+        self._values = buffer.cast('q')
+
+    def record(self, round_num: int, arrivals: int, boardings: int,
+               exits: int, queues: Iterable[int], floors: Iterable[int],
+               loads: Iterable[int], directions: Iterable[int]) -> None:
+        """Refer to the Parent class
+        """
+        i = (self.building * self.num_rounds + round_num) * len(FIELDS)
+        values = self._values
+        values[i] = arrivals
+        values[i + 1] = boardings
+        values[i + 2] = exits
+        values[i + 3] = sum(queues)
+        values[i + 4] = sum(loads)
+
+    def close(self) -> None:
+        """Refer to the Parent class
+        """
+        self._values.release()
+
+
+class CampusResults:
+    """The results of a campus run.
+
+    === Attributes ===
+    num_rounds: the number of rounds every building ran for
+    results: the results of each building's Simulation.run, in the order the
+        buildings were given
+    """
+    num_rounds: int
+    results: List[Dict[str, Any]]
+    _values: array
+
+    def __init__(self, num_rounds: int, results: List[Dict[str, Any]],
+                 values: array) -> None:
+        """Initialize the results of a campus run of num_rounds rounds."""
+        self.num_rounds = num_rounds
+        self.results = results
+        self._values = values
+
+    def building_series(self, building: int, field: str) -> List[int]:
+        """Return the value of field for every round of the given building.
+
+        Precondition: field in FIELDS
+        """
+        start = building * self.num_rounds * len(FIELDS) + FIELDS.index(field)
+        end = (building + 1) * self.num_rounds * len(FIELDS)
+        return self._values[start:end:len(FIELDS)].tolist()
+
+    def campus_series(self, field: str) -> List[int]:
+        """Return the value of field for every round, summed over the whole
+        campus.
+
+        Precondition: field in FIELDS
+        """
+        totals = [0] * self.num_rounds
+        for building in range(len(self.results)):
+            series = self.building_series(building, field)
+            totals = [total + value for total, value in zip(totals, series)]
+        return totals
+
+    def totals(self) -> Dict[str, int]:
+        """Return the campus-wide number of rounds, people generated and
+        people who reached their target floor.
+        """
+        return {
+            'num_iterations': self.num_rounds,
+            'total_people': sum(result['total_people']
+                                for result in self.results),
+            'people_completed': sum(result['people_completed']
+                                    for result in self.results)
+        }
+
+
+def run_campus(configs: List[Dict[str, Any]], num_rounds: int,
+               processes: Optional[int] = None) -> CampusResults:
+    """Run a simulation of every building configuration for num_rounds rounds,
+    spread over a pool of processes, and return the results.
+
+    Each config is a Simulation configuration; buildings are never
+    visualized, whatever their 'visualize' value is. processes is the number
+    of worker processes, and defaults to the number of CPUs.
+
+    Precondition: num_rounds >= 1
+    """
+    size = max(len(configs) * num_rounds * len(FIELDS), 1) * 8
+    memory = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        jobs = [(memory.name, building, config, num_rounds)
+                for building, config in enumerate(configs)]
+        results = [{}] * len(configs)
+        # Pool.terminate (which leaving a with block calls) relies on SIGTERM,
+        # which pygame's SDL catches in the workers, so close and join instead.
+        pool = multiprocessing.Pool(processes)
+        try:
+            for building, result in pool.imap_unordered(_run_building, jobs):
+                results[building] = result
+        finally:
+            pool.close()
+            pool.join()
+        values = array('q')
+        values.frombytes(
+            memory.buf[:len(configs) * num_rounds * len(FIELDS) * 8])
+    finally:
+        memory.close()
+        memory.unlink()
+    return CampusResults(num_rounds, results, values)
+
+
+def _run_building(job: Tuple[str, int, Dict[str, Any], int]) \
+        -> Tuple[int, Dict[str, Any]]:
+    """Run one building of a campus in a worker process, writing its rounds
+    into the shared memory block with the given name.
+    """
+    name, building, config, num_rounds = job
+    memory = shared_memory.SharedMemory(name=name)
+    sink = SharedMemorySink(memory.buf, building, num_rounds)
+    try:
+        config = dict(config, visualize=False, metrics_sink=sink)
+        return building, Simulation(config).run(num_rounds)
+    finally:
+        sink.close()
+        memory.close()
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-attributes': 12,
+        'extra-imports': ['metrics', 'simulation', 'array',
+                          'multiprocessing'],
+        'max-nested-blocks': 4,
+        'disable': ['R0201']
+    })
@@ -22,7 +22,7 @@ to understand these classes, as well as the abstract methods your classes must
 implement.
 """
 from __future__ import annotations
-from typing import List
+from typing import List, Optional, Union
 from sprites import PersonSprite, ElevatorSprite
 
 
@@ -76,17 +76,21 @@ class Person(PersonSprite):
     target: the floor this person wants to go to
     wait_time: the number of rounds this person has been waiting
     total_time: the time it takes for a person to get to their target location
+    uid: the number identifying this person in the events of a simulation,
+        assigned when they arrive
 
     === Representation invariants ===
     start >= 1
     target >= 1
     wait_time >= 0
     total_time >= 0
+    uid >= 0
     """
     start: int
     target: int
     wait_time: int
     total_time: int
+    uid: int
 
     def __init__(self, current_floor: int, destination: int) -> None:
         """Initialize a Person
@@ -101,6 +105,7 @@ class Person(PersonSprite):
         self.start = current_floor
         self.target = destination
         self.total_time = 0
+        self.uid = 0
         PersonSprite.__init__(self)
 
     def get_anger_level(self) -> int:
@@ -128,6 +133,151 @@ class Person(PersonSprite):
             return 4
 
 
+class CompactElevator:
+    """An elevator without a sprite, for simulations that aren't visualized.
+
+    This behaves exactly like Elevator, but has no image or rectangle to draw,
+    and keeps its attributes in __slots__ instead of a per-instance __dict__.
+
+    === Attributes ===
+    passengers: A list of the people currently on this elevator
+    maximum_capacity: The total number of people allowed on an elevator
+    current_floor: The floor that the elevator is currently on
+    current_capacity: The number of people currently on the elevator
+
+    === Representation invariants ===
+    maximum_capacity >= 1
+    current_floor <= number of floors and current_floor >= 1
+    current_capacity <= maximum_capacity and current_capacity >= 0
+    """
+    __slots__ = ('passengers', 'maximum_capacity', 'current_floor',
+                 'current_capacity')
+    passengers: List[AnyPerson]
+    maximum_capacity: int
+    current_floor: int
+    current_capacity: int
+
+    def __init__(self, elevator_capacity: int) -> None:
+        """Initialize a new CompactElevator
+
+        Preconditions:
+            elevator_capacity >= 1
+        """
+        self.current_floor = 1
+        self.maximum_capacity = elevator_capacity
+        self.current_capacity = 0
+        self.passengers = []
+
+    fullness = Elevator.fullness
+
+
+class CompactPerson:
+    """A person without a sprite, for simulations that aren't visualized.
+
+    A Person loads and scales an image and keeps a rectangle and a __dict__,
+    which costs kilobytes per person and dominates the time it takes to
+    generate arrivals. A CompactPerson only keeps the four numbers the
+    simulation needs, in __slots__.
+
+    === Attributes ===
+    start: the floor this person started on
+    target: the floor this person wants to go to
+    wait_time: the number of rounds this person has been waiting
+    total_time: the time it takes for a person to get to their target location
+    uid: the number identifying this person in the events of a simulation,
+        assigned when they arrive
+
+    === Representation invariants ===
+    start >= 1
+    target >= 1
+    wait_time >= 0
+    total_time >= 0
+    uid >= 0
+    """
+    __slots__ = ('start', 'target', 'wait_time', 'total_time', 'uid')
+    start: int
+    target: int
+    wait_time: int
+    total_time: int
+    uid: int
+
+    def __init__(self, current_floor: int, destination: int) -> None:
+        """Initialize a CompactPerson
+
+        Preconditions:
+            current_floor >= 1
+            destination >= 1
+        """
+        self.wait_time = 0
+        self.start = current_floor
+        self.target = destination
+        self.total_time = 0
+        self.uid = 0
+
+    get_anger_level = Person.get_anger_level
+
+
+AnyPerson = Union[Person, CompactPerson]
+
+
+class PersonPool:
+    """A free list of CompactPerson objects that can be used again.
+
+    The simulation releases people into the pool once they reach their target
+    floor, and arrival generators acquire their new arrivals from it, so that a
+    long run allocates roughly as many people as are ever in the building at
+    once rather than one per arrival.
+
+    === Attributes ===
+    max_free: the largest number of released people kept for reuse, or None
+        if there is no limit
+    created: the number of people this pool had to allocate
+    reused: the number of people this pool handed out again
+
+    === Representation invariants ===
+    max_free is None or max_free >= 0
+    created >= 0
+    reused >= 0
+    """
+    max_free: Optional[int]
+    created: int
+    reused: int
+    _free: List[CompactPerson]
+
+    def __init__(self, max_free: Optional[int] = None) -> None:
+        """Initialize an empty PersonPool."""
+        self.max_free = max_free
+        self.created = 0
+        self.reused = 0
+        self._free = []
+
+    def acquire(self, current_floor: int, destination: int) -> CompactPerson:
+        """Return a person starting at current_floor who wants to go to
+        destination, reusing a released person if there is one.
+        """
+        if not self._free:
+            self.created += 1
+            return CompactPerson(current_floor, destination)
+        self.reused += 1
+        person = self._free.pop()
+        person.wait_time = 0
+        person.start = current_floor
+        person.target = destination
+        person.total_time = 0
+        return person
+
+    def release(self, person: AnyPerson) -> None:
+        """Give back a person who has left the simulation.
+
+        The caller must not use the person afterwards. Sprite-based people
+        can't be reused by the pool and are ignored.
+        """
+        if not isinstance(person, CompactPerson):
+            return
+        if self.max_free is None or len(self._free) < self.max_free:
+            self._free.append(person)
+
+
 if __name__ == '__main__':
     import python_ta
 
@@ -0,0 +1,166 @@
+"""CSC148 Assignment 1 - Policy Training Environment
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains VectorElevatorEnv, a Gym-style environment that steps
+several independent buildings in lockstep, for training and evaluating
+dispatch policies:
+
+    env = VectorElevatorEnv(configs, num_rounds=1000)
+    observations = env.reset(seed=148)
+    done = False
+    while not done:
+        actions = policy(observations)
+        observations, rewards, dones, info = env.step(actions)
+        done = dones.all()
+
+Each building is a headless Simulation whose elevators are moved by an
+ExternalAlgorithm, and a step runs one round of every building.
+
+Observations are a dict of NumPy arrays, with one row per building:
+
+    floors      (K, E)  the current_floor of each elevator
+    loads       (K, E)  the number of passengers in each elevator
+    queues      (K, F)  the number of people waiting on each floor, from
+                        floor 1 up
+
+Actions are a (K, E) array of the values of each elevator's Direction
+(1 for up, 0 to stay and -1 for down). The reward of a building is minus the
+number of people waiting or riding at the end of the round, which is the
+number of rounds that were added to everyone's trip times, so an episode's
+total reward is minus the total time people spent in the building.
+
+NumPy is required to use this module.
+"""
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy
+
+from algorithms import Direction, ExternalAlgorithm
+from simulation import Simulation
+
+
+# Each Direction, indexed by its value + 1.
+_DIRECTIONS = (Direction.DOWN, Direction.STAY, Direction.UP)
+
+
+class VectorElevatorEnv:
+    """An environment of several buildings stepped in lockstep.
+
+    === Attributes ===
+    simulations: the simulation of each building
+    num_rounds: the number of rounds in an episode
+    num_floors: the number of floors of every building
+    num_elevators: the number of elevators of every building
+
+    === Representation Invariants ===
+    num_rounds >= 1
+    """
+    simulations: List[Simulation]
+    num_rounds: int
+    num_floors: int
+    num_elevators: int
+    _algorithms: List[ExternalAlgorithm]
+    _round_num: int
+
+    def __init__(self, configs: List[Dict[str, Any]],
+                 num_rounds: int) -> None:
+        """Initialize an environment with a building for every Simulation
+        configuration in configs, whose episodes last num_rounds rounds.
+
+        The moving algorithm and 'visualize' value of each config are
+        ignored, and each building must have its own arrival generator.
+
+        Preconditions:
+            configs != []
+            every config has the same num_floors and num_elevators, and no
+                served_floors
+            num_rounds >= 1
+        """
+        self._algorithms = [ExternalAlgorithm() for _ in configs]
+        self.simulations = [
+            Simulation(dict(config, visualize=False,
+                            moving_algorithm=algorithm))
+            for config, algorithm in zip(configs, self._algorithms)]
+        self.num_rounds = num_rounds
+        self.num_floors = configs[0]['num_floors']
+        self.num_elevators = configs[0]['num_elevators']
+        self._round_num = 0
+
+    def reset(self, seed: Optional[int] = None) -> Dict[str, numpy.ndarray]:
+        """Start a new episode in every building, and return the first
+        observations.
+
+        If seed is given, the random module is seeded with it first, so that
+        random arrivals are repeated.
+        """
+        if seed is not None:
+            random.seed(seed)
+        for sim in self.simulations:
+            sim.reset()
+        self._round_num = 0
+        return self._observe()
+
+    def step(self, actions: numpy.ndarray) \
+            -> Tuple[Dict[str, numpy.ndarray], numpy.ndarray, numpy.ndarray,
+                     Dict[str, numpy.ndarray]]:
+        """Move the elevators of every building as actions say, run a round
+        of each of them, and return the observations, the rewards, whether
+        each building's episode is over, and extra information (the number
+        of people who have reached their target floor in each building).
+
+        An elevator told to move past the bottom or top floor stays where it
+        is. Once the episode is over, reset must be called before the next
+        step.
+
+        Precondition: actions has shape (len(simulations), num_elevators)
+        """
+        moves = (numpy.asarray(actions) + 1).tolist()
+        for algorithm, row in zip(self._algorithms, moves):
+            algorithm.actions = [_DIRECTIONS[move] for move in row]
+        for sim in self.simulations:
+            sim.step()
+        self._round_num += 1
+
+        observations = self._observe()
+        riding = observations['loads'].sum(axis=1)
+        waiting = observations['queues'].sum(axis=1)
+        rewards = -(riding + waiting).astype(numpy.float64)
+        dones = numpy.full(len(self.simulations),
+                           self._round_num >= self.num_rounds)
+        completed = numpy.array([sim.results['people_completed']
+                                 for sim in self.simulations])
+        return observations, rewards, dones, {'people_completed': completed}
+
+    def _observe(self) -> Dict[str, numpy.ndarray]:
+        """Return the current observations of every building."""
+        floors = []
+        loads = []
+        queues = []
+        for sim in self.simulations:
+            for elevator in sim.elevators:
+                floors.append(elevator.current_floor)
+                loads.append(elevator.current_capacity)
+            queues.extend(map(len, sim.waiting.values()))
+        shape = (len(self.simulations), -1)
+        return {
+            'floors': numpy.array(floors, dtype=numpy.int32).reshape(shape),
+            'loads': numpy.array(loads, dtype=numpy.int32).reshape(shape),
+            'queues': numpy.array(queues, dtype=numpy.int32).reshape(shape)
+        }
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-attributes': 12,
+        'extra-imports': ['algorithms', 'simulation', 'numpy', 'random'],
+        'max-nested-blocks': 4,
+        'disable': ['R0201']
+    })
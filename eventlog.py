@@ -0,0 +1,183 @@
+"""CSC148 Assignment 1 - Event Log
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains EventLog, a binary record of everything that happens to the
+people and elevators of a simulation. Pass one to the simulation under the
+'event_log' config key:
+
+    with EventLog('run.events') as log:
+        config['event_log'] = log
+        Simulation(config).run(num_rounds)
+
+Every event is a fixed-width record of EVENT_FORMAT:
+
+    round      unsigned 32-bit   the round the event happened in
+    kind       unsigned 8-bit    ARRIVAL, BOARDING, EXIT, MOVE or START
+    person     unsigned 32-bit   the uid of the person, or NO_PERSON
+    floor      unsigned 16-bit   the floor it happened on (for a MOVE, the
+                                 floor the elevator moved to)
+    elevator   unsigned 16-bit   the index of the elevator, or NO_ELEVATOR
+
+A run starts with a START event in round 0 for every elevator, with the floor
+it starts on, before anything else happens.
+
+Events are packed into a buffer that is allocated once. When it is full, it is
+written to the log's file in one sequential write, or, for a log without a
+file, the oldest events are overwritten.
+"""
+from __future__ import annotations
+import struct
+from typing import Any, Iterator, List, Optional, Tuple
+
+# Kinds of events
+ARRIVAL = 0
+BOARDING = 1
+EXIT = 2
+MOVE = 3
+START = 4
+
+NO_PERSON = 0xFFFFFFFF
+NO_ELEVATOR = 0xFFFF
+
+EVENT_FORMAT = struct.Struct('<IBIHH')
+EVENT_SIZE = EVENT_FORMAT.size
+
+Event = Tuple[int, int, int, int, int]
+
+
+class EventLog:
+    """A preallocated ring buffer of binary simulation events.
+
+    === Attributes ===
+    filename: the file events are spilled to, or None if only the most recent
+        capacity events are kept in memory
+    capacity: the number of events the buffer holds
+    num_events: the number of events recorded so far
+
+    === Representation Invariants ===
+    capacity >= 1
+    num_events >= 0
+    """
+    filename: Optional[str]
+    capacity: int
+    num_events: int
+    _buffer: bytearray
+    _position: int
+    _file: Any
+
+    def __init__(self, filename: Optional[str] = None,
+                 capacity: int = 1 << 16) -> None:
+        """Initialize a new EventLog, (over)writing filename if it is given.
+
+        Precondition: capacity >= 1
+        """
+        self.filename = filename
+        self.capacity = capacity
+        self.num_events = 0
+        self._buffer = bytearray(capacity * EVENT_SIZE)
+        self._position = 0
+        self._file = None if filename is None else open(filename, 'wb')
+
+    def record(self, round_num: int, kind: int, person: int, floor: int,
+               elevator: int) -> None:
+        """Record a single event."""
+        if self._position == len(self._buffer):
+            self._spill()
+        EVENT_FORMAT.pack_into(self._buffer, self._position,
+                               round_num, kind, person, floor, elevator)
+        self._position += EVENT_SIZE
+        self.num_events += 1
+
+    def clear(self) -> None:
+        """Forget every event recorded so far, emptying this log's file if it
+        has one.
+        """
+        self._position = 0
+        self.num_events = 0
+        if self._file is not None:
+            self._file.seek(0)
+            self._file.truncate()
+
+    def flush(self) -> None:
+        """Write every buffered event to this log's file.
+
+        This does nothing for a log without a file.
+        """
+        if self._file is None:
+            return
+        self._spill()
+        self._file.flush()
+
+    def close(self) -> None:
+        """Flush this log and close its file."""
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def events(self) -> Iterator[Event]:
+        """Return an iterator over the recorded events, oldest first.
+
+        For a log with a file, this flushes the log and reads the file back;
+        otherwise it goes over the (at most capacity) events still in memory.
+        """
+        if self.filename is not None:
+            self.flush()
+            return read_events(self.filename)
+        buffer = bytes(self._buffer)
+        if self.num_events > self.capacity:
+            # The buffer has wrapped around, so the oldest event is the one
+            # that the next event will overwrite.
+            buffer = buffer[self._position:] + buffer[:self._position]
+        else:
+            buffer = buffer[:self._position]
+        return EVENT_FORMAT.iter_unpack(buffer)
+
+    def _spill(self) -> None:
+        """Empty the buffer, writing its events to the file if there is one."""
+        if self._file is not None:
+            self._file.write(memoryview(self._buffer)[:self._position])
+        self._position = 0
+
+    def __enter__(self) -> EventLog:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def read_events(filename: str, chunk_events: int = 1 << 16) -> Iterator[Event]:
+    """Yield the events stored in the given event log file, oldest first.
+
+    The file is read chunk_events events at a time.
+    """
+    with open(filename, 'rb') as file:
+        while True:
+            chunk = file.read(chunk_events * EVENT_SIZE)
+            if not chunk:
+                return
+            yield from EVENT_FORMAT.iter_unpack(chunk)
+
+
+def load_events(filename: str) -> List[Event]:
+    """Return every event stored in the given event log file."""
+    with open(filename, 'rb') as file:
+        return list(EVENT_FORMAT.iter_unpack(file.read()))
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-attributes': 12,
+        'allowed-io': ['__init__', 'read_events', 'load_events'],
+        'extra-imports': ['struct'],
+        'max-nested-blocks': 4,
+        'disable': ['R0201']
+    })
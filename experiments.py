@@ -0,0 +1,280 @@
+"""CSC148 Assignment 1 - Experiments
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains tools that run many headless simulations of the same
+building to answer a question about it, spreading the simulations over a
+pool of worker processes.
+
+optimize_capacity finds the smallest elevator configurations (number of
+elevators and capacity) that keep a trip-time metric under a limit.
+
+replicate keeps running replicas of a random simulation until the confidence
+interval of a metric is as narrow as asked, and reports how many it took.
+
+Metrics are named like the keys of Simulation.run's results: 'avg_time' and
+'max_time', or 'p<q>' (e.g. 'p95') for the q-th percentile of trip times.
+Percentiles also count the people still in the building when the run ends,
+using the time they have spent so far, so that a configuration can't look
+good by never delivering anyone.
+"""
+from contextlib import contextmanager
+import math
+import multiprocessing
+import random
+from statistics import mean, stdev
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from simulation import Simulation
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the q-th percentile of values, using the nearest-rank method.
+
+    Preconditions:
+        values != []
+        0 <= q <= 100
+    """
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def evaluate(config: Dict[str, Any], num_rounds: int, metric: str,
+             seed: Optional[int] = None) -> float:
+    """Run a headless simulation of config for num_rounds rounds, and return
+    the value of metric for it.
+
+    If seed is given, the random module is seeded with it first, so that
+    random arrivals and moves are the same for every configuration evaluated
+    with that seed. If nobody reached their target floor, 'avg_time' and
+    'max_time' are infinite.
+    """
+    if seed is not None:
+        random.seed(seed)
+    sim = Simulation(dict(config, visualize=False,
+                          record_trips=metric.startswith('p')))
+    stats = sim.run(num_rounds)
+    if not metric.startswith('p'):
+        if stats['people_completed'] == 0:
+            return math.inf
+        return stats[metric]
+
+    times = sim.trip_records.trip_times()
+    for people in sim.waiting.values():
+        times.extend(person.total_time for person in people)
+    for elevator in sim.elevators:
+        times.extend(person.total_time for person in elevator.passengers)
+    if not times:
+        return 0
+    return percentile(times, float(metric[1:]))
+
+
+def _evaluate_job(job: Tuple[Dict[str, Any], int, str, Optional[int]]) \
+        -> float:
+    """Evaluate a (config, num_rounds, metric, seed) job in a worker process.
+    """
+    return evaluate(*job)
+
+
+@contextmanager
+def _worker_pool(processes: Optional[int]) -> Iterator[Any]:
+    """Return a context manager for a pool of processes worker processes.
+
+    The pool is closed and joined rather than terminated, since pygame's SDL
+    catches the SIGTERM that terminating would send to the workers.
+    """
+    pool = multiprocessing.Pool(processes)
+    try:
+        yield pool
+    finally:
+        pool.close()
+        pool.join()
+
+
+def optimize_capacity(config: Dict[str, Any], num_rounds: int,
+                      max_value: float, num_elevators: Tuple[int, int],
+                      capacities: Sequence[int], metric: str = 'p95',
+                      seed: Optional[int] = 0,
+                      processes: Optional[int] = None) \
+        -> List[Tuple[int, int, float]]:
+    """Return the frontier of elevator configurations of config that keep
+    metric at or below max_value over num_rounds rounds.
+
+    Each configuration is a (number of elevators, elevator capacity, metric
+    value) tuple. The frontier holds, for every capacity that can do the job,
+    the fewest elevators that can, leaving out configurations that need as
+    many elevators as one with a smaller capacity. It is sorted by total
+    capacity (number of elevators times capacity), so its first entry is the
+    smallest configuration that works. The number of elevators is searched in
+    the inclusive range num_elevators.
+
+    The search assumes that adding elevators or capacity never makes the
+    metric worse. It runs a bisection over the number of elevators for every
+    capacity at once, evaluating each round of probes in parallel. Every
+    result also narrows the other searches: a configuration that works means
+    no larger capacity needs more elevators, and one that doesn't means no
+    smaller capacity can make do with as few. Probes that those bounds make
+    pointless are never run.
+
+    The arrival generator and moving algorithm of config are copied to the
+    worker processes, so config itself is never changed. Every evaluation
+    uses the same seed (see evaluate).
+
+    Preconditions:
+        1 <= num_elevators[0] <= num_elevators[1]
+        every capacity is >= 1
+    """
+    capacities = sorted(set(capacities))
+    fewest, most = num_elevators
+    # For each capacity, every number of elevators below low doesn't work,
+    # and high works, or is most + 1 if nothing has been found to work yet.
+    low = {capacity: fewest for capacity in capacities}
+    high = {capacity: most + 1 for capacity in capacities}
+    values = {}
+
+    with _worker_pool(processes) as pool:
+        while True:
+            probes = [((low[capacity] + high[capacity]) // 2, capacity)
+                      for capacity in capacities
+                      if low[capacity] < high[capacity]]
+            if not probes:
+                break
+            jobs = [(dict(config, num_elevators=count,
+                          elevator_capacity=capacity),
+                     num_rounds, metric, seed) for count, capacity in probes]
+            for (count, capacity), value in zip(
+                    probes, pool.map(_evaluate_job, jobs)):
+                values[(count, capacity)] = value
+                for other in capacities:
+                    if value <= max_value and other >= capacity:
+                        high[other] = min(high[other], count)
+                    elif value > max_value and other <= capacity:
+                        low[other] = max(low[other], count + 1)
+                    low[other] = min(low[other], high[other])
+
+    frontier = []
+    for capacity in capacities:
+        count = high[capacity]
+        if count > most or (frontier and frontier[-1][0] <= count):
+            continue
+        frontier.append((count, capacity, values[(count, capacity)]))
+    frontier.sort(key=lambda option: (option[0] * option[1], option[0]))
+    return frontier
+
+
+def _t_within(t: float, df: int) -> float:
+    """Return the probability that a Student's t variable with df degrees of
+    freedom lies between -t and t.
+
+    For a whole number of degrees of freedom this is a finite sum of powers
+    of cos(theta), where theta = atan(t / sqrt(df)) (Abramowitz and Stegun,
+    26.7.3 and 26.7.4), so it is exact up to rounding.
+
+    Precondition: t >= 0 and df >= 1
+    """
+    theta = math.atan(t / math.sqrt(df))
+    cos_squared = math.cos(theta) ** 2
+    if df % 2 == 1:
+        power, term = 1, math.cos(theta)
+    else:
+        power, term = 0, 1.0
+    total = 0.0
+    while power <= df - 2:
+        total += term
+        term *= (power + 1) / (power + 2) * cos_squared
+        power += 2
+    if df % 2 == 1:
+        return 2 / math.pi * (theta + math.sin(theta) * total)
+    return math.sin(theta) * total
+
+
+def _t_quantile(p: float, df: int) -> float:
+    """Return the p-quantile of Student's t distribution with df degrees of
+    freedom.
+
+    The quantile is found by bisecting the exact distribution (see
+    _t_within) rather than approximated, since the usual expansions around
+    the normal quantile are far off for the few degrees of freedom of an
+    experiment's first batches (about 8.0 instead of 12.71 for the 0.975
+    quantile with one degree of freedom).
+
+    Precondition: 0 < p < 1 and df >= 1
+    """
+    if p < 0.5:
+        return -_t_quantile(1 - p, df)
+    within = 2 * p - 1
+    low, high = 0.0, 1.0
+    while _t_within(high, df) < within:
+        low, high = high, 2 * high
+    while high - low > 1e-12 * (1 + high):
+        middle = (low + high) / 2
+        if _t_within(middle, df) < within:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def replicate(config: Dict[str, Any], num_rounds: int, metric: str,
+              relative_width: float, confidence: float = 0.95,
+              batch_size: Optional[int] = None, min_runs: int = 5,
+              max_runs: int = 1000, seed: int = 0,
+              processes: Optional[int] = None) -> Dict[str, Any]:
+    """Run replicas of config for num_rounds rounds until the confidence
+    interval of the mean of metric is narrow enough, and return what was
+    found.
+
+    Replicas are launched batch_size at a time (by default, one per CPU) in
+    parallel, and replica i is seeded with seed + i, so the whole experiment
+    can be repeated. After every batch, once there are at least min_runs
+    replicas, a Student's t confidence interval is computed; the experiment
+    stops as soon as its width divided by the absolute mean is at most
+    relative_width, or after max_runs replicas.
+
+    The returned dictionary holds the number of 'runs', the 'mean', the
+    'half_width' of the interval, whether it 'converged', and the metric
+    'values' of every replica in seed order.
+
+    Preconditions:
+        relative_width > 0
+        0 < confidence < 1
+        batch_size is None or batch_size >= 1
+        2 <= min_runs <= max_runs
+    """
+    if batch_size is None:
+        batch_size = multiprocessing.cpu_count()
+    values = []
+    with _worker_pool(processes) as pool:
+        while True:
+            count = min(batch_size, max_runs - len(values))
+            jobs = [(config, num_rounds, metric, seed + len(values) + i)
+                    for i in range(count)]
+            values.extend(pool.map(_evaluate_job, jobs))
+
+            if len(values) < min_runs:
+                continue
+            average = mean(values)
+            half_width = (_t_quantile((1 + confidence) / 2, len(values) - 1) *
+                          stdev(values) / math.sqrt(len(values)))
+            converged = 2 * half_width <= relative_width * abs(average)
+            if converged or len(values) >= max_runs:
+                return {'runs': len(values), 'mean': average,
+                        'half_width': half_width, 'converged': converged,
+                        'values': values}
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-attributes': 12,
+        'extra-imports': ['contextlib', 'math', 'multiprocessing', 'random',
+                          'statistics', 'simulation'],
+        'max-nested-blocks': 4,
+        'disable': ['R0201']
+    })
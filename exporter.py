@@ -0,0 +1,172 @@
+"""CSC148 Assignment 1 - Metrics Exporter
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains MetricsExporter, which serves the live state of a running
+simulation in the Prometheus text format, from a local HTTP server on a
+background thread:
+
+    config['wait_histogram'] = WaitHistogram()
+    sim = Simulation(config)
+    with MetricsExporter(sim, port=9148):
+        sim.run(num_rounds)
+
+and then e.g. `curl localhost:9148/metrics`. The exported metrics are:
+
+    elevator_sim_round                  the number of rounds run so far
+    elevator_sim_people_total           the number of people who arrived
+    elevator_sim_people_completed_total the number of people who reached their
+                                        target floor
+    elevator_sim_queue_length{floor}    the number of people waiting on a
+                                        floor
+    elevator_sim_elevator_fullness{elevator}
+                                        the fullness() of an elevator
+    elevator_sim_wait_rounds            a histogram of the rounds people
+                                        waited before boarding, if the
+                                        simulation has a wait_histogram
+
+Nothing is recorded for the exporter while the simulation runs (apart from
+the wait histogram's counters): every value is read from the simulation when
+it is scraped. Scrapes aren't synchronized with the simulation, so values
+read in the middle of a round may be from different stages of it.
+"""
+from __future__ import annotations
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import threading
+from typing import Any, List, Optional
+
+from simulation import Simulation
+
+
+_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricsExporter:
+    """A local HTTP server exporting the metrics of a simulation.
+
+    The server starts as soon as the exporter is created, and answers GET
+    requests for /metrics (any other path is not found) until it is closed.
+
+    === Attributes ===
+    simulation: the simulation whose metrics are exported
+    host: the address the server listens on
+    port: the port the server listens on
+    """
+    simulation: Simulation
+    host: str
+    port: int
+    _server: Optional[HTTPServer]
+    _thread: Optional[threading.Thread]
+
+    def __init__(self, simulation: Simulation, port: int = 9148,
+                 host: str = '127.0.0.1') -> None:
+        """Initialize an exporter for simulation, and start serving on the
+        given port of host, or on a free port if port is 0.
+        """
+        self.simulation = simulation
+        exporter = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            """Answer scrapes of this exporter."""
+
+            def do_GET(self) -> None:
+                """Send the metrics, if they were asked for."""
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', _CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                """Don't log every scrape to standard error."""
+
+        self._server = HTTPServer((host, port), _Handler)
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='metrics-exporter', daemon=True)
+        self._thread.start()
+
+    def render(self) -> str:
+        """Return the current metrics of the simulation in the Prometheus
+        text format.
+        """
+        sim = self.simulation
+        lines = []
+        _add_metric(lines, 'elevator_sim_round', 'gauge',
+                    'The number of rounds run so far.',
+                    [('', sim.results['num_iterations'])])
+        _add_metric(lines, 'elevator_sim_people_total', 'counter',
+                    'The number of people who arrived.',
+                    [('', sim.results['total_people'])])
+        _add_metric(lines, 'elevator_sim_people_completed_total', 'counter',
+                    'The number of people who reached their target floor.',
+                    [('', sim.results['people_completed'])])
+        _add_metric(lines, 'elevator_sim_queue_length', 'gauge',
+                    'The number of people waiting on each floor.',
+                    [(f'{{floor="{floor}"}}', len(people))
+                     for floor, people in list(sim.waiting.items())])
+        _add_metric(lines, 'elevator_sim_elevator_fullness', 'gauge',
+                    'The fraction of each elevator\'s capacity in use.',
+                    [(f'{{elevator="{i}"}}', elevator.fullness())
+                     for i, elevator in enumerate(sim.elevators)])
+
+        histogram = sim.wait_histogram
+        if histogram is not None:
+            # Read the totals first, so that a wait observed during the scrape
+            # never makes a bucket count larger than the total count.
+            total, count = histogram.total, histogram.count
+            cumulative = histogram.cumulative_counts()
+            bounds = [str(bound) for bound in histogram.bounds] + ['+Inf']
+            samples = [(f'_bucket{{le="{bound}"}}', min(value, count))
+                       for bound, value in zip(bounds, cumulative)]
+            samples[-1] = (samples[-1][0], count)
+            samples.extend([('_sum', total), ('_count', count)])
+            _add_metric(lines, 'elevator_sim_wait_rounds', 'histogram',
+                        'The number of rounds people waited before boarding.',
+                        samples)
+        return ''.join(lines)
+
+    def close(self) -> None:
+        """Stop the server and wait for its thread to finish."""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = self._thread = None
+
+    def __enter__(self) -> MetricsExporter:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def _add_metric(lines: List[str], name: str, kind: str, description: str,
+                samples: List[tuple]) -> None:
+    """Append the lines of a metric to lines.
+
+    samples is a list of (suffix, value) pairs, where each suffix is appended
+    to name, e.g. '{floor="3"}' or '_count'.
+    """
+    lines.append(f'# HELP {name} {description}\n# TYPE {name} {kind}\n')
+    lines.extend([f'{name}{suffix} {value}\n' for suffix, value in samples])
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-attributes': 12,
+        'extra-imports': ['http.server', 'threading', 'simulation'],
+        'max-nested-blocks': 4,
+        'disable': ['R0201']
+    })
@@ -0,0 +1,194 @@
+"""CSC148 Assignment 1 - Live Arrivals
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains LiveArrivals, an arrival generator that is fed by live
+(start, target) events instead of a pre-recorded CSV file. Events can be put
+directly on its asyncio queue, or read from a local TCP or Unix socket where
+each line has the form "start,target".
+
+Use it together with Simulation.run_async, which gives the event loop a chance
+to read new events between rounds:
+
+    arrivals = LiveArrivals(num_floors)
+    server = await arrivals.serve_tcp('127.0.0.1', 8148)
+    stats = await Simulation(config).run_async(num_rounds)
+"""
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from algorithms import ArrivalGenerator
+from entities import Person
+
+
+# What to do when producers put events faster than the simulation consumes
+# them and the queue is full.
+BLOCK = 'block'
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+POLICIES = (BLOCK, DROP_NEWEST, DROP_OLDEST)
+
+
+class LiveArrivals(ArrivalGenerator):
+    """Generate arrivals from live (start, target) events.
+
+    Every call to generate moves the events that arrived since the previous
+    round off the queue and turns them into people. It never waits for new
+    events, so a quiet feed simply produces rounds with no arrivals.
+
+    === Attributes ===
+    queue: the queue of (start, target) events that have not been turned into
+        people yet
+    policy: what happens when the queue is full: BLOCK makes producers wait
+        for room (backpressure), DROP_NEWEST discards the incoming event and
+        DROP_OLDEST discards the oldest queued event to make room for it
+    max_batch: the largest number of events turned into people in one round,
+        or None if every queued event is used
+    dropped: the number of events discarded because the queue was full
+    rejected: the number of events discarded because they were malformed or
+        their floors were outside the building
+
+    === Representation Invariants ===
+    policy in POLICIES
+    max_batch is None or max_batch >= 1
+    dropped >= 0
+    rejected >= 0
+    """
+    queue: asyncio.Queue
+    policy: str
+    max_batch: Optional[int]
+    dropped: int
+    rejected: int
+
+    def __init__(self, max_floor: int, max_queued: int = 0,
+                 policy: str = BLOCK, max_batch: Optional[int] = None) -> None:
+        """Initialize a new LiveArrivals generator.
+
+        max_queued is the capacity of the event queue; 0 means unbounded, in
+        which case the policy never applies.
+
+        Preconditions:
+            max_floor >= 2
+            max_queued >= 0
+            policy in POLICIES
+            max_batch is None or max_batch >= 1
+        """
+        ArrivalGenerator.__init__(self, max_floor, None)
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown queue policy {policy!r}.')
+        self.queue = asyncio.Queue(max_queued)
+        self.policy = policy
+        self.max_batch = max_batch
+        self.dropped = 0
+        self.rejected = 0
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """Refer to the Parent class
+
+        Only floors where at least one person arrived are included.
+        """
+        people = {}
+        count = 0
+        while not self.queue.empty():
+            if self.max_batch is not None and count == self.max_batch:
+                break
+            start, target = self.queue.get_nowait()
+            people.setdefault(start, []).append(
+                self._new_person(start, target))
+            count += 1
+        return people
+
+    def submit(self, start: int, target: int) -> bool:
+        """Add an event without waiting, and return whether it was queued.
+
+        This is meant for producers that can't await. When the queue is full,
+        the BLOCK policy can't make the producer wait, so the event is dropped
+        just like under DROP_NEWEST.
+        """
+        if not self._valid(start, target):
+            self.rejected += 1
+            return False
+        if self.queue.full():
+            if self.policy != DROP_OLDEST:
+                self.dropped += 1
+                return False
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait((start, target))
+        return True
+
+    async def put(self, start: int, target: int) -> bool:
+        """Add an event, and return whether it was queued.
+
+        Under the BLOCK policy this waits until the simulation has made room
+        for the event; the other policies never wait.
+        """
+        if self.policy != BLOCK:
+            return self.submit(start, target)
+        if not self._valid(start, target):
+            self.rejected += 1
+            return False
+        await self.queue.put((start, target))
+        return True
+
+    async def serve_tcp(self, host: str, port: int) -> asyncio.AbstractServer:
+        """Start accepting events on a local TCP socket, and return the server.
+        """
+        return await asyncio.start_server(self._handle_client, host, port)
+
+    async def serve_unix(self, path: str) -> asyncio.AbstractServer:
+        """Start accepting events on a Unix socket, and return the server."""
+        return await asyncio.start_unix_server(self._handle_client, path)
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        """Read "start,target" lines from a connection until it is closed.
+
+        Under the BLOCK policy, a full queue stops this connection from being
+        read, which in turn slows the producer down.
+        """
+        try:
+            async for line in reader:
+                if not line.strip():
+                    continue
+                event = _parse_event(line)
+                if event is None:
+                    self.rejected += 1
+                else:
+                    await self.put(*event)
+        finally:
+            writer.close()
+
+    def _valid(self, start: int, target: int) -> bool:
+        """Return whether an event describes a trip inside this building."""
+        return (1 <= start <= self.max_floor and
+                1 <= target <= self.max_floor and
+                start != target)
+
+
+def _parse_event(line: bytes) -> Optional[Tuple[int, int]]:
+    """Return the (start, target) pair on the given line, or None if the line
+    is malformed.
+    """
+    fields = line.split(b',')
+    if len(fields) != 2:
+        return None
+    try:
+        return int(fields[0]), int(fields[1])
+    except ValueError:
+        return None
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-attributes': 12,
+        'extra-imports': ['algorithms', 'entities', 'asyncio'],
+        'max-nested-blocks': 4,
+        'disable': ['R0201']
+    })
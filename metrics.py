@@ -0,0 +1,311 @@
+"""CSC148 Assignment 1 - Metrics
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains sinks for the per-round metrics of a simulation. Pass one
+to the simulation under the 'metrics_sink' config key, and it receives a
+record at the end of every round:
+
+    with JSONLMetricsWriter('rush_hour.jsonl') as sink:
+        config['metrics_sink'] = sink
+        Simulation(config).run(num_rounds)
+
+Recording a round is kept cheap: the simulation hands the sink its values
+as iterators rather than building lists, writers copy them into one flat
+buffer of ints, and every buffer_rows rounds they format the whole buffer
+at once, with a single %-format of a template repeated for every row. A sink
+can also ask for only every n-th round (its every attribute): the simulation
+then skips the rounds in between, and their counts are added to the next
+round recorded. bench_metrics in benchmark.py measures the overhead.
+
+It also contains WaitHistogram, which counts how long people waited before
+they boarded an elevator (pass one under the 'wait_histogram' config key).
+"""
+from __future__ import annotations
+from bisect import bisect_left
+from typing import Any, Iterable, List, Optional, TextIO
+
+
+class MetricsSink:
+    """A destination for the state of a simulation at the end of each round.
+
+    === Attributes ===
+    every: the interval between recorded rounds; the simulation records
+        rounds every - 1, 2 * every - 1, and so on, and the last round of
+        every run
+
+    === Representation Invariants ===
+    every >= 1
+    """
+    every: int = 1
+
+    def record(self, round_num: int, arrivals: int, boardings: int,
+               exits: int, queues: Iterable[int], floors: Iterable[int],
+               loads: Iterable[int], directions: Iterable[int]) -> None:
+        """Record one round of a simulation.
+
+        arrivals, boardings and exits count the people who arrived, boarded an
+        elevator and reached their target floor since the last round that was
+        recorded (during the round itself, if every is 1). queues yields
+        the number of people waiting on each floor, from floor 1 up. floors,
+        loads and directions yield each elevator's current_floor,
+        current_capacity and the value of the Direction it moved in.
+
+        The iterables are only valid during the call: a sink that keeps them
+        must copy them.
+        """
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Make sure every recorded round has reached its destination."""
+
+    def clear(self) -> None:
+        """Forget every round recorded so far, e.g. because the simulation is
+        starting over. This does nothing for a sink whose rounds are simply
+        recorded again.
+        """
+
+    def close(self) -> None:
+        """Flush this sink and release anything it holds on to."""
+        self.flush()
+
+    def __enter__(self) -> MetricsSink:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class _BufferedWriter(MetricsSink):
+    """A sink that writes rounds to a file, buffer_rows rounds at a time.
+
+    Each round's values are kept in one flat list, in the order record
+    receives them, and are written with a row template that has a %d for
+    each of them.
+
+    === Attributes ===
+    buffer_rows: the number of rounds kept in memory before they are written
+    """
+    buffer_rows: int
+    _file: Optional[TextIO]
+    _values: List[int]
+    _num_rows: int
+    _template: Optional[str]
+
+    def __init__(self, filename: str, buffer_rows: int = 8192,
+                 every: int = 1) -> None:
+        """Initialize a writer that (over)writes the given file with every
+        every-th round.
+
+        Precondition: buffer_rows >= 1 and every >= 1
+        """
+        self.buffer_rows = buffer_rows
+        self.every = every
+        self._file = open(filename, 'w', newline='', buffering=1 << 20)
+        self._values = []
+        self._num_rows = 0
+        self._template = None
+
+    def record(self, round_num: int, arrivals: int, boardings: int,
+               exits: int, queues: Iterable[int], floors: Iterable[int],
+               loads: Iterable[int], directions: Iterable[int]) -> None:
+        """Refer to the Parent class
+        """
+        if self._template is None:
+            # The first round decides how many floors and elevators each
+            # row has.
+            queues, floors = list(queues), list(floors)
+            self._template = self._row_template(len(queues), len(floors))
+        values = self._values
+        values.extend((round_num, arrivals, boardings, exits))
+        values.extend(queues)
+        values.extend(floors)
+        values.extend(loads)
+        values.extend(directions)
+        self._num_rows += 1
+        if self._num_rows >= self.buffer_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Refer to the Parent class
+        """
+        if self._file is None:
+            return
+        if self._num_rows:
+            self._file.write(
+                (self._template * self._num_rows) % tuple(self._values))
+            self._values = []
+            self._num_rows = 0
+        self._file.flush()
+
+    def clear(self) -> None:
+        """Refer to the Parent class
+        """
+        self._values = []
+        self._num_rows = 0
+        if self._file is not None:
+            self._file.seek(0)
+            self._file.truncate()
+
+    def close(self) -> None:
+        """Refer to the Parent class
+        """
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def _row_template(self, num_floors: int, num_elevators: int) -> str:
+        """Return the template of one row of a building with the given number
+        of floors and elevators, and write anything that comes before the
+        first row.
+        """
+        raise NotImplementedError
+
+
+class JSONLMetricsWriter(_BufferedWriter):
+    """Write each round as a JSON object on its own line, e.g.
+
+    {"round": 3, "arrivals": 2, "boardings": 1, "exits": 0,
+     "queues": [0, 1, 0], "floors": [2], "loads": [1], "directions": [1]}
+
+    (without the line break), where directions holds the values of each
+    elevator's Direction.
+    """
+
+    def _row_template(self, num_floors: int, num_elevators: int) -> str:
+        """Refer to the Parent class
+        """
+        # Every value is an int, so there is no need to go through the json
+        # module.
+        return ('{"round": %d, "arrivals": %d, "boardings": %d, "exits": %d, '
+                f'"queues": {_list_template(num_floors)}, '
+                f'"floors": {_list_template(num_elevators)}, '
+                f'"loads": {_list_template(num_elevators)}, '
+                f'"directions": {_list_template(num_elevators)}}}\n')
+
+
+def _list_template(length: int) -> str:
+    """Return the template of a JSON list of length ints."""
+    return '[' + ', '.join(['%d'] * length) + ']'
+
+
+class CSVMetricsWriter(_BufferedWriter):
+    """Write each round as a row of a CSV file.
+
+    The header is written with the first round, since the number of floor and
+    elevator columns depends on the simulation: round, arrivals, boardings,
+    exits, then queue_<floor> for every floor, then floor_<i> for every
+    elevator i, then load_<i> for every elevator, then direction_<i> for
+    every elevator.
+    """
+    _header: str
+    _header_written: bool
+
+    def __init__(self, filename: str, buffer_rows: int = 8192,
+                 every: int = 1) -> None:
+        """Initialize a writer that (over)writes the given file with every
+        every-th round.
+
+        Precondition: buffer_rows >= 1 and every >= 1
+        """
+        _BufferedWriter.__init__(self, filename, buffer_rows, every)
+        self._header = ''
+        self._header_written = False
+
+    def flush(self) -> None:
+        """Refer to the Parent class
+        """
+        if self._file is not None and not self._header_written and \
+                self._template is not None:
+            self._header_written = True
+            self._file.write(self._header)
+        _BufferedWriter.flush(self)
+
+    def clear(self) -> None:
+        """Refer to the Parent class
+        """
+        _BufferedWriter.clear(self)
+        self._header_written = False
+
+    def _row_template(self, num_floors: int, num_elevators: int) -> str:
+        """Refer to the Parent class
+        """
+        header = ['round', 'arrivals', 'boardings', 'exits']
+        header.extend(f'queue_{floor}' for floor in range(1, num_floors + 1))
+        for column in ['floor', 'load', 'direction']:
+            header.extend(f'{column}_{i}' for i in range(num_elevators))
+        self._header = ','.join(header) + '\n'
+        return ','.join(['%d'] * len(header)) + '\n'
+
+
+class WaitHistogram:
+    """A histogram of the number of rounds people waited before boarding.
+
+    A person's wait is their total_time when they board, so someone who
+    changes elevators is counted again, with the time since they first
+    arrived.
+
+    === Attributes ===
+    bounds: the inclusive upper bound of every bucket but the last, which
+        holds every longer wait
+    count: the number of waits observed
+    total: the sum of the waits observed
+
+    === Representation Invariants ===
+    bounds is sorted in increasing order
+    """
+    bounds: List[int]
+    count: int
+    total: int
+    _counts: List[int]
+
+    def __init__(self, bounds: Optional[List[int]] = None) -> None:
+        """Initialize an empty histogram with the given bucket bounds, or
+        with buckets that double in width from 1 round to 512 rounds.
+
+        Precondition: bounds is None or sorted in increasing order
+        """
+        self.bounds = ([0] + [2 ** i for i in range(10)] if bounds is None
+                       else list(bounds))
+        self.count = 0
+        self.total = 0
+        self._counts = [0] * (len(self.bounds) + 1)
+
+    def clear(self) -> None:
+        """Forget every wait observed so far."""
+        self._counts = [0] * len(self._counts)
+        self.count = 0
+        self.total = 0
+
+    def observe(self, wait: int) -> None:
+        """Count one person who waited for the given number of rounds."""
+        self._counts[bisect_left(self.bounds, wait)] += 1
+        self.count += 1
+        self.total += wait
+
+    def cumulative_counts(self) -> List[int]:
+        """Return, for every bucket, the number of waits observed that are at
+        most its bound; the last entry is the total count.
+        """
+        counts = list(self._counts)
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+        return counts
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-attributes': 12,
+        'allowed-io': ['__init__'],
+        'extra-imports': ['bisect'],
+        'max-nested-blocks': 4,
+        'disable': ['R0201']
+    })
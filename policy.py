@@ -0,0 +1,250 @@
+"""CSC148 Assignment 1 - Policy Tables
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains solve_policy, which computes a dispatch policy for a small
+building offline, write_policy and read_policy, which store it in a table
+file, and TablePolicy, a moving algorithm that follows a stored policy:
+
+    write_policy('six_floors.policy', solve_policy(6))
+    config['moving_algorithm'] = TablePolicy('six_floors.policy')
+
+It can also be run from the command line, e.g.
+
+    python policy.py six_floors.policy --floors 6
+
+The policy is solved for one elevator, in a model of the building where the
+state is the elevator's floor, the set of floors its passengers are going to
+(its car calls) and the set of floors where someone is waiting (its hall
+calls), so the number of people waiting on a floor is capped at one. The
+cost of a round is the number of car and hall calls left at the end of it,
+so the policy minimizes the total time people spend in the building. When
+the elevator stops at a hall call, whoever boards is going to any other floor
+with equal chance.
+
+No new arrivals are modelled, so the optimal policy is found by value
+iteration in a single pass: hall calls only ever disappear, and car calls
+only appear when a hall call does, so the states can be solved in an order
+where every state a move leads to has already converged, except for states
+with the same calls on other floors, which converge after at most one
+Bellman backup per floor.
+
+TablePolicy shares the hall calls out between the elevators (each goes to
+the closest elevator with room), and then looks each elevator's move up in
+the table.
+"""
+from __future__ import annotations
+import argparse
+from array import array
+import hashlib
+import struct
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from algorithms import Direction, MovingAlgorithm
+from entities import Elevator, Person
+
+
+# The start of every policy file: a magic string, then the number of floors.
+_HEADER = struct.Struct('<4sH')
+_MAGIC = b'ELVP'
+
+# The direction of each stored move.
+_DIRECTIONS = (Direction.DOWN, Direction.STAY, Direction.UP)
+
+
+def _popcount(mask: int) -> int:
+    """Return the number of bits set in mask."""
+    return bin(mask).count('1')
+
+
+def solve_policy(num_floors: int) -> bytes:
+    """Return the optimal policy for one elevator in a building with
+    num_floors floors, as a table of moves.
+
+    The move for an elevator on floor (0-based) f with car calls m and hall
+    calls h (as bit masks of 0-based floors) is at index
+    ((h << num_floors) | m) * num_floors + f, stored as 0 for down, 1 to
+    stay and 2 for up. States where f is in m or h never happen, since the
+    elevator's passengers for f have left and the people waiting on f have
+    boarded; their moves are those of the state without f.
+
+    The table has num_floors * 4 ** num_floors entries, and takes time in
+    proportion to it to solve.
+
+    Precondition: 2 <= num_floors <= 10
+    """
+    n = num_floors
+    size = n << (2 * n)
+    values = array('d', bytes(8 * size))
+    moves = bytearray(b'\x01' * size)
+    groups = sorted(range(1 << (2 * n)), key=_popcount)
+    for group in groups:
+        hall, cars = group >> n, group & ((1 << n) - 1)
+        base = group * n
+        cost = _popcount(hall) + _popcount(cars)
+        if cost == 0:
+            continue
+        # The expected value of stopping at each hall call, where someone
+        # boards for any other floor. Those states have fewer hall calls, so
+        # they have been solved already.
+        pickups = {}
+        for floor in range(n):
+            if hall >> floor & 1:
+                bit = 1 << floor
+                rest = ((hall & ~bit) << n) | (cars & ~bit)
+                total = 0.0
+                for target in range(n):
+                    if target != floor:
+                        total += values[(rest | 1 << target) * n + floor]
+                pickups[floor] = total / (n - 1)
+
+        # Bellman backups over the floors of this group until they converge,
+        # which takes at most one pass per floor.
+        for floor in range(n):
+            values[base + floor] = float('inf')
+        changed = True
+        while changed:
+            changed = False
+            for floor in range(n):
+                value, step = _backup(values, group, n, floor, pickups)
+                if cost + value < values[base + floor]:
+                    values[base + floor] = cost + value
+                    moves[base + floor] = step + 1
+                    changed = True
+    return bytes(moves)
+
+
+def _backup(values: array, group: int, n: int, floor: int,
+            pickups: Dict[int, float]) -> Tuple[float, int]:
+    """Return the lowest value of the states a move from floor leads to in
+    the given group of an n-floor building, and the step of that move.
+
+    pickups holds the expected value of stopping at each hall call.
+    """
+    best, best_step = float('inf'), 0
+    for step in (-1, 1):
+        other = floor + step
+        if not 0 <= other < n:
+            continue
+        bit = 1 << other
+        if other in pickups:
+            value = pickups[other]
+        elif group & bit:
+            # Its passengers for the other floor leave.
+            value = values[(group & ~bit) * n + other]
+        else:
+            value = values[group * n + other]
+        if value < best:
+            best, best_step = value, step
+    return best, best_step
+
+
+def write_policy(filename: str, table: bytes) -> None:
+    """Write a table returned by solve_policy to filename."""
+    num_floors = 2
+    while num_floors << (2 * num_floors) < len(table):
+        num_floors += 1
+    with open(filename, 'wb') as file:
+        file.write(_HEADER.pack(_MAGIC, num_floors))
+        file.write(table)
+
+
+def read_policy(filename: str) -> Dict[str, object]:
+    """Return the number of floors and the table of moves in the policy file
+    with the given name, under 'num_floors' and 'table'.
+    """
+    with open(filename, 'rb') as file:
+        data = file.read()
+    magic, num_floors = _HEADER.unpack_from(data)
+    table = data[_HEADER.size:]
+    if magic != _MAGIC or len(table) != num_floors << (2 * num_floors):
+        raise ValueError(f'{filename} is not a policy file')
+    return {'num_floors': num_floors, 'table': table}
+
+
+class TablePolicy(MovingAlgorithm):
+    """A moving algorithm that follows a policy table (see solve_policy).
+
+    === Attributes ===
+    num_floors: the number of floors the policy was solved for
+    """
+    num_floors: int
+    _table: bytes
+
+    def __init__(self, filename: str) -> None:
+        """Initialize an algorithm following the policy in the given file."""
+        policy = read_policy(filename)
+        self.num_floors = policy['num_floors']
+        self._table = policy['table']
+
+    def move_elevators(self, elevators: List[Elevator],
+                       waiting: Dict[int, List[Person]], max_floor: int) -> \
+            List[Direction]:
+        """Refer to the Parent class
+
+        Raise ValueError if max_floor is not the number of floors the policy
+        was made for.
+        """
+        n = self.num_floors
+        if max_floor != n:
+            raise ValueError(f'policy is for {n} floors, not {max_floor}')
+        halls = [0] * len(elevators)
+        for floor, people in waiting.items():
+            if not people:
+                continue
+            closest = None
+            for i, elevator in enumerate(elevators):
+                if elevator.current_capacity < elevator.maximum_capacity and (
+                        closest is None or
+                        abs(elevator.current_floor - floor) <
+                        abs(elevators[closest].current_floor - floor)):
+                    closest = i
+            if closest is not None:
+                halls[closest] |= 1 << (floor - 1)
+
+        elev_direction = []
+        for elevator, hall in zip(elevators, halls):
+            floor = elevator.current_floor - 1
+            cars = 0
+            for passenger in elevator.passengers:
+                cars |= 1 << (passenger.target - 1)
+            here = ~(1 << floor)
+            choice = _DIRECTIONS[self._table[
+                (((hall & here) << n) | (cars & here)) * n + floor]]
+            elev_direction.append(choice)
+            self.update_elevators(elevator, choice)
+        return elev_direction
+
+    def fingerprint(self) -> Optional[str]:
+        """Refer to the Parent class
+        """
+        digest = hashlib.sha256(self._table).hexdigest()
+        return f'TablePolicy {self.num_floors} {digest}'
+
+    def is_deterministic(self) -> bool:
+        """Refer to the Parent class
+        """
+        return True
+
+
+def main() -> None:
+    """Solve and write the policy described on the command line."""
+    parser = argparse.ArgumentParser(
+        description='Solve the dispatch policy of a small building.')
+    parser.add_argument('filename', help='the policy file to write')
+    parser.add_argument('--floors', type=int, required=True)
+    args = parser.parse_args()
+    if not 2 <= args.floors <= 10:
+        parser.error('the number of floors must be between 2 and 10')
+    write_policy(args.filename, solve_policy(args.floors))
+    print(f'Wrote the policy of a {args.floors}-floor building to '
+          f'{args.filename}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
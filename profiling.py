@@ -0,0 +1,231 @@
+"""CSC148 Assignment 1 - Profiling
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains Profiler, which profiles a simulation run when it is
+passed under the 'profile' config key:
+
+    profiler = Profiler()
+    config['profile'] = profiler
+    Simulation(config).run(num_rounds)
+    profiler.write_collapsed('run.folded')
+    profiler.write_report('run.txt')
+
+CPU time is measured by sampling: a background thread looks at the
+simulation's stack every interval seconds, and counts how often each stack
+is seen. write_collapsed writes the counts as collapsed stacks, one
+`frame;frame;...;frame count` line per stack, from the outermost frame in,
+which flamegraph.pl, speedscope or inferno turn into a flame graph. The
+outermost frame of every stack is the stage of the round the simulation was
+in, e.g. [boarding].
+
+If trace_memory is set, memory allocations are traced with tracemalloc, and
+for every stage the profiler adds up the memory it kept allocated (net) and
+the most it had allocated at once on top of that (transient, e.g. lists built
+and thrown away). Tracing memory can make the run ten times slower or
+more, so turn it off to profile CPU time alone; sampling barely slows the
+run down.
+
+write_report writes the functions the most samples were in, the memory of
+every stage, and the lines that had the most memory allocated when the run
+ended.
+"""
+from __future__ import annotations
+from collections import Counter
+import os
+import sys
+import threading
+import tracemalloc
+from types import CodeType
+from typing import Dict, List, Optional, TextIO
+
+
+# The stages of a round, in order.
+STAGES = ('arrivals', 'leaving', 'boarding', 'moving')
+
+
+class Profiler:
+    """A sampling CPU profiler and per-stage memory tracer for simulation
+    runs.
+
+    === Attributes ===
+    interval: the number of seconds between samples
+    trace_memory: whether memory allocations are traced
+    samples: the number of times each collapsed stack was sampled
+    stage_memory: the bytes each stage kept allocated (net) and allocated
+        on top of that at its peak (transient), added up over every round, as
+        [net, transient]
+
+    === Representation Invariants ===
+    interval > 0
+    """
+    interval: float
+    trace_memory: bool
+    samples: Counter
+    stage_memory: Dict[str, List[int]]
+    _stage: Optional[str]
+    _stage_start: int
+    _thread_id: Optional[int]
+    _root: Optional[CodeType]
+    _sampler: Optional[threading.Thread]
+    _stopping: threading.Event
+    _snapshot: Optional[tracemalloc.Snapshot]
+    _started_tracing: bool
+
+    def __init__(self, interval: float = 0.005,
+                 trace_memory: bool = True) -> None:
+        """Initialize a profiler that samples every interval seconds.
+
+        Precondition: interval > 0
+        """
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.samples = Counter()
+        self.stage_memory = {stage: [0, 0] for stage in STAGES}
+        self._stage = None
+        self._stage_start = 0
+        self._thread_id = None
+        self._root = None
+        self._sampler = None
+        self._stopping = threading.Event()
+        self._snapshot = None
+        self._started_tracing = False
+
+    def start(self) -> None:
+        """Start profiling the calling thread.
+
+        Sampled stacks start at the function that called this method (e.g.
+        Simulation.run), and samples and stage memory add up over every run
+        that is profiled.
+        """
+        if self._sampler is not None:
+            return
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._thread_id = threading.get_ident()
+        self._root = sys._getframe(1).f_code
+        self._stopping.clear()
+        self._sampler = threading.Thread(target=self._sample,
+                                         name='profiler', daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """Stop profiling, and take the snapshot of memory that the report
+        lists the top lines of.
+        """
+        if self._sampler is None:
+            return
+        self.enter(None)
+        self._stopping.set()
+        self._sampler.join()
+        self._sampler = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            self._snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__),
+                 tracemalloc.Filter(False, __file__)])
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    def enter(self, stage: Optional[str]) -> None:
+        """Record that the simulation left its current stage (if any) and
+        entered the given one (unless it is None).
+        """
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stage is not None:
+                memory = self.stage_memory[self._stage]
+                memory[0] += current - self._stage_start
+                memory[1] += peak - max(current, self._stage_start)
+            tracemalloc.reset_peak()
+            self._stage_start = current
+        self._stage = stage
+
+    def _sample(self) -> None:
+        """Sample the profiled thread's stack every interval seconds, until
+        the profiler is stopped.
+        """
+        while not self._stopping.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None or self._stage is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{os.path.basename(code.co_filename)}:'
+                             f'{getattr(code, "co_qualname", code.co_name)}')
+                frame = None if code is self._root else frame.f_back
+            names.append(f'[{self._stage}]')
+            self.samples[';'.join(reversed(names))] += 1
+
+    def write_collapsed(self, filename: str) -> None:
+        """Write the samples to filename as collapsed stacks."""
+        with open(filename, 'w') as file:
+            for stack, count in sorted(self.samples.items()):
+                file.write(f'{stack} {count}\n')
+
+    def top_functions(self, n: int = 10) -> List[tuple]:
+        """Return the n functions most samples were in, as (function, self
+        samples, total samples) tuples, by total samples.
+
+        A sample counts towards the total of every function on its stack, and
+        the self samples of the innermost one.
+        """
+        own = Counter()
+        total = Counter()
+        for stack, count in self.samples.items():
+            names = stack.split(';')[1:]
+            own[names[-1]] += count
+            for name in set(names):
+                total[name] += count
+        return [(name, own[name], count)
+                for name, count in total.most_common(n)]
+
+    def write_report(self, filename: str, n: int = 10) -> None:
+        """Write a report of the n hottest functions and lines to filename."""
+        with open(filename, 'w') as file:
+            self._write_report(file, n)
+
+    def _write_report(self, file: TextIO, n: int) -> None:
+        """Write a report of the n hottest functions and lines to file."""
+        num_samples = sum(self.samples.values())
+        file.write(f'CPU: {num_samples} samples, one every '
+                   f'{self.interval * 1000:g} ms\n')
+        file.write(f'{"self %":>8}{"total %":>9}  function\n')
+        for name, own, total in self.top_functions(n):
+            file.write(f'{100 * own / num_samples:8.1f}'
+                       f'{100 * total / num_samples:9.1f}  {name}\n')
+
+        if not self.trace_memory:
+            return
+        file.write('\nMemory by stage, over every round (KiB)\n')
+        file.write(f'{"stage":<10}{"net":>12}{"transient":>12}\n')
+        for stage, (net, transient) in self.stage_memory.items():
+            file.write(f'{stage:<10}{net / 1024:12.1f}'
+                       f'{transient / 1024:12.1f}\n')
+        if self._snapshot is not None:
+            file.write('\nMemory still allocated when the run ended\n')
+            file.write(f'{"KiB":>10}{"blocks":>9}  line\n')
+            for stat in self._snapshot.statistics('lineno')[:n]:
+                frame = stat.traceback[0]
+                file.write(f'{stat.size / 1024:10.1f}{stat.count:9}  '
+                           f'{os.path.basename(frame.filename)}:'
+                           f'{frame.lineno}\n')
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-attributes': 12,
+        'allowed-io': ['write_collapsed', 'write_report'],
+        'extra-imports': ['collections', 'os', 'sys', 'threading',
+                          'tracemalloc', 'types'],
+        'max-nested-blocks': 4,
+        'disable': ['R0201', 'W0212']
+    })
@@ -0,0 +1,240 @@
+"""CSC148 Assignment 1 - Remote Renderer
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains RemoteVisualizer, which shows a simulation in a separate
+renderer process, so that drawing never slows the simulation down. Set the
+'visualize' config key to 'remote' to use it:
+
+    config['visualize'] = 'remote'
+    sim = Simulation(config)
+    sim.run(num_rounds)
+    sim.visualizer.close()
+
+The simulation itself runs headless. At the end of every round, the
+RemoteVisualizer sends the renderer what changed since the last frame it
+sent: the round number, and the (index, value) pairs of every elevator floor,
+elevator load and floor queue length that changed. The renderer shows each
+frame with a Visualizer, then asks for the next one.
+
+Only one frame is ever in flight: while the renderer is still drawing, the
+rounds that end are not sent, and the next frame sent holds everything that
+changed since the last one. So a slow renderer skips rounds instead of
+holding the simulation back or falling further and further behind.
+"""
+from __future__ import annotations
+import multiprocessing
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from algorithms import Direction
+from entities import Elevator, Person, CompactElevator
+from visualizer import Visualizer
+
+
+# The most distinct people the renderer creates for a floor or an elevator,
+# so that long queues don't make frames slow to draw.
+MAX_SHOWN = 10
+
+
+def _changes(old: List[int], new: List[int]) -> List[Tuple[int, int]]:
+    """Return the (index, value) pairs of new where it differs from old."""
+    return [(i, value) for i, (before, value) in enumerate(zip(old, new))
+            if before != value]
+
+
+class RemoteVisualizer:
+    """A visualizer that sends the state of a simulation to a renderer
+    process at the end of every round.
+
+    It has the same methods as Visualizer, so a Simulation can use either;
+    only show_elevator_moves and show_state send anything. Call close once
+    the simulation is over, to show its final state and stop the renderer.
+
+    === Attributes ===
+    frames_sent: the number of frames sent to the renderer
+    frames_skipped: the number of rounds that weren't sent because the
+        renderer was still drawing
+    """
+    frames_sent: int
+    frames_skipped: int
+    _elevators: List[CompactElevator]
+    _waiting: Dict[int, List[Any]]
+    _round_num: int
+    _sent: Tuple[List[int], List[int], List[int]]
+    _connection: Optional[Any]
+    _process: Optional[multiprocessing.Process]
+    _ready: bool
+
+    def __init__(self, elevators: List[CompactElevator],
+                 waiting: Dict[int, List[Any]]) -> None:
+        """Initialize this visualizer of the given elevators and waiting
+        lists, and start its renderer process.
+
+        Precondition: waiting holds a list for every floor, from floor 1 up
+        """
+        num_floors = len(waiting)
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self._elevators = elevators
+        self._waiting = waiting
+        self._round_num = 0
+        # The renderer starts with every elevator empty on floor 1, so the
+        # first frame places them.
+        self._sent = ([1] * len(elevators), [0] * len(elevators),
+                      [0] * num_floors)
+        self._connection, theirs = multiprocessing.Pipe()
+        capacity = elevators[0].maximum_capacity if elevators else 1
+        self._process = multiprocessing.Process(
+            target=_render, args=(theirs, len(elevators), num_floors,
+                                  capacity),
+            name='elevator-renderer', daemon=True)
+        self._process.start()
+        theirs.close()
+        self._ready = True
+        self._send(True)
+
+    def render_header(self, round_num: int) -> None:
+        """Refer to Visualizer"""
+        self._round_num = round_num
+
+    def show_arrivals(self, arrivals: Dict[int, List[Any]]) -> None:
+        """Refer to Visualizer"""
+
+    def show_boarding(self, person: Any, elevator: Any) -> None:
+        """Refer to Visualizer"""
+
+    def show_disembarking(self, person: Any, elevator: Any) -> None:
+        """Refer to Visualizer"""
+
+    def remove_person(self, person: Any) -> None:
+        """Refer to Visualizer"""
+
+    def wait(self, wait_time: int) -> None:
+        """Don't wait: the renderer keeps its own pace."""
+
+    def show_elevator_moves(self, elevators: List[CompactElevator],
+                            directions: List[Direction]) -> None:
+        """Send the state at the end of this round to the renderer, unless it
+        is still drawing the last frame.
+        """
+        self._send(False)
+
+    def show_state(self, elevators: List[CompactElevator],
+                   waiting: Dict[int, List[Any]]) -> None:
+        """Send the given state to the renderer, waiting for it to be ready
+        if it is still drawing.
+        """
+        self._waiting = waiting
+        self._send(True)
+
+    def close(self) -> None:
+        """Send the current state, then stop the renderer once it has drawn
+        it.
+        """
+        if self._connection is None:
+            return
+        self._send(True)
+        try:
+            self._connection.send(None)
+        except (BrokenPipeError, EOFError, OSError):
+            pass
+        self._process.join()
+        self._connection.close()
+        self._connection = self._process = None
+
+    def _send(self, wait: bool) -> None:
+        """Send what changed since the last frame to the renderer, if it is
+        ready for it, or always if wait is True.
+        """
+        if self._connection is None:
+            return
+        try:
+            while not self._ready and (wait or self._connection.poll()):
+                self._ready = self._connection.recv()
+        except (BrokenPipeError, EOFError, OSError):
+            # The renderer has exited; keep simulating without it.
+            self._connection = None
+            return
+        if not self._ready:
+            self.frames_skipped += 1
+            return
+
+        floors = [elevator.current_floor for elevator in self._elevators]
+        loads = [elevator.current_capacity for elevator in self._elevators]
+        queues = [len(people) for people in self._waiting.values()]
+        frame = (self._round_num, _changes(self._sent[0], floors),
+                 _changes(self._sent[1], loads),
+                 _changes(self._sent[2], queues))
+        try:
+            self._connection.send(frame)
+        except (BrokenPipeError, EOFError, OSError):
+            self._connection = None
+            return
+        self._sent = (floors, loads, queues)
+        self._ready = False
+        self.frames_sent += 1
+
+
+def _render(connection: Any, num_elevators: int, num_floors: int,
+            capacity: int) -> None:
+    """Draw the frames received on connection until None is received,
+    answering True after each frame.
+    """
+    if hasattr(os, 'nice'):
+        # When there aren't enough CPUs for both processes, the renderer is
+        # the one that should fall behind.
+        os.nice(10)
+    elevators = [Elevator(capacity) for _ in range(num_elevators)]
+    visualizer = Visualizer(elevators, num_floors, True)
+    queues = [0] * num_floors
+    # Person sprites are slow to create, so the ones shown are reused from
+    # frame to frame.
+    people = []
+    while True:
+        frame = connection.recv()
+        if frame is None:
+            break
+        round_num, floor_changes, load_changes, queue_changes = frame
+        for i, floor in floor_changes:
+            elevators[i].current_floor = floor
+        for i, load in load_changes:
+            elevators[i].current_capacity = load
+        for i, length in queue_changes:
+            queues[i] = length
+
+        counts = [elevator.current_capacity for elevator in elevators] + \
+            queues
+        shown = [min(count, MAX_SHOWN) for count in counts]
+        while len(people) < sum(shown):
+            people.append(Person(1, 1))
+        # Beyond the people shown, a group is padded out with the first of
+        # them, so that the visualizer's count badges are right.
+        groups = []
+        start = 0
+        for count, num_shown in zip(counts, shown):
+            group = people[start:start + num_shown]
+            groups.append(group + group[:1] * (count - num_shown))
+            start += num_shown
+        for elevator, passengers in zip(elevators, groups):
+            elevator.passengers = passengers
+        waiting = dict(enumerate(groups[num_elevators:], 1))
+        visualizer.render_header(round_num)
+        visualizer.show_state(elevators, waiting)
+        connection.send(True)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-attributes': 12,
+        'extra-imports': ['algorithms', 'entities', 'visualizer',
+                          'multiprocessing', 'os'],
+        'max-nested-blocks': 4,
+        'disable': ['R0201']
+    })
@@ -0,0 +1,394 @@
+"""CSC148 Assignment 1 - Replay
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains Replay, which plays a run recorded in an event log (see
+eventlog.py) back into a Visualizer. It doesn't need the Simulation, the
+moving algorithm or the arrival generator that produced the run: everything
+it shows comes from the recorded events.
+
+When a Replay is created, it reads the log once and keeps a keyframe (the
+full state of the building) every keyframe_interval rounds. Seeking to a
+round starts from the keyframe before it and applies at most
+keyframe_interval rounds of events, so any round of a long run can be shown
+almost immediately.
+
+It can also be run from the command line, e.g.
+
+    python replay.py run.events --floors 5 --elevators 2 --capacity 10
+        --start 90000 --speed 4
+"""
+from __future__ import annotations
+import argparse
+from array import array
+import time
+from typing import Dict, List, Optional
+
+import pygame
+from algorithms import Direction
+import eventlog
+import sprites
+from visualizer import Visualizer
+
+
+class _State:
+    """The state of the building at the start of a round.
+
+    === Attributes ===
+    floors: the floor each elevator is on
+    riding: the uids of the people on each elevator, in boarding order
+    waiting: the uids of the people waiting on each floor, in arrival order
+    arrived: the round each person in the building arrived in, by uid
+    """
+    floors: List[int]
+    riding: List[List[int]]
+    waiting: Dict[int, List[int]]
+    arrived: Dict[int, int]
+
+    def __init__(self, num_floors: int, num_elevators: int) -> None:
+        """Initialize the state of an empty building."""
+        self.floors = [1] * num_elevators
+        self.riding = [[] for _ in range(num_elevators)]
+        self.waiting = {floor: [] for floor in range(1, num_floors + 1)}
+        self.arrived = {}
+
+    def copy(self) -> _State:
+        """Return a copy of this state that doesn't share any lists."""
+        other = _State(0, 0)
+        other.floors = list(self.floors)
+        other.riding = [list(people) for people in self.riding]
+        other.waiting = {floor: list(people)
+                         for floor, people in self.waiting.items()}
+        other.arrived = dict(self.arrived)
+        return other
+
+    def apply(self, event: eventlog.Event) -> None:
+        """Update this state with the given event."""
+        round_num, kind, person, floor, elevator = event
+        if kind == eventlog.ARRIVAL:
+            self.waiting[floor].append(person)
+            self.arrived[person] = round_num
+        elif kind == eventlog.BOARDING:
+            self.waiting[floor].remove(person)
+            self.riding[elevator].append(person)
+        elif kind == eventlog.EXIT:
+            self.riding[elevator].remove(person)
+            del self.arrived[person]
+        elif kind in (eventlog.MOVE, eventlog.START):
+            self.floors[elevator] = floor
+
+
+class _ReplayElevator(sprites.ElevatorSprite):
+    """An elevator shown by a Replay.
+
+    === Attributes ===
+    current_floor: the floor the elevator is on
+    passengers: the people on this elevator
+    current_capacity: the number of people on this elevator
+    maximum_capacity: the number of people this elevator can hold
+    """
+    current_floor: int
+    passengers: List[_ReplayPerson]
+    current_capacity: int
+    maximum_capacity: int
+
+    def __init__(self, maximum_capacity: int) -> None:
+        """Initialize an empty elevator on the first floor."""
+        self.current_floor = 1
+        self.passengers = []
+        self.current_capacity = 0
+        self.maximum_capacity = maximum_capacity
+        sprites.ElevatorSprite.__init__(self)
+
+    def fullness(self) -> float:
+        """Return how full the elevator is
+        """
+        return min(self.current_capacity / self.maximum_capacity, 1.0)
+
+
+class _ReplayPerson(sprites.PersonSprite):
+    """A person shown by a Replay, whose anger level comes from the number of
+    rounds since they arrived.
+
+    === Attributes ===
+    arrived: the round this person arrived in
+    replay: the replay showing this person
+    """
+    arrived: int
+    replay: Replay
+
+    # The scaled image for each anger level. Every replayed person shares
+    # them, instead of loading their own from disk every round.
+    _images: Dict[int, pygame.Surface] = {}
+
+    def __init__(self, arrived: int, replay: Replay) -> None:
+        """Initialize a person who arrived in the given round."""
+        self.arrived = arrived
+        self.replay = replay
+        sprites.PersonSprite.__init__(self)
+
+    def get_anger_level(self) -> int:
+        """Return this person's anger level, using the same thresholds as
+        Person.
+        """
+        waited = self.replay.round_num - self.arrived
+        if waited < 3:
+            return 0
+        elif waited < 5:
+            return 1
+        elif waited < 7:
+            return 2
+        elif waited < 9:
+            return 3
+        else:
+            return 4
+
+    def load_image(self) -> pygame.Surface:
+        """Return the (shared) image for this person's anger level."""
+        level = self.get_anger_level()
+        if level not in self._images:
+            self._images[level] = sprites.PersonSprite.load_image(self)
+        return self._images[level]
+
+
+class Replay:
+    """Play a recorded event log back into a Visualizer.
+
+    === Attributes ===
+    num_rounds: the number of rounds in the recording; rounds after the last
+        recorded event aren't part of it
+    keyframe_interval: the number of rounds between two keyframes
+    round_num: the round that will be shown next
+    visualizer: the visualizer the recording is played into
+
+    === Representation Invariants ===
+    keyframe_interval >= 1
+    0 <= round_num <= num_rounds
+    """
+    num_rounds: int
+    keyframe_interval: int
+    round_num: int
+    visualizer: Visualizer
+    _data: bytes
+    _round_starts: array
+    _keyframes: List[_State]
+    _state: _State
+    _elevators: List[_ReplayElevator]
+    _people: Dict[int, _ReplayPerson]
+
+    def __init__(self, filename: str, num_floors: int, num_elevators: int,
+                 elevator_capacity: int, keyframe_interval: int = 1000,
+                 visualize: bool = True) -> None:
+        """Initialize a replay of the given event log, and show its first round.
+
+        num_floors, num_elevators and elevator_capacity must describe the
+        building the recorded simulation ran in.
+
+        Preconditions:
+            num_floors >= 2
+            num_elevators >= 1
+            elevator_capacity >= 1
+            keyframe_interval >= 1
+        """
+        with open(filename, 'rb') as file:
+            self._data = file.read()
+        self.keyframe_interval = keyframe_interval
+        self._index(num_floors, num_elevators)
+
+        self._elevators = [_ReplayElevator(elevator_capacity)
+                           for _ in range(num_elevators)]
+        self.visualizer = Visualizer(self._elevators, num_floors, visualize)
+        self.seek(0)
+
+    def _index(self, num_floors: int, num_elevators: int) -> None:
+        """Find where each round's events start in the log, and take a
+        keyframe every keyframe_interval rounds.
+        """
+        state = _State(num_floors, num_elevators)
+        self._round_starts = array('Q')
+        self._keyframes = []
+        i = -1
+        for i, event in enumerate(eventlog.EVENT_FORMAT.iter_unpack(
+                self._data)):
+            # The START events describe the building before round 0 starts,
+            # so they are part of its keyframe rather than its events.
+            if event[1] != eventlog.START:
+                while len(self._round_starts) <= event[0]:
+                    self._start_round(state, i)
+            state.apply(event)
+
+        # There is one more start than rounds, so that the events of the
+        # last round also end somewhere, and seek can go past the last round.
+        self.num_rounds = len(self._round_starts)
+        while len(self._round_starts) <= self.num_rounds:
+            self._start_round(state, i + 1)
+
+    def _start_round(self, state: _State, first_event: int) -> None:
+        """Record that the next round starts at the given event, with the
+        building in the given state.
+        """
+        if len(self._round_starts) % self.keyframe_interval == 0:
+            self._keyframes.append(state.copy())
+        self._round_starts.append(first_event)
+
+    def _events(self, first_round: int,
+                last_round: int) -> List[eventlog.Event]:
+        """Return the events from the start of first_round up to (but not
+        including) the start of last_round.
+        """
+        start = self._round_starts[first_round] * eventlog.EVENT_SIZE
+        end = self._round_starts[last_round] * eventlog.EVENT_SIZE
+        return list(eventlog.EVENT_FORMAT.iter_unpack(self._data[start:end]))
+
+    def seek(self, round_num: int) -> None:
+        """Jump to the start of the given round and show it.
+
+        Precondition: 0 <= round_num <= self.num_rounds
+        """
+        keyframe = round_num // self.keyframe_interval
+        self._state = self._keyframes[keyframe].copy()
+        for event in self._events(keyframe * self.keyframe_interval,
+                                  round_num):
+            self._state.apply(event)
+        self.round_num = round_num
+
+        self._people = {}
+        for elevator, floor, riding in zip(self._elevators,
+                                           self._state.floors,
+                                           self._state.riding):
+            elevator.current_floor = floor
+            elevator.passengers = [self._person(uid) for uid in riding]
+            elevator.current_capacity = len(riding)
+        self._show_state()
+
+    def play(self, num_rounds: Optional[int] = None,
+             speed: float = 1.0) -> None:
+        """Play num_rounds rounds from the current one, or every remaining
+        round if num_rounds is None.
+
+        speed is the number of rounds played per second. Rounds are animated
+        like in a simulation when speed <= 1; faster than that, each round is
+        drawn once, after all of its events.
+
+        Precondition: speed > 0
+        """
+        end = self.num_rounds
+        if num_rounds is not None:
+            end = min(end, self.round_num + num_rounds)
+        while self.round_num < end:
+            start = time.perf_counter()
+            self.step(animate=speed <= 1)
+            self.visualizer.wait(
+                max(1 / speed - (time.perf_counter() - start), 0))
+
+    def step(self, animate: bool = True) -> None:
+        """Play the current round, and move on to the next one.
+
+        Precondition: self.round_num < self.num_rounds
+        """
+        self.visualizer.render_header(self.round_num)
+        arrivals = {}
+        moves = [Direction.STAY] * len(self._elevators)
+        for event in self._events(self.round_num, self.round_num + 1):
+            _, kind, uid, floor, elevator_id = event
+            self._state.apply(event)
+            if kind == eventlog.ARRIVAL:
+                arrivals.setdefault(floor, []).append(self._person(uid))
+                continue
+            if arrivals:
+                self._show_arrivals(arrivals, animate)
+                arrivals = {}
+
+            elevator = self._elevators[elevator_id]
+            if kind == eventlog.BOARDING:
+                person = self._people[uid]
+                elevator.current_capacity += 1
+                if animate:
+                    self.visualizer.show_boarding(person, elevator)
+                elevator.passengers.append(person)
+            elif kind == eventlog.EXIT:
+                person = self._people.pop(uid)
+                elevator.current_capacity -= 1
+                elevator.passengers.remove(person)
+                if animate:
+                    self.visualizer.show_disembarking(person, elevator)
+                self.visualizer.remove_person(person)
+            elif kind == eventlog.MOVE:
+                if floor > elevator.current_floor:
+                    moves[elevator_id] = Direction.UP
+                else:
+                    moves[elevator_id] = Direction.DOWN
+                elevator.current_floor = floor
+
+        if arrivals:
+            self._show_arrivals(arrivals, animate)
+        if animate:
+            self.visualizer.show_elevator_moves(self._elevators, moves)
+        else:
+            self._show_state()
+        self.round_num += 1
+
+    def waiting_counts(self) -> List[int]:
+        """Return the number of people waiting on each floor, from floor 1 up,
+        at the start of the current round.
+        """
+        return [len(people) for people in self._state.waiting.values()]
+
+    def elevator_floors(self) -> List[int]:
+        """Return the floor each elevator is on at the start of the current
+        round.
+        """
+        return list(self._state.floors)
+
+    def _person(self, uid: int) -> _ReplayPerson:
+        """Return the sprite of the person with the given uid, creating it if
+        this person isn't shown yet.
+        """
+        if uid not in self._people:
+            self._people[uid] = _ReplayPerson(self._state.arrived[uid], self)
+        return self._people[uid]
+
+    def _show_arrivals(self, arrivals: Dict[int, List[_ReplayPerson]],
+                       animate: bool) -> None:
+        """Show new arrivals, unless the whole round is drawn at once anyway.
+        """
+        if animate:
+            self.visualizer.show_arrivals(arrivals)
+
+    def _show_state(self) -> None:
+        """Draw the whole building as it is at the start of the current round.
+        """
+        waiting = {floor: [self._person(uid) for uid in people]
+                   for floor, people in self._state.waiting.items()}
+        self.visualizer.show_state(self._elevators, waiting)
+
+
+def main() -> None:
+    """Replay an event log given on the command line."""
+    parser = argparse.ArgumentParser(
+        description='Play a recorded simulation back into the visualizer.')
+    parser.add_argument('filename', help='the event log to play')
+    parser.add_argument('--floors', type=int, required=True)
+    parser.add_argument('--elevators', type=int, required=True)
+    parser.add_argument('--capacity', type=int, required=True)
+    parser.add_argument('--start', type=int, default=0,
+                        help='the round to start playing from')
+    parser.add_argument('--rounds', type=int, default=None,
+                        help='the number of rounds to play (default: all)')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='rounds per second')
+    parser.add_argument('--keyframe-interval', type=int, default=1000)
+    args = parser.parse_args()
+
+    replay = Replay(args.filename, args.floors, args.elevators, args.capacity,
+                    args.keyframe_interval)
+    replay.seek(min(args.start, replay.num_rounds))
+    replay.play(args.rounds, args.speed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""CSC148 Assignment 1 - Shared Traces
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains SharedTrace, which parses an arrival trace in the CSV
+format of FileArrivals once, into a compact layout in a
+multiprocessing.shared_memory block, and SharedTraceArrivals, an arrival
+generator that reads a shared trace in place.
+
+A SharedTraceArrivals pickles as little more than the name of the block, so
+any number of worker processes can run simulations of the same trace while
+sharing one copy of it:
+
+    with SharedTrace('rush_hour.csv') as trace:
+        config['arrival_generator'] = trace.arrivals(num_floors)
+        results = replicate(config, num_rounds, 'p95', 0.05)
+
+The block holds, as unsigned integers:
+
+    num_rounds                 64-bit   one more than the last round in the
+                                        trace
+    num_people                 64-bit   the number of people in the trace
+    offsets[num_rounds + 1]    64-bit   the people arriving in round r are
+                                        people offsets[r] to offsets[r + 1]
+    floors[2 * num_people]     16-bit   the start and target floor of each
+                                        person, in order of arrival
+"""
+from __future__ import annotations
+from array import array
+import csv
+import hashlib
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+from algorithms import ArrivalGenerator
+from entities import Person
+
+
+_HEADER_SIZE = 16
+
+
+def _layout(buffer: memoryview) -> Tuple[int, memoryview, memoryview]:
+    """Return the number of rounds, the offsets and the floors of the trace
+    in the given shared memory buffer.
+    """
+    num_rounds, num_people = buffer[:_HEADER_SIZE].cast('Q')
+    floors_start = _HEADER_SIZE + (num_rounds + 1) * 8
+    offsets = buffer[_HEADER_SIZE:floors_start].cast('Q')
+    floors = buffer[floors_start:floors_start + num_people * 4].cast('H')
+    return num_rounds, offsets, floors
+
+
+class SharedTrace:
+    """An arrival trace loaded into shared memory, owned by the process that
+    loaded it.
+
+    === Attributes ===
+    name: the name of the shared memory block holding the trace
+    num_rounds: one more than the last round anyone arrives in
+    num_people: the number of people in the trace
+
+    === Representation Invariants ===
+    num_rounds >= 0
+    num_people >= 0
+    """
+    name: str
+    num_rounds: int
+    num_people: int
+    _memory: Optional[shared_memory.SharedMemory]
+
+    def __init__(self, filename: str) -> None:
+        """Load the trace in the given file into a new shared memory block.
+
+        Lines may come in any order, and several lines may have the same
+        round; people arrive in the order of the lines they are on.
+
+        Precondition: every floor in the file is between 1 and 65535
+        """
+        line_rounds = array('Q')
+        line_ends = array('Q')
+        floors = array('H')
+        with open(filename, 'r') as csvfile:
+            for line in csv.reader(csvfile):
+                if not line:
+                    continue
+                if len(line) % 2 == 0:
+                    raise ValueError('Incorrect number of inputs in csv file.')
+                line_rounds.append(int(line[0]))
+                floors.extend(map(int, line[1:]))
+                line_ends.append(len(floors) // 2)
+
+        self.num_rounds = max(line_rounds, default=-1) + 1
+        self.num_people = len(floors) // 2
+        if any(line_rounds[i] > line_rounds[i + 1]
+               for i in range(len(line_rounds) - 1)):
+            floors = self._sort_lines(line_rounds, line_ends, floors)
+            line_rounds = array('Q', sorted(line_rounds))
+
+        offsets = array('Q', bytes(8 * (self.num_rounds + 1)))
+        line = 0
+        for round_num in range(self.num_rounds):
+            while line < len(line_rounds) and line_rounds[line] == round_num:
+                line += 1
+            offsets[round_num + 1] = line_ends[line - 1] if line else 0
+
+        self._memory = shared_memory.SharedMemory(
+            create=True,
+            size=_HEADER_SIZE + len(offsets) * 8 + len(floors) * 2)
+        self.name = self._memory.name
+        buffer = self._memory.buf
+        buffer[:_HEADER_SIZE].cast('Q')[:] = array(
+            'Q', [self.num_rounds, self.num_people])
+        _, shared_offsets, shared_floors = _layout(buffer)
+        shared_offsets[:] = offsets
+        shared_floors[:] = floors
+        shared_offsets.release()
+        shared_floors.release()
+
+    @staticmethod
+    def _sort_lines(line_rounds: array, line_ends: array,
+                    floors: array) -> array:
+        """Return floors with its lines stably sorted by round, and make
+        line_ends match the sorted lines.
+        """
+        order = sorted(range(len(line_rounds)), key=line_rounds.__getitem__)
+        ends = line_ends.tolist()
+        starts = [0] + ends[:-1]
+        sorted_floors = array('H')
+        for i, line in enumerate(order):
+            sorted_floors.extend(floors[2 * starts[line]:2 * ends[line]])
+            line_ends[i] = len(sorted_floors) // 2
+        return sorted_floors
+
+    def arrivals(self, max_floor: int) -> SharedTraceArrivals:
+        """Return an arrival generator for this trace in a building with the
+        given number of floors.
+
+        Precondition: every floor in the trace is at most max_floor
+        """
+        return SharedTraceArrivals(max_floor, self.name)
+
+    def close(self) -> None:
+        """Free the shared memory block holding this trace.
+
+        Generators of this trace must not be used afterwards, in any process.
+        """
+        if self._memory is None:
+            return
+        self._memory.close()
+        self._memory.unlink()
+        self._memory = None
+
+    def __enter__(self) -> SharedTrace:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class SharedTraceArrivals(ArrivalGenerator):
+    """Generate arrivals from a trace in shared memory.
+
+    The block is attached the first time arrivals are generated, in whichever
+    process that happens, and is never copied: only its name is pickled.
+
+    === Attributes ===
+    name: the name of the shared memory block holding the trace
+    """
+    name: str
+    _memory: Optional[shared_memory.SharedMemory]
+    _num_rounds: int
+    _offsets: Optional[memoryview]
+    _floors: Optional[memoryview]
+
+    def __init__(self, max_floor: int, name: str) -> None:
+        """Initialize a generator of the trace in the shared memory block with
+        the given name.
+
+        The num_people attribute of every SharedTraceArrivals instance is set
+        to None, since the number of arrivals depends on the trace.
+
+        Precondition: max_floor >= 2
+        """
+        ArrivalGenerator.__init__(self, max_floor, None)
+        self.name = name
+        self._memory = None
+        self._num_rounds = 0
+        self._offsets = None
+        self._floors = None
+
+    def _attach(self) -> None:
+        """Attach this generator to the shared memory block, unless it
+        already is.
+        """
+        if self._memory is None:
+            self._memory = shared_memory.SharedMemory(name=self.name)
+            self._num_rounds, self._offsets, self._floors = _layout(
+                self._memory.buf)
+
+    def generate(self, round_num: int) -> Dict[int, List[Person]]:
+        """Refer to the Parent class
+
+        Only floors where at least one person arrived are included.
+        """
+        self._attach()
+        if round_num >= self._num_rounds:
+            return {}
+        floors = self._floors
+        people = {}
+        for i in range(2 * self._offsets[round_num],
+                       2 * self._offsets[round_num + 1], 2):
+            people.setdefault(floors[i], []).append(
+                self._new_person(floors[i], floors[i + 1]))
+        return people
+
+    def fingerprint(self) -> Optional[str]:
+        """Refer to the Parent class
+        """
+        self._attach()
+        # The block may be larger than the trace, which ends with its floors.
+        size = _HEADER_SIZE + self._offsets.nbytes + self._floors.nbytes
+        digest = hashlib.sha256(self._memory.buf[:size]).hexdigest()
+        return f'SharedTraceArrivals {self.max_floor} {digest}'
+
+    def is_deterministic(self) -> bool:
+        """Refer to the Parent class
+        """
+        return True
+
+    def close(self) -> None:
+        """Detach this generator from the shared memory block.
+
+        It attaches again if it is used afterwards.
+        """
+        if self._memory is None:
+            return
+        self._offsets.release()
+        self._floors.release()
+        self._offsets = self._floors = None
+        self._memory.close()
+        self._memory = None
+
+    def __del__(self) -> None:
+        # The views into the block have to be released before it is closed,
+        # which SharedMemory would otherwise try first when it is collected.
+        self.close()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        state.update(person_pool=None, _memory=None, _num_rounds=0,
+                     _offsets=None, _floors=None)
+        return state
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-attributes': 12,
+        'allowed-io': ['__init__'],
+        'extra-imports': ['algorithms', 'entities', 'array', 'csv',
+                          'hashlib', 'multiprocessing'],
+        'max-nested-blocks': 4,
+        'disable': ['R0201']
+    })
@@ -16,12 +16,61 @@ remove any of the existing attributes.
 """
 # You may import more things from these modules (e.g., additional types from
 # typing), but you may not import from any other modules.
-from typing import Dict, List, Any
+import asyncio
+from collections import deque
+import copy
+from operator import attrgetter
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, \
+    Tuple, Union, Any
 
 import algorithms
-from entities import Person, Elevator
+import eventlog
+from entities import Person, Elevator, CompactElevator, PersonPool
+from metrics import MetricsSink, WaitHistogram
+from profiling import Profiler
+from renderer import RemoteVisualizer
+from trips import TripRecords
 from visualizer import Visualizer
 
+# What the metrics sink is given for each elevator and each of its directions.
+_CURRENT_FLOOR = attrgetter('current_floor')
+_CURRENT_CAPACITY = attrgetter('current_capacity')
+_VALUE = attrgetter('value')
+
+
+class _Zone:
+    """A bank of elevators that all serve the same floors.
+
+    === Attributes ===
+    floors: the floors the elevators of this zone stop at
+    lowest: the lowest floor in floors
+    highest: the highest floor in floors
+    elevator_ids: the indexes of this zone's elevators in the simulation
+    elevators: this zone's elevators
+    algorithm: the moving algorithm that dispatches this zone's elevators
+
+    === Representation Invariants ===
+    len(floors) >= 2
+    len(elevator_ids) == len(elevators) >= 1
+    """
+    floors: FrozenSet[int]
+    lowest: int
+    highest: int
+    elevator_ids: List[int]
+    elevators: List[Elevator]
+    algorithm: algorithms.MovingAlgorithm
+
+    def __init__(self, floors: FrozenSet[int],
+                 algorithm: algorithms.MovingAlgorithm) -> None:
+        """Initialize a zone serving the given floors, with no elevators yet.
+        """
+        self.floors = floors
+        self.lowest = min(floors)
+        self.highest = max(floors)
+        self.elevator_ids = []
+        self.elevators = []
+        self.algorithm = algorithm
+
 
 class Simulation:
     """The main simulation class.
@@ -31,7 +80,9 @@ class Simulation:
     elevators: a list of the elevators in the simulation
     moving_algorithm: the algorithm used to decide how to move elevators
     num_floors: the number of floors
-    visualizer: the Pygame visualizer used to visualize this simulation
+    visualizer: the Pygame visualizer used to visualize this simulation, or
+            the RemoteVisualizer that sends its state to a renderer process
+            if config['visualize'] is 'remote'
     waiting: a dictionary of people waiting for an elevator
             (keys are floor numbers, values are the list of waiting people)
     people_per_round: the number of people who arrive each round
@@ -41,6 +92,34 @@ class Simulation:
             arrive at their destination, the minimum time (in rounds) for a
             person to arrive at their destination, and the average time of all
             people who arrived at their destinations
+    overruns: the number of rounds of a real-time run_async that took longer
+            than their time budget
+    person_pool: the pool that people who reach their target floor are
+            returned to so the arrival generator can reuse them, or None if
+            this simulation is visualized
+    metrics_sink: where the state of the simulation is recorded at the end of
+            every round (or every metrics_sink.every rounds), or None if it
+            isn't recorded
+    event_log: where every arrival, boarding, exit and elevator move is
+            recorded, or None if they aren't recorded
+    trip_records: the start and target floor, the arrival, boarding and
+            exit rounds and the elevator of every person who reached their
+            target floor, or None if trips aren't recorded
+    profiler: the profiler that samples every run and traces the memory of
+            every stage, or None if runs aren't profiled
+    wait_histogram: where the number of rounds every person waited before
+            boarding is counted, or None if waits aren't counted
+    zones: the banks of elevators of a zoned building, or None if every
+            elevator serves every floor
+
+    In a zoned building, each elevator only stops at the floors it serves
+    (config['served_floors']): people only board elevators that serve both
+    their floor and the floor they are going to, and each zone is dispatched
+    by its own copy of the moving algorithm, which only sees that zone's
+    elevators, floors and waiting people. People whose trip no elevator
+    serves change elevators on the way, at floors served by more than one
+    zone (sky lobbies); until their last leg, their target is the floor they
+    change at.
 
     === Representation Invariants ===
     arrival_generator is RandomArrivals(num_floors, people_per_round) or
@@ -49,6 +128,7 @@ class Simulation:
     num_floors >= 2
     waiting keys are floor numbers
     people_per_round >= 0
+    overruns >= 0
     """
     arrival_generator: algorithms.ArrivalGenerator
     elevators: List[Elevator]
@@ -57,12 +137,34 @@ class Simulation:
     waiting: Dict[int, List[Person]]
     people_per_round: int
     results: Dict[str, int]
-    visualizer: Visualizer
+    overruns: int
+    person_pool: Optional[PersonPool]
+    metrics_sink: Optional[MetricsSink]
+    event_log: Optional[eventlog.EventLog]
+    trip_records: Optional[TripRecords]
+    wait_histogram: Optional[WaitHistogram]
+    profiler: Optional[Profiler]
+    zones: Optional[List[_Zone]]
+    visualizer: Union[Visualizer, RemoteVisualizer]
+    _round_num: int
+    _next_uid: int
+    _num_boarded: int
+    _recorded_counts: Tuple[int, int, int]
+    _directions: List[algorithms.Direction]
+    _elevator_zones: List[_Zone]
+    _transfer_floors: FrozenSet[int]
+    _next_hops: Dict[tuple, int]
+    _final_targets: Dict[int, int]
+    _boardings: Dict[int, Tuple[int, int]]
 
     def __init__(self,
                  config: Dict[str, Any]) -> None:
         """Initialize a new simulation using the given configuration.
 
+        config['served_floors'] is optional. If it is given, it holds the
+        floors each elevator serves, in order, or None for an elevator that
+        serves every floor; elevators start on the lowest floor they serve.
+
         Precondition:
             arrival_generator is RandomArrivals(num_floors, people_per_round) or
                 FileArrivals(num_floors, 'csv_file_name')
@@ -71,16 +173,36 @@ class Simulation:
             num_floors >= 2
             waiting keys are floor numbers
             people_per_round >= 0
+            every elevator serves at least two floors, and every trip that
+                arrives can be made with the elevators
         """
         # Initialize the visualizer.
         # Note that this should be called *after* the other attributes
         # have been initialized.
         self.arrival_generator = config['arrival_generator']
+        remote = config['visualize'] == 'remote'
+        if config['visualize'] and not remote:
+            elevator_type = Elevator
+            self.person_pool = None
+        else:
+            # Nothing is drawn in this process, so use people and elevators
+            # without sprites, and recycle the people who finish their trips.
+            elevator_type = CompactElevator
+            self.person_pool = PersonPool()
+        self.arrival_generator.person_pool = self.person_pool
         self.elevators = []
         for i in range(config['num_elevators']):
-            self.elevators.append(Elevator(config['elevator_capacity']))
+            self.elevators.append(elevator_type(config['elevator_capacity']))
         self.moving_algorithm = config['moving_algorithm']
         self.num_floors = config['num_floors']
+        self._next_hops = {}
+        self._final_targets = {}
+        self._elevator_zones = []
+        if config.get('served_floors') is None:
+            self.zones = None
+            self._transfer_floors = frozenset()
+        else:
+            self._setup_zones(config['served_floors'])
         self.waiting = {}
         for i in range(1, self.num_floors + 1):
             self.waiting[i] = []
@@ -92,8 +214,130 @@ class Simulation:
             'max_time': 0,
             'min_time': 0,
             'avg_time': 0.0}
-        self.visualizer = Visualizer(self.elevators, self.num_floors,
-                                     config['visualize'])
+        self.overruns = 0
+        self.metrics_sink = config.get('metrics_sink')
+        self.event_log = config.get('event_log')
+        self.trip_records = TripRecords() if config.get('record_trips') \
+            else None
+        self._boardings = {}
+        self.wait_histogram = config.get('wait_histogram')
+        self.profiler = config.get('profile')
+        self._round_num = 0
+        self._next_uid = 0
+        self._num_boarded = 0
+        self._recorded_counts = (0, 0, 0)
+        self._directions = []
+        if remote:
+            self.visualizer = RemoteVisualizer(self.elevators, self.waiting)
+        else:
+            self.visualizer = Visualizer(self.elevators, self.num_floors,
+                                         config['visualize'])
+
+    def reset(self) -> None:
+        """Put this simulation back in its initial state (no people, all
+        elevators are empty and on floor 1, or on the lowest floor they serve
+        in a zoned building), and rewind its arrival generator.
+
+        The elevators, the waiting lists and the visualizer are kept and
+        reused, and everyone still in the building is returned to the person
+        pool if there is one. The results of the previous run are left alone:
+        a new results dictionary is started. Everything recorded to the event
+        log, the metrics sink and the wait histogram is cleared, since the
+        run that follows numbers its rounds and people from 0 again.
+        """
+        for people in self.waiting.values():
+            self._release_all(people)
+        for i, elevator in enumerate(self.elevators):
+            self._release_all(elevator.passengers)
+            elevator.current_capacity = 0
+            elevator.current_floor = \
+                self._elevator_zones[i].lowest if self.zones else 1
+        self.results = {
+            'num_iterations': 0,
+            'total_people': 0,
+            'people_completed': 0,
+            'max_time': 0,
+            'min_time': 0,
+            'avg_time': 0.0}
+        self.overruns = 0
+        if self.trip_records is not None:
+            self.trip_records = TripRecords()
+            self._boardings.clear()
+        self._round_num = 0
+        self._next_uid = 0
+        self._num_boarded = 0
+        self._recorded_counts = (0, 0, 0)
+        self._directions = []
+        self._final_targets.clear()
+        if self.event_log is not None:
+            self.event_log.clear()
+        if self.metrics_sink is not None:
+            self.metrics_sink.clear()
+        if self.wait_histogram is not None:
+            self.wait_histogram.clear()
+        self.arrival_generator.reset()
+        self.visualizer.show_state(self.elevators, self.waiting)
+
+    def _setup_zones(self, served_floors: List[Optional[Iterable[int]]]) \
+            -> None:
+        """Group the elevators into zones by the floors they serve, and put
+        each of them on the lowest floor it serves.
+        """
+        self.zones = []
+        by_floors = {}
+        for i, floors in enumerate(served_floors):
+            floors = frozenset(range(1, self.num_floors + 1) if floors is None
+                               else floors)
+            if floors not in by_floors:
+                by_floors[floors] = _Zone(floors,
+                                          copy.deepcopy(self.moving_algorithm))
+                self.zones.append(by_floors[floors])
+            zone = by_floors[floors]
+            zone.elevator_ids.append(i)
+            zone.elevators.append(self.elevators[i])
+            self._elevator_zones.append(zone)
+            self.elevators[i].current_floor = zone.lowest
+        self._transfer_floors = frozenset(
+            floor for floor in range(1, self.num_floors + 1)
+            if sum(floor in zone.floors for zone in self.zones) > 1)
+
+    def _next_hop(self, start: int, target: int) -> int:
+        """Return the floor that a person on floor start who is going to
+        target should take an elevator to: target itself if one elevator
+        serves both floors, otherwise the first floor to change elevators at
+        on a trip with the fewest changes.
+        """
+        if (start, target) in self._next_hops:
+            return self._next_hops[(start, target)]
+        # Breadth-first search over floors, where one elevator ride takes
+        # a person from a floor to any other floor its zone serves, as long as
+        # that floor is the target or a floor to change elevators at.
+        first_hops = {start: None}
+        queue = deque([start])
+        while queue and target not in first_hops:
+            floor = queue.popleft()
+            for zone in self.zones:
+                if floor not in zone.floors:
+                    continue
+                for other in zone.floors:
+                    if other not in first_hops and (
+                            other == target or other in self._transfer_floors):
+                        first_hops[other] = first_hops[floor] or other
+                        queue.append(other)
+        if target not in first_hops:
+            raise ValueError(f'no elevators go from floor {start} to floor '
+                             f'{target}')
+        self._next_hops[(start, target)] = first_hops[target]
+        return first_hops[target]
+
+    def _release_all(self, people: List[Person]) -> None:
+        """Empty the given list of people, returning them to the person pool
+        if there is one.
+        """
+        if self.person_pool is not None:
+            for person in people:
+                self.person_pool.release(person)
+        people.clear()
 
     ############################################################################
     # Handle rounds of simulation.
@@ -107,27 +351,157 @@ class Simulation:
         Precondition: num_rounds >= 1.
 
         Note: each run of the simulation starts from the same initial state
-        (no people, all elevators are empty and start at floor 1).
+        (no people, all elevators are empty and start at floor 1), with its
+        arrival generator rewound, even if the generator was used before. A
+        simulation that has already run is reset first (see reset).
         """
+        self._start_run()
+        # Samples start at the run itself (see Profiler.start).
+        if self.profiler is not None:
+            self.profiler.start()
         for i in range(num_rounds):
-            self.visualizer.render_header(i)
+            self._run_round(i)
 
-            # Stage 1: generate new arrivals
-            self._generate_arrivals(i)
+            # Pause for 1 second between rounds
+            self.visualizer.wait(1)
 
-            # Stage 2: leave elevators
-            self._handle_leaving()
+        return self._finish_run()
+
+    async def run_async(self, num_rounds: int,
+                        round_length: Optional[float] = None,
+                        on_overrun: Optional[Callable[[int, float], None]] =
+                        None) -> Dict[str, Any]:
+        """Run the simulation for the given number of rounds inside an asyncio
+        event loop.
+
+        This behaves like run, but hands control back to the event loop after
+        every round instead of sleeping, so that other tasks (e.g. a
+        LiveArrivals generator reading events from a socket) keep running
+        while the simulation steps.
+
+        If round_length is None, rounds run back to back. Otherwise this is a
+        real-time run: each round starts round_length seconds after the one
+        before it was scheduled to, measured on the event loop's monotonic
+        clock, so the time a round spends working never accumulates into
+        drift. A round whose own work takes longer than round_length is an
+        overrun; it is counted in self.overruns and reported to
+        on_overrun(round_num, seconds_over), where seconds_over is how much
+        longer than round_length it took. The next round then starts
+        immediately, and the schedule carries on from there: the rounds
+        after an overrun aren't rushed to make up for it, so each overrun is
+        only counted once.
 
-            # Stage 3: board elevators
-            self._handle_boarding()
+        Precondition:
+            num_rounds >= 1
+            round_length is None or round_length > 0
+        """
+        self._start_run()
+        if self.profiler is not None:
+            self.profiler.start()
+        loop = asyncio.get_running_loop()
+        next_start = loop.time()
+        for i in range(num_rounds):
+            round_start = loop.time()
+            self._run_round(i)
+            if round_length is None:
+                await asyncio.sleep(0)
+                continue
 
-            # Stage 4: move the elevators using the moving algorithm
-            self._move_elevators()
+            now = loop.time()
+            if now - round_start > round_length:
+                self.overruns += 1
+                if on_overrun is not None:
+                    on_overrun(i, now - round_start - round_length)
+                # Skip ahead rather than catching up.
+                next_start = now
+            else:
+                next_start += round_length
+            await asyncio.sleep(max(next_start - now, 0))
 
-            # Pause for 1 second and add an iteration
-            self.visualizer.wait(1)
-            self.results['num_iterations'] += 1
+        return self._finish_run()
 
+    def _start_run(self) -> None:
+        """Get ready for a run from round 0: reset this simulation if it has
+        already run, or else rewind its arrival generator, which may have been
+        used by another simulation.
+        """
+        if self.results['num_iterations'] != 0:
+            self.reset()
+        else:
+            self.arrival_generator.reset()
+
+    def step(self) -> None:
+        """Run the next round of this simulation.
+
+        This lets the simulation be driven one round at a time, e.g. by an
+        environment whose moving algorithm is an ExternalAlgorithm. The
+        results are left as they are after each round: min_time, max_time
+        and avg_time are only finalized by run and run_async.
+        """
+        self._run_round(self.results['num_iterations'])
+
+    def _run_round(self, round_num: int) -> None:
+        """Run the four stages of a single round and count the iteration.
+
+        Precondition:
+            round_num >= 0
+        """
+        self._round_num = round_num
+        self.visualizer.render_header(round_num)
+        if round_num == 0 and self.event_log is not None:
+            for elevator_id, elevator in enumerate(self.elevators):
+                self.event_log.record(0, eventlog.START, eventlog.NO_PERSON,
+                                      elevator.current_floor, elevator_id)
+        profiler = self.profiler
+
+        # Stage 1: generate new arrivals
+        if profiler is not None:
+            profiler.enter('arrivals')
+        self._generate_arrivals(round_num)
+
+        # Stage 2: leave elevators
+        if profiler is not None:
+            profiler.enter('leaving')
+        self._handle_leaving()
+
+        # Stage 3: board elevators
+        if profiler is not None:
+            profiler.enter('boarding')
+        self._handle_boarding()
+
+        # Stage 4: move the elevators using the moving algorithm
+        if profiler is not None:
+            profiler.enter('moving')
+        self._move_elevators()
+        if profiler is not None:
+            profiler.enter(None)
+
+        self.results['num_iterations'] += 1
+        sink = self.metrics_sink
+        if sink is not None and (round_num + 1) % sink.every == 0:
+            self._record_metrics(round_num)
+
+    def _record_metrics(self, round_num: int) -> None:
+        """Record the state of the building at the end of round round_num to
+        the metrics sink, with the people who arrived, boarded and exited
+        since the last round recorded.
+        """
+        counts = (self.results['total_people'], self._num_boarded,
+                  self.results['people_completed'])
+        arrived, boarded, exited = self._recorded_counts
+        self._recorded_counts = counts
+        self.metrics_sink.record(
+            round_num, counts[0] - arrived, counts[1] - boarded,
+            counts[2] - exited,
+            map(len, self.waiting.values()),
+            map(_CURRENT_FLOOR, self.elevators),
+            map(_CURRENT_CAPACITY, self.elevators),
+            map(_VALUE, self._directions))
+
+    def _finish_run(self) -> Dict[str, Any]:
+        """Finalize the min, max and average times once the last round of a
+        run is over, and return the statistics for the run.
+        """
         if self.results['people_completed'] == 1:
             self.results['max_time'] = self.results['min_time']
         elif self.results['people_completed'] == 0:
@@ -137,6 +511,14 @@ class Simulation:
         if self.results['people_completed'] != 0:
             self.results['avg_time'] = self.results['avg_time'] / (self.results[
                 'people_completed'])
+        if self.profiler is not None:
+            self.profiler.stop()
+        if self.metrics_sink is not None:
+            if self.results['num_iterations'] % self.metrics_sink.every:
+                self._record_metrics(self.results['num_iterations'] - 1)
+            self.metrics_sink.flush()
+        if self.event_log is not None:
+            self.event_log.flush()
         return self._calculate_stats()
 
     def _generate_arrivals(self, round_num: int) -> None:
@@ -146,20 +528,40 @@ class Simulation:
             round_num >= 0
         """
         arriving = self.arrival_generator.generate(round_num)
-        for person in arriving:
-            self.waiting[person].extend(arriving[person])
-            self.results['total_people'] += len(arriving[person])
+        for floor, people in arriving.items():
+            for person in people:
+                person.uid = self._next_uid
+                self._next_uid += 1
+                if self.zones is not None:
+                    hop = self._next_hop(floor, person.target)
+                    if hop != person.target:
+                        self._final_targets[person.uid] = person.target
+                        person.target = hop
+                if self.event_log is not None:
+                    self.event_log.record(round_num, eventlog.ARRIVAL,
+                                          person.uid, floor,
+                                          eventlog.NO_ELEVATOR)
+            self.waiting[floor].extend(people)
+            self.results['total_people'] += len(people)
         self.visualizer.show_arrivals(arriving)
 
     def _handle_leaving(self) -> None:
         """Handle people leaving elevators."""
-        for elevator in self.elevators:
+        for elevator_id, elevator in enumerate(self.elevators):
             i = len(elevator.passengers) - 1
             while not i < 0:
                 person = elevator.passengers[i]
-                if person.start == person.target:
+                if person.start == person.target and \
+                        person.uid in self._final_targets:
+                    self._transfer(elevator_id, elevator, i)
+                elif person.start == person.target:
                     elevator.current_capacity -= 1
+                    if self.event_log is not None:
+                        self.event_log.record(self._round_num, eventlog.EXIT,
+                                              person.uid, person.target,
+                                              elevator_id)
                     self.visualizer.show_disembarking(person, elevator)
+                    self.visualizer.remove_person(person)
                     self.results['people_completed'] += 1
                     self.results['avg_time'] += person.total_time
                     if person.total_time < self.results['min_time'] or \
@@ -168,36 +570,95 @@ class Simulation:
                     elif person.total_time > self.results['max_time'] or \
                             self.results['max_time'] == 0:
                         self.results['max_time'] = person.total_time
+                    if self.trip_records is not None:
+                        self._record_trip(person, elevator_id)
                     elevator.passengers.pop(i)
+                    if self.person_pool is not None:
+                        self.person_pool.release(person)
                 i -= 1
 
+    def _transfer(self, elevator_id: int, elevator: Elevator, i: int) -> None:
+        """Let passenger i of the given elevator off at a floor where they
+        change elevators, and have them wait there for the next leg of their
+        trip.
+        """
+        person = elevator.passengers.pop(i)
+        elevator.current_capacity -= 1
+        floor = person.target
+        if self.event_log is not None:
+            self.event_log.record(self._round_num, eventlog.EXIT, person.uid,
+                                  floor, elevator_id)
+        self.visualizer.show_disembarking(person, elevator)
+        self.visualizer.remove_person(person)
+        final_target = self._final_targets[person.uid]
+        person.target = self._next_hop(floor, final_target)
+        if person.target == final_target:
+            del self._final_targets[person.uid]
+        self.waiting[floor].append(person)
+        if self.event_log is not None:
+            self.event_log.record(self._round_num, eventlog.ARRIVAL,
+                                  person.uid, floor, eventlog.NO_ELEVATOR)
+        self.visualizer.show_arrivals({floor: [person]})
+
+    def _record_trip(self, person: Person, elevator_id: int) -> None:
+        """Record the trip of a person who just left the given elevator on
+        their target floor.
+        """
+        start, boarding = self._boardings.pop(person.uid)
+        self.trip_records.append(start, person.target,
+                                 self._round_num - person.total_time,
+                                 boarding, self._round_num, elevator_id)
+
     def _handle_boarding(self) -> None:
-        """Handle boarding of people and visualize."""
-        for elevator in self.elevators:
-            if elevator.fullness() == 1:
+        """Handle boarding of people and visualize.
+
+        In a zoned building, people only board elevators that serve the
+        floor they are going to, and wait in line for the next one otherwise.
+        """
+        for elevator_id, elevator in enumerate(self.elevators):
+            floor = elevator.current_floor
+            queue = self.waiting[floor]
+            zone = self._elevator_zones[elevator_id] if self.zones else None
+            if zone is not None and floor not in zone.floors:
                 continue
-            else:
-                while elevator.fullness() != 1:
-                    if len(self.waiting[elevator.current_floor]) > 0:
-                        elevator.current_capacity += 1
-                        self.visualizer.show_boarding(
-                            self.waiting[elevator.current_floor][0], elevator)
-                        elevator.passengers.append(
-                            self.waiting[elevator.current_floor].pop(0))
-                    else:
-                        break
+            i = 0
+            while elevator.fullness() != 1 and i < len(queue):
+                if zone is not None and queue[i].target not in zone.floors:
+                    i += 1
+                    continue
+                person = queue.pop(i)
+                elevator.current_capacity += 1
+                self._num_boarded += 1
+                if self.wait_histogram is not None:
+                    self.wait_histogram.observe(person.total_time)
+                if self.trip_records is not None and \
+                        person.uid not in self._boardings:
+                    self._boardings[person.uid] = (floor, self._round_num)
+                if self.event_log is not None:
+                    self.event_log.record(self._round_num, eventlog.BOARDING,
+                                          person.uid, floor, elevator_id)
+                self.visualizer.show_boarding(person, elevator)
+                elevator.passengers.append(person)
 
     def _move_elevators(self) -> None:
         """Move the elevators in this simulation.
 
         Use this simulation's moving algorithm to move the elevators.
         """
-        algorithm = self.moving_algorithm
-        self.visualizer.show_elevator_moves(self.elevators,
-                                            algorithm.move_elevators(
-                                                self.elevators,
-                                                self.waiting,
-                                                self.num_floors))
+        if self.zones is None:
+            algorithm = self.moving_algorithm
+            self._directions = algorithm.move_elevators(self.elevators,
+                                                        self.waiting,
+                                                        self.num_floors)
+        else:
+            self._directions = self._move_zones()
+        if self.event_log is not None:
+            for elevator_id, elevator in enumerate(self.elevators):
+                if self._directions[elevator_id] != algorithms.Direction.STAY:
+                    self.event_log.record(self._round_num, eventlog.MOVE,
+                                          eventlog.NO_PERSON,
+                                          elevator.current_floor, elevator_id)
+        self.visualizer.show_elevator_moves(self.elevators, self._directions)
         for elevator in self.elevators:
             for person in elevator.passengers:
                 person.total_time += 1
@@ -205,6 +666,34 @@ class Simulation:
             for person in self.waiting[floor]:
                 person.total_time += 1
 
+    def _move_zones(self) -> List[algorithms.Direction]:
+        """Move the elevators of every zone with that zone's algorithm, and
+        return the direction each elevator moved in.
+
+        Each algorithm only sees its own elevators, and the people waiting on
+        its floors who are going to one of them, in a building whose top floor
+        is the zone's highest floor. An elevator sent below the zone's lowest
+        floor stays where it is, and one sent to a floor the zone skips passes
+        through it without stopping.
+        """
+        directions = [algorithms.Direction.STAY] * len(self.elevators)
+        for zone in self.zones:
+            waiting = {}
+            for floor in range(zone.lowest, zone.highest + 1):
+                if floor in zone.floors:
+                    waiting[floor] = [person for person in self.waiting[floor]
+                                      if person.target in zone.floors]
+            moves = zone.algorithm.move_elevators(zone.elevators, waiting,
+                                                  zone.highest)
+            for elevator_id, elevator, direction in zip(
+                    zone.elevator_ids, zone.elevators, moves):
+                if elevator.current_floor < zone.lowest:
+                    zone.algorithm.update_elevators(
+                        elevator, algorithms.Direction.UP)
+                    direction = algorithms.Direction.STAY
+                directions[elevator_id] = direction
+        return directions
+
     ############################################################################
     # Statistics calculations
     ############################################################################
@@ -242,6 +731,9 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-attributes': 12,
         'disable': ['R0201'],
-        'extra-imports': ['entities', 'visualizer', 'algorithms', 'time'],
+        'extra-imports': ['entities', 'visualizer', 'algorithms', 'time',
+                          'asyncio', 'metrics', 'eventlog', 'collections',
+                          'copy', 'trips', 'renderer', 'profiling',
+                          'operator'],
         'max-nested-blocks': 4
     })
@@ -1,7 +1,27 @@
-from typing import List
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Tuple
+import urllib.error
+import urllib.request
 
 import simulation
 import algorithms
+import cache
+import campus
+import entities
+import eventlog
+import exporter
+import experiments
+import live
+import metrics
+import policy
+import profiling
+import replay
+import sharedtrace
+import tracegen
+import pytest
 from simulation import Simulation
 from hypothesis import given, settings
 from hypothesis.strategies import integers, lists
@@ -164,6 +184,1087 @@ def test_short_sighted():
 # PASSED 10:42 16/10/18
 
 
+def test_live_arrivals() -> None:
+    """Test that live arrivals are validated, queued with a bound and
+    dropped by policy, and served by an asyncio run.
+    """
+    arrival_gen = live.LiveArrivals(6, max_queued=3,
+                                    policy=live.DROP_NEWEST)
+    config = {
+        'num_floors': 6,
+        'num_elevators': 2,
+        'elevator_capacity': 3,
+        'num_people_per_round': None,
+        'arrival_generator': arrival_gen,
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': False
+    }
+    sim = simulation.Simulation(config)
+
+    async def feed_and_run():
+        for start, target in [(1, 6), (2, 5), (9, 1), (3, 4), (4, 3)]:
+            arrival_gen.submit(start, target)
+        return await sim.run_async(15)
+
+    stats = asyncio.run(feed_and_run())
+    assert arrival_gen.rejected == 1
+    assert arrival_gen.dropped == 1
+    assert stats['num_iterations'] == 15
+    assert stats['total_people'] == 3
+    assert stats['people_completed'] == 3
+
+
+def test_realtime_run() -> None:
+    """Test that a real-time run takes at least round_length per round, and
+    counts the overruns it reports.
+    """
+    config = {
+        'num_floors': 6,
+        'num_elevators': 2,
+        'elevator_capacity': 3,
+        'num_people_per_round': 2,
+        'arrival_generator': algorithms.RandomArrivals(6, 2),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': False
+    }
+    sim = simulation.Simulation(config)
+    late = []
+    start = time.monotonic()
+    stats = asyncio.run(sim.run_async(5, round_length=0.02,
+                                      on_overrun=lambda i, s: late.append(i)))
+    assert time.monotonic() - start >= 0.09
+    assert stats['num_iterations'] == 5
+    assert sim.overruns == len(late)
+
+
+class _SlowRound(algorithms.ShortSighted):
+    """A ShortSighted algorithm that takes seconds to move the elevators in
+    one round.
+    """
+    def __init__(self, round_num: int, seconds: float) -> None:
+        """Initialize an algorithm that is slow in round round_num."""
+        self.round_num = round_num
+        self.seconds = seconds
+        self.rounds = 0
+
+    def move_elevators(self, elevators, waiting, max_floor):
+        """Refer to the Parent class
+        """
+        if self.rounds == self.round_num:
+            time.sleep(self.seconds)
+        self.rounds += 1
+        return algorithms.ShortSighted.move_elevators(self, elevators,
+                                                      waiting, max_floor)
+
+
+def test_realtime_overrun_is_counted_once() -> None:
+    """Test that only a slow round is an overrun, and not the rounds after
+    it, which don't try to catch up with the schedule.
+    """
+    config = {
+        'num_floors': 6,
+        'num_elevators': 2,
+        'elevator_capacity': 3,
+        'num_people_per_round': 2,
+        'arrival_generator': algorithms.RandomArrivals(6, 2),
+        'moving_algorithm': _SlowRound(1, 0.1),
+        'visualize': False
+    }
+    sim = simulation.Simulation(config)
+    late = []
+    start = time.monotonic()
+    asyncio.run(sim.run_async(
+        5, round_length=0.02,
+        on_overrun=lambda i, seconds: late.append((i, seconds))))
+    assert time.monotonic() - start >= 0.1 + 3 * 0.02
+    assert [i for i, _ in late] == [1]
+    assert late[0][1] >= 0.1 - 0.02
+    assert sim.overruns == 1
+
+
+def test_headless_people_are_recycled() -> None:
+    """Test that a headless simulation uses compact entities and recycles the
+    people who reach their target floor.
+    """
+    config = {
+        'num_floors': 6,
+        'num_elevators': 3,
+        'elevator_capacity': 3,
+        'num_people_per_round': 1,
+        'arrival_generator': algorithms.RandomArrivals(6, 1),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': False
+    }
+    sim = simulation.Simulation(config)
+    stats = sim.run(100)
+    pool = sim.person_pool
+    assert isinstance(sim.elevators[0], entities.CompactElevator)
+    assert pool.created + pool.reused == stats['total_people']
+    assert pool.reused > 0
+    person = pool.acquire(2, 5)
+    assert (person.start, person.target, person.total_time) == (2, 5, 0)
+
+
+def test_metrics_sink(tmp_path) -> None:
+    """Test that a JSONL metrics writer records every round, with counts that
+    add up to the totals of the run.
+    """
+    filename = str(tmp_path / 'metrics.jsonl')
+    with metrics.JSONLMetricsWriter(filename, buffer_rows=4) as sink:
+        config = {
+            'num_floors': 6,
+            'num_elevators': 2,
+            'elevator_capacity': 3,
+            'num_people_per_round': 10,
+            'arrival_generator': algorithms.FileArrivals(
+                6, 'arrival_files/arrivals_1.csv'),
+            'moving_algorithm': algorithms.ShortSighted(),
+            'visualize': False,
+            'metrics_sink': sink
+        }
+        stats = simulation.Simulation(config).run(15)
+    with open(filename) as file:
+        rounds = [json.loads(line) for line in file]
+    assert [r['round'] for r in rounds] == list(range(15))
+    assert sum(r['arrivals'] for r in rounds) == stats['total_people']
+    assert sum(r['exits'] for r in rounds) == stats['people_completed']
+    assert all(len(r['queues']) == 6 and len(r['floors']) == 2
+               for r in rounds)
+
+
+def test_sampled_metrics(tmp_path) -> None:
+    """Test that a sink recording every 4th round gets those rounds and the
+    last one, with the counts of the rounds in between.
+    """
+    filename = str(tmp_path / 'metrics.csv')
+    with metrics.CSVMetricsWriter(filename, every=4) as sink:
+        config = {
+            'num_floors': 6,
+            'num_elevators': 2,
+            'elevator_capacity': 3,
+            'num_people_per_round': 10,
+            'arrival_generator': algorithms.FileArrivals(
+                6, 'arrival_files/arrivals_1.csv'),
+            'moving_algorithm': algorithms.ShortSighted(),
+            'visualize': False,
+            'metrics_sink': sink
+        }
+        stats = simulation.Simulation(config).run(15)
+    with open(filename) as file:
+        header, *rows = [line.split(',') for line in file.read().split()]
+    assert header[:4] == ['round', 'arrivals', 'boardings', 'exits']
+    assert [int(row[0]) for row in rows] == [3, 7, 11, 14]
+    assert sum(int(row[1]) for row in rows) == stats['total_people']
+    assert sum(int(row[3]) for row in rows) == stats['people_completed']
+
+
+def test_event_log(tmp_path) -> None:
+    """Test that the event log records every arrival and exit in round order,
+    with each exit from the elevator its person boarded.
+    """
+    filename = str(tmp_path / 'run.events')
+    with eventlog.EventLog(filename, capacity=8) as log:
+        config = {
+            'num_floors': 6,
+            'num_elevators': 2,
+            'elevator_capacity': 3,
+            'num_people_per_round': 10,
+            'arrival_generator': algorithms.FileArrivals(
+                6, 'arrival_files/arrivals_1.csv'),
+            'moving_algorithm': algorithms.ShortSighted(),
+            'visualize': False,
+            'event_log': log
+        }
+        stats = simulation.Simulation(config).run(15)
+    events = eventlog.load_events(filename)
+    kinds = [event[1] for event in events]
+    assert len(events) == log.num_events
+    assert kinds.count(eventlog.ARRIVAL) == stats['total_people']
+    assert kinds.count(eventlog.EXIT) == stats['people_completed']
+    assert [event[0] for event in events] == \
+        sorted(event[0] for event in events)
+    boardings = {person: (round_num, elevator)
+                 for round_num, kind, person, _, elevator in events
+                 if kind == eventlog.BOARDING}
+    for round_num, kind, person, _, elevator in events:
+        if kind == eventlog.EXIT:
+            assert boardings[person][0] < round_num
+            assert boardings[person][1] == elevator
+
+
+class _ListSink(metrics.MetricsSink):
+    """A sink that keeps the queues and elevator floors of every round."""
+    def __init__(self) -> None:
+        """Initialize a sink that hasn't recorded any rounds."""
+        self.rounds = []
+
+    def record(self, round_num, arrivals, boardings, exits, queues, floors,
+               loads, directions) -> None:
+        """Refer to the Parent class
+        """
+        self.rounds.append((list(queues), list(floors)))
+
+
+def test_replay_seek(tmp_path) -> None:
+    """Test that seeking and playing a replay reproduces the queues and
+    elevator floors that the simulation recorded.
+    """
+    filename = str(tmp_path / 'run.events')
+    sink = _ListSink()
+    with eventlog.EventLog(filename) as log:
+        config = {
+            'num_floors': 6,
+            'num_elevators': 3,
+            'elevator_capacity': 2,
+            'num_people_per_round': 2,
+            'arrival_generator': algorithms.RandomArrivals(6, 2),
+            'moving_algorithm': algorithms.ShortSighted(),
+            'visualize': False,
+            'event_log': log,
+            'metrics_sink': sink
+        }
+        simulation.Simulation(config).run(60)
+
+    run = replay.Replay(filename, 6, 3, 2, keyframe_interval=7,
+                        visualize=False)
+    assert run.num_rounds == 60
+    for round_num in [59, 3, 14, 0, 30]:
+        run.seek(round_num + 1)
+        assert (run.waiting_counts(), run.elevator_floors()) == \
+            sink.rounds[round_num]
+    run.seek(20)
+    run.play(10, speed=1000)
+    assert run.round_num == 30
+    assert (run.waiting_counts(), run.elevator_floors()) == sink.rounds[29]
+
+
+def test_campus() -> None:
+    """Test that a campus run gives the same results as running each building
+    on its own, and that its shared series add up.
+    """
+    configs = []
+    for num_elevators, filename in [(1, 'arrival_files/arrivals_1.csv'),
+                                    (2, 'arrival_files/arrivals_2.csv'),
+                                    (3, 'arrival_files/arrivals_3.csv')]:
+        configs.append({
+            'num_floors': 6,
+            'num_elevators': num_elevators,
+            'elevator_capacity': 3,
+            'num_people_per_round': None,
+            'arrival_generator': algorithms.FileArrivals(6, filename),
+            'moving_algorithm': algorithms.ShortSighted(),
+            'visualize': False
+        })
+    results = campus.run_campus(configs, 15, processes=2)
+    for building, config in enumerate(configs):
+        expected = simulation.Simulation(config).run(15)
+        assert results.results[building] == expected
+        assert sum(results.building_series(building, 'arrivals')) == \
+            expected['total_people']
+        assert sum(results.building_series(building, 'exits')) == \
+            expected['people_completed']
+    assert sum(results.campus_series('arrivals')) == \
+        results.totals()['total_people']
+
+
+def test_optimize_capacity() -> None:
+    """Test that every configuration on the capacity frontier meets the target
+    with as few elevators as it can.
+    """
+    config = {
+        'num_floors': 8,
+        'num_elevators': 1,
+        'elevator_capacity': 1,
+        'num_people_per_round': 2,
+        'arrival_generator': algorithms.RandomArrivals(8, 2),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': False
+    }
+    frontier = experiments.optimize_capacity(config, 40, 20, (1, 6),
+                                             [1, 2, 3, 4], processes=2)
+    assert frontier
+    for count, capacity, value in frontier:
+        assert value <= 20
+        assert value == experiments.evaluate(
+            dict(config, num_elevators=count, elevator_capacity=capacity),
+            40, 'p95', 0)
+        if count > 1:
+            assert experiments.evaluate(
+                dict(config, num_elevators=count - 1,
+                     elevator_capacity=capacity), 40, 'p95', 0) > 20
+    counts = [count for count, _, _ in frontier]
+    assert len(set(counts)) == len(counts)
+
+
+def test_replicate() -> None:
+    """Test that replication stops once the confidence interval is narrow
+    enough, or at max_runs, and that its replicas are seeded.
+    """
+    config = {
+        'num_floors': 8,
+        'num_elevators': 3,
+        'elevator_capacity': 4,
+        'num_people_per_round': 2,
+        'arrival_generator': algorithms.RandomArrivals(8, 2),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': False
+    }
+    loose = experiments.replicate(config, 30, 'avg_time', 10, batch_size=3,
+                                  min_runs=6, processes=2)
+    assert loose['converged']
+    assert loose['runs'] == 6
+    tight = experiments.replicate(config, 30, 'avg_time', 0.001, batch_size=3,
+                                  min_runs=6, max_runs=9, processes=2)
+    assert not tight['converged']
+    assert tight['runs'] == 9
+    assert tight['values'][:6] == loose['values']
+
+
+def test_t_quantile() -> None:
+    """Test that the t quantiles behind replicate's confidence intervals
+    match the usual tables, including for very few degrees of freedom.
+    """
+    table = {1: 12.706, 2: 4.303, 4: 2.776, 9: 2.262, 29: 2.045, 120: 1.980}
+    for df, quantile in table.items():
+        assert experiments._t_quantile(0.975, df) == \
+            pytest.approx(quantile, abs=5e-4)
+    assert experiments._t_quantile(0.995, 5) == pytest.approx(4.032, abs=5e-4)
+    assert experiments._t_quantile(0.025, 3) == \
+        -experiments._t_quantile(0.975, 3)
+    assert experiments._t_quantile(0.5, 7) == pytest.approx(0, abs=1e-9)
+
+
+def test_weighted_arrivals() -> None:
+    """Test that weighted arrivals follow their time-varying weights, and are
+    repeatable with a seed or with the random module.
+    """
+    up_peak = algorithms.od_weights(8, origins={1: 50})
+    down_peak = algorithms.od_weights(8, destinations={1: 50})
+    arrival_gen = algorithms.WeightedArrivals(8, [up_peak, down_peak],
+                                              [3.0] * 10, seed=148)
+    first_half = [trip for round_num in range(5)
+                  for trip in arrival_gen.draw(round_num)]
+    second_half = [trip for round_num in range(5, 10)
+                   for trip in arrival_gen.draw(round_num)]
+    assert all(1 <= start <= 8 and 1 <= target <= 8 and start != target
+               for start, target in first_half + second_half)
+    assert sum(start == 1 for start, _ in first_half) > len(first_half) / 2
+    assert sum(target == 1 for _, target in second_half) > \
+        len(second_half) / 2
+
+    config = {
+        'num_floors': 8,
+        'num_elevators': 3,
+        'elevator_capacity': 4,
+        'num_people_per_round': None,
+        'arrival_generator': algorithms.WeightedArrivals(8, [up_peak],
+                                                         [3.0], seed=148),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': False
+    }
+    stats = simulation.Simulation(config).run(20)
+    config['arrival_generator'] = algorithms.WeightedArrivals(
+        8, [up_peak], [3.0], seed=148)
+    assert simulation.Simulation(config).run(20)['total_people'] == \
+        stats['total_people']
+
+    # Without a seed, arrivals follow the random module.
+    unseeded = algorithms.WeightedArrivals(8, [up_peak], [3.0])
+    draws = []
+    for seed in [1, 1, 2]:
+        random.seed(seed)
+        draws.append([unseeded.draw(round_num) for round_num in range(10)])
+    assert draws[0] == draws[1] != draws[2]
+
+
+def test_lookahead_planner() -> None:
+    """Test that the lookahead planner beats the greedy algorithms, keeps its
+    transposition table bounded, and falls back when it has no time.
+
+    The planner that is compared has no time budget, so how deep it searches
+    doesn't depend on how fast the machine is.
+    """
+    config = {
+        'num_floors': 10,
+        'num_elevators': 2,
+        'elevator_capacity': 4,
+        'num_people_per_round': 1,
+        'arrival_generator': algorithms.RandomArrivals(10, 1),
+        'moving_algorithm': algorithms.PushyPassenger(),
+        'visualize': False
+    }
+    greedy = sum(experiments.evaluate(config, 100, 'p95', seed)
+                 for seed in range(3))
+    planner = algorithms.LookaheadPlanner(time_budget=None, table_size=500)
+    config['moving_algorithm'] = planner
+    assert sum(experiments.evaluate(config, 100, 'p95', seed)
+               for seed in range(3)) < greedy
+    assert len(planner._table) <= 500
+    assert planner.fallbacks == 0
+
+    planner = algorithms.LookaheadPlanner(time_budget=1e-9)
+    config['moving_algorithm'] = planner
+    stats = simulation.Simulation(config).run(10)
+    assert planner.fallbacks == 10
+    assert stats['num_iterations'] == 10
+
+
+def test_tracegen(tmp_path) -> None:
+    """Test that generated traces are reproducible, sorted, and readable by
+    FileArrivals.
+    """
+    first = tmp_path / 'first.csv'
+    second = tmp_path / 'second.csv'
+    with open(first, 'w') as file:
+        num_people = tracegen.write_trace(file, 6, 500, [0.5, 3], {1: 20},
+                                          seed=148)
+    with open(second, 'w') as file:
+        tracegen.write_trace(file, 6, 500, [0.5, 3], {1: 20}, seed=148,
+                             chunk_rounds=7)
+    assert first.read_text() == second.read_text()
+
+    rounds = []
+    trips = []
+    for line in first.read_text().splitlines():
+        values = [int(value) for value in line.split(',')]
+        rounds.append(values[0])
+        trips.extend(zip(values[1::2], values[2::2]))
+    assert rounds == sorted(set(rounds))
+    assert len(trips) == num_people
+    assert all(1 <= start <= 6 and 1 <= target <= 6 and start != target
+               for start, target in trips)
+    assert sum(start == 1 or target == 1 for start, target in trips) > \
+        len(trips) / 2
+
+    arrivals = algorithms.FileArrivals(6, str(first))
+    assert arrivals.generate(rounds[0])[trips[0][0]] != []
+
+
+def test_shared_trace(tmp_path) -> None:
+    """Test that a shared trace generates the people of its file, round by
+    round, in the parent and in worker processes.
+    """
+    filename = tmp_path / 'trace.csv'
+    filename.write_text('3, 1, 4, 5, 3\n1, 2, 1\n3, 2, 5\n')
+    with sharedtrace.SharedTrace(str(filename)) as trace:
+        assert (trace.num_rounds, trace.num_people) == (4, 4)
+        arrivals = trace.arrivals(5)
+        assert arrivals.generate(0) == {}
+        assert [(person.start, person.target)
+                for person in arrivals.generate(1)[2]] == [(2, 1)]
+        people = arrivals.generate(3)
+        assert {floor: [person.target for person in people[floor]]
+                for floor in people} == {1: [4], 5: [3], 2: [5]}
+        assert arrivals.generate(10) == {}
+
+        config = {
+            'num_floors': 5,
+            'num_elevators': 1,
+            'elevator_capacity': 2,
+            'num_people_per_round': None,
+            'arrival_generator': arrivals,
+            'moving_algorithm': algorithms.ShortSighted(),
+            'visualize': False
+        }
+        expected = simulation.Simulation(dict(config)).run(15)
+        with experiments._worker_pool(2) as pool:
+            results = pool.map(experiments._evaluate_job,
+                               [(config, 15, 'avg_time', None)] * 2)
+        assert results == [expected['avg_time']] * 2
+        arrivals.close()
+
+
+def test_reset() -> None:
+    """Test that running a simulation again starts from the initial state and
+    repeats a seeded run exactly.
+    """
+    config = {
+        'num_floors': 6,
+        'num_elevators': 2,
+        'elevator_capacity': 3,
+        'num_people_per_round': None,
+        'arrival_generator': algorithms.WeightedArrivals(
+            6, [algorithms.od_weights(6)], [2.0], seed=148),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': False,
+        'record_trips': True
+    }
+    sim = simulation.Simulation(config)
+    first = dict(sim.run(30))
+    trips = sim.trip_records.trip_times()
+    assert sum(map(len, sim.waiting.values())) > 0
+
+    second = sim.run(30)
+    assert second == first
+    assert sim.trip_records.trip_times() == trips
+
+    sim.reset()
+    assert sim.results['num_iterations'] == 0
+    assert all(people == [] for people in sim.waiting.values())
+    for elevator in sim.elevators:
+        assert (elevator.current_floor, elevator.current_capacity,
+                elevator.passengers) == (1, 0, [])
+    assert sim.person_pool.reused > 0
+
+
+def test_reused_generator() -> None:
+    """Test that simulations built around a generator that was already used
+    start it over, and produce the same results as the first one.
+    """
+    for arrival_gen in [
+            algorithms.MergedArrivals(
+                6, [algorithms.TraceTrips('arrival_files/arrivals_1.csv')]),
+            algorithms.WeightedArrivals(6, [algorithms.od_weights(6)],
+                                        [2.0], seed=148)]:
+        config = {
+            'num_floors': 6,
+            'num_elevators': 2,
+            'elevator_capacity': 3,
+            'num_people_per_round': None,
+            'arrival_generator': arrival_gen,
+            'moving_algorithm': algorithms.ShortSighted(),
+            'visualize': False
+        }
+        first = simulation.Simulation(config).run(15)
+        assert first['total_people'] > 0
+        assert simulation.Simulation(config).run(15) == first
+
+
+def test_reset_clears_records(tmp_path) -> None:
+    """Test that running a simulation again starts its event log, metrics
+    and wait histogram over, so the second run replays on its own.
+    """
+    filename = str(tmp_path / 'run.events')
+    histogram = metrics.WaitHistogram()
+    with eventlog.EventLog(filename) as log, metrics.JSONLMetricsWriter(
+            str(tmp_path / 'metrics.jsonl')) as sink:
+        config = {
+            'num_floors': 6,
+            'num_elevators': 2,
+            'elevator_capacity': 3,
+            'num_people_per_round': 2,
+            'arrival_generator': algorithms.RandomArrivals(6, 2),
+            'moving_algorithm': algorithms.ShortSighted(),
+            'visualize': False,
+            'event_log': log,
+            'metrics_sink': sink,
+            'wait_histogram': histogram
+        }
+        sim = simulation.Simulation(config)
+        sim.run(20)
+        stats = sim.run(10)
+    assert histogram.count == sim._num_boarded
+    with open(str(tmp_path / 'metrics.jsonl')) as file:
+        rounds = [json.loads(line) for line in file]
+    assert [r['round'] for r in rounds] == list(range(10))
+    assert sum(r['arrivals'] for r in rounds) == stats['total_people']
+
+    run = replay.Replay(filename, 6, 2, 3, visualize=False)
+    assert run.num_rounds <= 10
+    run.seek(run.num_rounds)
+    assert run.elevator_floors() == \
+        [elevator.current_floor for elevator in sim.elevators]
+
+
+def test_zoned_building(tmp_path) -> None:
+    """Test that people only ride elevators that serve their trip, and change
+    elevators at the sky lobby when no single elevator does.
+    """
+    trace = tmp_path / 'trace.csv'
+    trace.write_text('0, 1, 9, 8, 2, 3, 4\n2, 6, 10\n')
+    config = {
+        'num_floors': 10,
+        'num_elevators': 3,
+        'elevator_capacity': 2,
+        'num_people_per_round': None,
+        'arrival_generator': algorithms.FileArrivals(10, str(trace)),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'served_floors': [range(1, 6), range(1, 6), range(5, 11)],
+        'visualize': False
+    }
+    sim = simulation.Simulation(config)
+    assert [len(zone.elevators) for zone in sim.zones] == [2, 1]
+    assert [elevator.current_floor for elevator in sim.elevators] == [1, 1, 5]
+
+    filename = str(tmp_path / 'run.events')
+    with eventlog.EventLog(filename) as sim.event_log:
+        stats = sim.run(40)
+    run = replay.Replay(filename, 10, 3, 2, visualize=False)
+    assert run.elevator_floors() == [1, 1, 5]
+    run.seek(run.num_rounds)
+    assert run.elevator_floors() == \
+        [elevator.current_floor for elevator in sim.elevators]
+    assert stats['total_people'] == 4
+    assert stats['people_completed'] == 4
+    # 1 -> 9 and 8 -> 2 change elevators on floor 5.
+    assert sim._num_boarded == 6
+    for zone in sim.zones:
+        for elevator in zone.elevators:
+            assert elevator.current_floor in zone.floors
+
+    config['served_floors'] = [range(1, 6), range(1, 6), range(6, 11)]
+    config['arrival_generator'] = algorithms.FileArrivals(10, str(trace))
+    with pytest.raises(ValueError):
+        simulation.Simulation(config).run(1)
+
+
+def test_zoned_transfer_is_drawn_once(tmp_path) -> None:
+    """Test that someone changing elevators is drawn waiting at the sky
+    lobby, and no longer in the elevator they left.
+    """
+    import pygame
+    import sprites
+
+    trace = tmp_path / 'trace.csv'
+    trace.write_text('0, 1, 4, 4, 3\n')
+    config = {
+        'num_floors': 4,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': None,
+        'arrival_generator': algorithms.FileArrivals(4, str(trace)),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'served_floors': [range(1, 3), range(2, 5)],
+        'visualize': True
+    }
+    sim = simulation.Simulation(config)
+    sim.step()
+    sim.step()
+    vis = sim.visualizer
+    assert len(sim.waiting[2]) == 1 and vis._waiting[2] == sim.waiting[2]
+    shown = [sprite for sprite in vis._sprite_group
+             if isinstance(sprite, sprites.PersonSprite)]
+    assert sim.waiting[2][0] not in shown
+    assert len(shown) == sum(len(elevator.passengers)
+                             for elevator in sim.elevators)
+    pygame.display.quit()
+
+
+def test_metrics_exporter() -> None:
+    """Test that the exporter serves the live state of a simulation."""
+    histogram = metrics.WaitHistogram([1, 4])
+    config = {
+        'num_floors': 4,
+        'num_elevators': 2,
+        'elevator_capacity': 2,
+        'num_people_per_round': 3,
+        'arrival_generator': algorithms.RandomArrivals(4, 3),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'wait_histogram': histogram,
+        'visualize': False
+    }
+    sim = simulation.Simulation(config)
+    sim.run(20)
+    with exporter.MetricsExporter(sim, port=0) as server:
+        url = f'http://127.0.0.1:{server.port}'
+        with urllib.request.urlopen(url + '/metrics') as response:
+            text = response.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + '/')
+
+    values = {}
+    for line in text.splitlines():
+        if not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            values[name] = float(value)
+    assert values['elevator_sim_round'] == 20
+    assert values['elevator_sim_people_total'] == 60
+    assert values['elevator_sim_people_completed_total'] == \
+        sim.results['people_completed']
+    for floor in range(1, 5):
+        assert values[f'elevator_sim_queue_length{{floor="{floor}"}}'] == \
+            len(sim.waiting[floor])
+    assert values['elevator_sim_elevator_fullness{elevator="1"}'] == \
+        sim.elevators[1].fullness()
+    assert values['elevator_sim_wait_rounds_count'] == histogram.count > 0
+    assert values['elevator_sim_wait_rounds_bucket{le="+Inf"}'] == \
+        histogram.count
+    assert values['elevator_sim_wait_rounds_bucket{le="1"}'] <= \
+        values['elevator_sim_wait_rounds_bucket{le="4"}'] <= histogram.count
+
+
+def test_results_cache(tmp_path) -> None:
+    """Test that identical runs are served from the cache, and that anything
+    the results depend on changes the key.
+    """
+    results_cache = cache.ResultsCache(str(tmp_path / 'cache'))
+    config = {
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 3,
+        'num_people_per_round': 2,
+        'arrival_generator': algorithms.RandomArrivals(5, 2),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': False
+    }
+    assert results_cache.key(config, 20) is None
+    first = results_cache.run(config, 20, seed=1)
+    assert results_cache.run(config, 20, seed=1) == first
+    assert (results_cache.hits, results_cache.misses) == (1, 1)
+
+    key = results_cache.key(config, 20, seed=1)
+    assert results_cache.key(config, 20, seed=2) != key
+    assert results_cache.key(config, 21, seed=1) != key
+    assert results_cache.key(dict(config, elevator_capacity=4), 20,
+                             seed=1) != key
+    assert results_cache.key(dict(config, visualize=True), 20, seed=1) == key
+    assert results_cache.key(
+        dict(config, moving_algorithm=algorithms.PushyPassenger()), 20,
+        seed=1) != key
+
+    # Counters an algorithm keeps while it runs don't change its key, but
+    # what it was configured with does.
+    planner = dict(config, moving_algorithm=algorithms.LookaheadPlanner(
+        time_budget=None))
+    key = results_cache.key(planner, 20, seed=1)
+    results_cache.run(planner, 20, seed=1)
+    assert planner['moving_algorithm']._table
+    assert results_cache.key(planner, 20, seed=1) == key
+    table = bytearray(policy.solve_policy(5))
+    policy.write_policy(str(tmp_path / 'a.policy'), bytes(table))
+    table[-1] = (table[-1] + 1) % 3
+    policy.write_policy(str(tmp_path / 'b.policy'), bytes(table))
+    assert len({results_cache.key(
+        dict(config, moving_algorithm=policy.TablePolicy(
+            str(tmp_path / name))), 20, seed=1)
+        for name in ['a.policy', 'b.policy']}) == 2
+
+    trace = tmp_path / 'trace.csv'
+    trace.write_text('0, 1, 4\n')
+    config['arrival_generator'] = algorithms.FileArrivals(5, str(trace))
+    key = results_cache.key(config, 20)
+    assert key is not None
+
+    # Without a seed, nothing that draws from the random module is cached,
+    # even inside a wrapper, and a planner with a deadline never is.
+    assert results_cache.key(dict(
+        config, arrival_generator=algorithms.SparseArrivals(
+            algorithms.RandomArrivals(5, 2))), 20) is None
+    assert results_cache.key(dict(
+        config, moving_algorithm=algorithms.LookaheadPlanner(
+            time_budget=None, fallback=algorithms.RandomAlgorithm())),
+        20) is None
+    assert results_cache.key(dict(
+        config, moving_algorithm=algorithms.LookaheadPlanner(
+            time_budget=None)), 20) is not None
+    assert results_cache.key(dict(
+        config, moving_algorithm=algorithms.LookaheadPlanner()), 20,
+        seed=1) is None
+    trace.write_text('0, 1, 5\n')
+    assert results_cache.key(
+        dict(config, arrival_generator=algorithms.FileArrivals(
+            5, str(trace))), 20) != key
+
+    results_cache.max_bytes = 0
+    results_cache.run(config, 20)
+    assert list((tmp_path / 'cache').iterdir()) == []
+
+
+class _DenseArrivals(algorithms.ArrivalGenerator):
+    """An arrival generator that returns every floor, whether or not anyone
+    arrived on it; one person arrives on floor 2 in every round.
+    """
+    def generate(self, round_num: int) -> Dict[int, List[entities.Person]]:
+        """Refer to the Parent class
+        """
+        return {floor: [entities.Person(floor, 1)] if floor == 2 else []
+                for floor in range(1, self.max_floor + 1)}
+
+
+def test_sparse_arrivals(tmp_path) -> None:
+    """Test that generators only return the floors people arrived on, and
+    that FileArrivals keeps everyone who starts on the same floor.
+    """
+    trace = tmp_path / 'trace.csv'
+    trace.write_text('2, 3, 1, 3, 5\n0, 4, 1\n2, 1, 2\n')
+    arrivals = algorithms.FileArrivals(1000, str(trace))
+    assert arrivals.generate(1) == {}
+    people = arrivals.generate(2)
+    assert sorted(people) == [1, 3]
+    assert [(person.start, person.target) for person in people[3]] == \
+        [(3, 1), (3, 5)]
+    assert arrivals.generate(0)[4][0].target == 1
+
+    random_arrivals = algorithms.RandomArrivals(1000, 3)
+    people = random_arrivals.generate(0)
+    assert 1 <= len(people) <= 3
+    assert sum(map(len, people.values())) == 3
+
+    adapter = algorithms.SparseArrivals(_DenseArrivals(5, None))
+    assert list(adapter.generate(0)) == [2]
+
+
+def _trips(people: Dict[int, List[entities.Person]]) -> List[Tuple[int, int]]:
+    """Return the start and target floor of every person in people, the
+    arrivals of one round, in sorted order.
+    """
+    return sorted((person.start, person.target)
+                  for floor in people.values() for person in floor)
+
+
+def test_merged_arrivals(tmp_path) -> None:
+    """Test that sources are merged in round order, scaled and offset, and
+    start over when the generator is reset.
+    """
+    trace = tmp_path / 'badges.csv'
+    trace.write_text('0, 1, 4\n2, 2, 3, 2, 5\n5, 4, 1\n')
+    meetings = [(0, 1, 3), (1, 1, 3), (2, 1, 3), (3, 1, 3)]
+    background = algorithms.WeightedArrivals(
+        5, [algorithms.od_weights(5)], [1.0], seed=148)
+    expected = [background.draw(round_num) for round_num in range(6)]
+    merged = algorithms.MergedArrivals(
+        5, [algorithms.TraceTrips(str(trace)), meetings,
+            algorithms.GeneratedTrips(background, 6)],
+        scales=[2, 0.5, 1], offsets=[0, 1, 0])
+
+    rounds = []
+    for _ in range(2):
+        merged.reset()
+        rounds.append([_trips(merged.generate(round_num))
+                       for round_num in range(6)])
+    assert rounds[0] == rounds[1]
+    assert rounds[0][0] == sorted([(1, 4), (1, 4)] + expected[0])
+    assert rounds[0][1] == sorted(expected[1])
+    assert rounds[0][2] == sorted([(2, 3), (2, 3), (2, 5), (2, 5), (1, 3)] +
+                                  expected[2])
+    assert rounds[0][4] == sorted([(1, 3)] + expected[4])
+    assert rounds[0][5] == sorted([(4, 1), (4, 1)] + expected[5])
+
+    # Sources that run dry, or never have anyone arrive, end.
+    recorded = algorithms.GeneratedTrips(
+        algorithms.FileArrivals(5, str(trace)), 1000)
+    assert list(recorded) == [(0, 1, 4), (2, 2, 3), (2, 2, 5), (5, 4, 1)]
+    quiet = algorithms.MergedArrivals(5, [recorded, algorithms.GeneratedTrips(
+        algorithms.RandomArrivals(5, 0), 1000)])
+    assert [quiet.generate(round_num) for round_num in range(6, 2000)] == \
+        [{}] * 1994
+
+
+def test_trip_records() -> None:
+    """Test that every completed trip is recorded in the columns, and that
+    the trip times worked out from them add up to the simulation's results.
+    """
+    config = {
+        'num_floors': 6,
+        'num_elevators': 2,
+        'elevator_capacity': 3,
+        'num_people_per_round': 2,
+        'arrival_generator': algorithms.RandomArrivals(6, 2),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': False,
+        'record_trips': True
+    }
+    sim = simulation.Simulation(config)
+    sim.run(50)
+    records = sim.trip_records
+    assert len(records) == sim.results['people_completed'] > 0
+    assert records.nbytes() == 18 * len(records)
+    columns = records.columns
+    times = records.trip_times()
+    assert len(times) == len(records)
+    assert min(times) == sim.results['min_time']
+    assert sum(times) / len(times) == \
+        pytest.approx(sim.results['avg_time'])
+    for i in range(len(records)):
+        assert columns['arrival'][i] <= columns['boarding'][i] < \
+            columns['exit'][i]
+        assert columns['start'][i] != columns['target'][i]
+        assert columns['elevator'][i] in (0, 1)
+
+    pyarrow = pytest.importorskip('pyarrow')
+    table = records.to_arrow()
+    assert table.num_rows == len(records)
+    assert table.column('exit').type == pyarrow.uint32()
+
+
+def test_vector_env() -> None:
+    """Test that the environment steps every building with the given actions
+    and reports batched observations and rewards.
+    """
+    numpy = pytest.importorskip('numpy')
+    import env
+
+    configs = [{
+        'num_floors': 5,
+        'num_elevators': 2,
+        'elevator_capacity': 4,
+        'num_people_per_round': 1,
+        'arrival_generator': algorithms.RandomArrivals(5, 1),
+        'moving_algorithm': None,
+        'visualize': False
+    } for _ in range(3)]
+    vector_env = env.VectorElevatorEnv(configs, num_rounds=4)
+    observations = vector_env.reset(seed=148)
+    assert observations['floors'].shape == (3, 2)
+    assert observations['queues'].shape == (3, 5)
+    assert observations['floors'].tolist() == [[1, 1]] * 3
+
+    up_and_down = numpy.array([[1, -1]] * 3)
+    for _ in range(4):
+        observations, rewards, dones, info = vector_env.step(up_and_down)
+    assert observations['floors'].tolist() == [[5, 1]] * 3
+    assert dones.all()
+    assert (rewards == -(observations['loads'].sum(axis=1) +
+                         observations['queues'].sum(axis=1))).all()
+    assert info['people_completed'].shape == (3,)
+    assert vector_env.reset(seed=148)['queues'].sum() == 0
+
+
+def test_remote_visualizer() -> None:
+    """Test that a simulation shown by a renderer process runs every round,
+    skipping frames rather than waiting for the renderer.
+    """
+    config = {
+        'num_floors': 6,
+        'num_elevators': 2,
+        'elevator_capacity': 3,
+        'num_people_per_round': 2,
+        'arrival_generator': algorithms.RandomArrivals(6, 2),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': 'remote'
+    }
+    sim = simulation.Simulation(config)
+    try:
+        start = time.perf_counter()
+        stats = sim.run(300)
+        elapsed = time.perf_counter() - start
+    finally:
+        sim.visualizer.close()
+    assert stats['num_iterations'] == 300
+    # Drawing a frame takes at least a 60th of a second.
+    assert elapsed < 300 / 60
+    assert sim.visualizer.frames_skipped > 0
+    assert sim.visualizer.frames_sent >= 2
+
+
+def test_visualizer_viewport() -> None:
+    """Test that a tall building is shown through a viewport that only draws
+    its floors, and that crowds are drawn as a count badge.
+    """
+    import pygame
+    import visualizer
+
+    elevators = [entities.Elevator(4)]
+    vis = visualizer.Visualizer(elevators, 60, True)
+    assert pygame.display.get_surface().get_height() == \
+        (visualizer.MAX_VISIBLE_FLOORS * visualizer.FLOOR_HEIGHT +
+         visualizer.STAT_WINDOW_HEIGHT)
+    assert 1 in vis.visible_floors() and 40 not in vis.visible_floors()
+    drawn = vis.sprites_drawn
+
+    vis.show_arrivals({1: [entities.Person(1, 2) for _ in range(8)],
+                       40: [entities.Person(40, 1)]})
+    # The first person on floor 1 and their badge.
+    assert vis.sprites_drawn == drawn + 2
+
+    vis.scroll(39)
+    vis.render()
+    assert 40 in vis.visible_floors() and 1 not in vis.visible_floors()
+    vis.follow(0)
+    vis.render()
+    assert 1 in vis.visible_floors()
+    pygame.display.quit()
+
+
+def test_visualizer_forgets_exits() -> None:
+    """Test that people who reach their target floor are no longer drawn,
+    so a visualized run only draws who is still in the building.
+    """
+    import pygame
+    import sprites
+
+    random.seed(148)
+    config = {
+        'num_floors': 2,
+        'num_elevators': 1,
+        'elevator_capacity': 2,
+        'num_people_per_round': 1,
+        'arrival_generator': algorithms.RandomArrivals(2, 1),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': True
+    }
+    sim = simulation.Simulation(config)
+    for _ in range(4):
+        sim.step()
+    assert sim.results['people_completed'] > 0
+    shown = [sprite for sprite in sim.visualizer._sprite_group
+             if isinstance(sprite, sprites.PersonSprite)]
+    assert len(shown) == sum(len(elevator.passengers)
+                             for elevator in sim.elevators)
+    pygame.display.quit()
+
+
+def test_profiler(tmp_path) -> None:
+    """Test that a profiled run is sampled by stage, and that its collapsed
+    stacks and report are written.
+    """
+    profiler = profiling.Profiler(interval=0.001)
+    config = {
+        'num_floors': 10,
+        'num_elevators': 3,
+        'elevator_capacity': 4,
+        'num_people_per_round': 3,
+        'arrival_generator': algorithms.RandomArrivals(10, 3),
+        'moving_algorithm': algorithms.ShortSighted(),
+        'visualize': False,
+        'profile': profiler
+    }
+    simulation.Simulation(config).run(500)
+    assert profiler.samples
+    for stack in profiler.samples:
+        stage, root = stack.split(';')[:2]
+        assert stage[1:-1] in profiling.STAGES
+        assert root == 'simulation.py:Simulation.run'
+    assert profiler.stage_memory['arrivals'][1] > 0
+
+    profiler.write_collapsed(str(tmp_path / 'run.folded'))
+    lines = (tmp_path / 'run.folded').read_text().splitlines()
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == \
+        sum(profiler.samples.values())
+    profiler.write_report(str(tmp_path / 'report.txt'))
+    report = (tmp_path / 'report.txt').read_text()
+    assert 'simulation.py:Simulation._run_round' in report
+    assert 'Memory by stage' in report
+
+
+def test_table_policy(tmp_path) -> None:
+    """Test that a solved policy is stored and looked up, refuses a building
+    of another height, and gets people to their floors faster than
+    ShortSighted.
+    """
+    filename = str(tmp_path / 'six.policy')
+    policy.write_policy(filename, policy.solve_policy(6))
+    assert policy.read_policy(filename)['num_floors'] == 6
+
+    table = policy.TablePolicy(filename)
+    elevator = entities.Elevator(4)
+    elevator.current_floor = 3
+    waiting = {floor: [] for floor in range(1, 7)}
+    assert table.move_elevators([elevator], waiting, 6) == \
+        [algorithms.Direction.STAY]
+    waiting[1].append(entities.Person(1, 6))
+    assert table.move_elevators([elevator], waiting, 6) == \
+        [algorithms.Direction.DOWN]
+    assert elevator.current_floor == 2
+    with pytest.raises(ValueError):
+        table.move_elevators([elevator], waiting, 8)
+
+    times = []
+    for algorithm in [algorithms.ShortSighted(), table]:
+        random.seed(148)
+        config = {
+            'num_floors': 6,
+            'num_elevators': 2,
+            'elevator_capacity': 5,
+            'num_people_per_round': 2,
+            'arrival_generator': algorithms.RandomArrivals(6, 2),
+            'moving_algorithm': algorithm,
+            'visualize': False
+        }
+        times.append(Simulation(config).run(200)['avg_time'])
+    assert times[1] < times[0]
+
+
 if __name__ == '__main__':
     import pytest
     pytest.main(['test_simulation.py'])
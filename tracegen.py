@@ -0,0 +1,138 @@
+"""CSC148 Assignment 1 - Trace Generator
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains write_trace, which writes synthetic arrival traces in the
+CSV format that FileArrivals reads: one line per round with arrivals, holding
+the round number followed by the start and target floor of every person
+arriving in it, e.g.
+
+    12, 1, 4, 5, 3
+
+Arrivals are drawn by a WeightedArrivals generator, so the number of people in
+a round follows a (repeating) rate profile, and hotspot floors are more
+likely to be where trips start and end. The same seed always gives the same
+trace, and rounds are written a chunk at a time, so a trace of any length is
+written in bounded memory.
+
+It can also be run from the command line, e.g.
+
+    python tracegen.py rush_hour.csv --floors 50 --rounds 1000000
+        --rates 2,8,3 --rounds-per-rate 3600 --hotspot 1=20 --seed 148
+
+A trace can be written to standard output by giving '-' as its filename.
+pygame greets whoever imports it on standard output too, so set
+PYGAME_HIDE_SUPPORT_PROMPT=1 in the environment to keep the greeting out of
+the trace.
+"""
+from __future__ import annotations
+import argparse
+import sys
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from algorithms import WeightedArrivals, od_weights
+
+
+def write_trace(file: TextIO, num_floors: int, num_rounds: int,
+                rates: List[float], hotspots: Optional[Dict[int, float]] = None,
+                seed: Optional[int] = None, chunk_rounds: int = 4096) -> int:
+    """Write a trace of num_rounds rounds of arrivals in a building with
+    num_floors floors to file, and return the number of people in it.
+
+    rates is the mean number of arrivals in each round of the rate profile,
+    which repeats every len(rates) rounds. hotspots maps floors to how much
+    more likely trips are to start and end there than on other floors (see
+    od_weights). chunk_rounds rounds are formatted and written at a time.
+
+    Preconditions:
+        num_floors >= 2
+        rates != [] and every rate is >= 0
+        every hotspot weight is > 0
+        chunk_rounds >= 1
+    """
+    generator = WeightedArrivals(
+        num_floors, [od_weights(num_floors, hotspots, hotspots)], rates, seed)
+    num_people = 0
+    for first in range(0, num_rounds, chunk_rounds):
+        lines = []
+        for round_num in range(first, min(first + chunk_rounds, num_rounds)):
+            trips = generator.draw(round_num)
+            if not trips:
+                continue
+            num_people += len(trips)
+            fields = [str(round_num)]
+            for start, target in trips:
+                fields.append(str(start))
+                fields.append(str(target))
+            lines.append(', '.join(fields))
+            lines.append('\n')
+        file.write(''.join(lines))
+    return num_people
+
+
+def _parse_hotspot(text: str) -> Tuple[int, float]:
+    """Return the (floor, weight) pair of a FLOOR=WEIGHT argument."""
+    floor, _, weight = text.partition('=')
+    try:
+        return int(floor), float(weight) if weight else 10.0
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f'expected FLOOR=WEIGHT, got {text!r}') from None
+
+
+def main() -> None:
+    """Write a trace described on the command line."""
+    parser = argparse.ArgumentParser(
+        description='Write a synthetic arrival trace for FileArrivals.')
+    parser.add_argument('filename', help="the trace to write, or '-' for "
+                                         "standard output")
+    parser.add_argument('--floors', type=int, required=True)
+    parser.add_argument('--rounds', type=int, required=True)
+    parser.add_argument('--rates', default='1',
+                        help='comma-separated mean arrivals per round of the '
+                             'rate profile, which repeats (default: 1)')
+    parser.add_argument('--rounds-per-rate', type=int, default=1,
+                        help='the number of rounds each rate lasts')
+    parser.add_argument('--hotspot', type=_parse_hotspot, action='append',
+                        default=[], metavar='FLOOR=WEIGHT',
+                        help='make trips WEIGHT times more likely to start '
+                             'and end on FLOOR (default weight: 10); can be '
+                             'repeated')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rounds', type=int, default=4096)
+    args = parser.parse_args()
+
+    rates = [float(rate) for rate in args.rates.split(',')
+             for _ in range(args.rounds_per_rate)]
+    for floor, _ in args.hotspot:
+        if not 1 <= floor <= args.floors:
+            parser.error(f'hotspot floor {floor} is not in the building')
+
+    if args.filename == '-':
+        num_people = write_trace(sys.stdout, args.floors, args.rounds, rates,
+                                 dict(args.hotspot), args.seed,
+                                 args.chunk_rounds)
+    else:
+        with open(args.filename, 'w', buffering=1 << 20) as file:
+            num_people = write_trace(file, args.floors, args.rounds, rates,
+                                     dict(args.hotspot), args.seed,
+                                     args.chunk_rounds)
+    print(f'{num_people} people over {args.rounds} rounds', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
+
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-attributes': 12,
+        'allowed-io': ['main'],
+        'extra-imports': ['algorithms', 'argparse', 'sys'],
+        'max-nested-blocks': 4,
+        'disable': ['R0201']
+    })
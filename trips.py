@@ -0,0 +1,125 @@
+"""CSC148 Assignment 1 - Trip Records
+
+=== CSC148 Fall 2018 ===
+Department of Computer Science,
+University of Toronto
+
+=== Module Description ===
+
+This file contains TripRecords, which keeps one record for every person who
+reached their target floor in a simulation, in typed columns:
+
+    start       16-bit  the floor the person arrived on
+    target      16-bit  the floor they were going to
+    arrival     32-bit  the round they arrived in
+    boarding    32-bit  the round they first boarded an elevator
+    exit        32-bit  the round they left the elevator on their target floor
+    elevator    16-bit  the index of the elevator they left
+
+which is 18 bytes per trip. A trip's time (the total_time of the person when
+they reached their target floor) is not stored, since it is always their exit
+round minus their arrival round: trip_times works it out.
+
+A simulation keeps records when its config has 'record_trips' set, in its
+trip_records attribute. They can be exported as an Arrow table or a Parquet
+file for vectorized analysis, if pyarrow is installed:
+
+    sim.trip_records.write_parquet('rush_hour.parquet')
+"""
+from array import array
+import operator
+from typing import Any, Dict, List
+
+
+# The name and array type code of every column, in order.
+COLUMNS = (('start', 'H'), ('target', 'H'), ('arrival', 'I'),
+           ('boarding', 'I'), ('exit', 'I'), ('elevator', 'H'))
+
+# The Arrow type of each array type code.
+_ARROW_TYPES = {'H': 'uint16', 'I': 'uint32'}
+
+
+class TripRecords:
+    """The records of completed trips, one column per field.
+
+    === Attributes ===
+    columns: the array of values of every field, by name
+
+    === Representation Invariants ===
+    every column has the same length
+    """
+    columns: Dict[str, array]
+
+    def __init__(self) -> None:
+        """Initialize an empty set of records."""
+        self.columns = {name: array(code) for name, code in COLUMNS}
+
+    def append(self, start: int, target: int, arrival: int, boarding: int,
+               exit_round: int, elevator: int) -> None:
+        """Record one completed trip.
+
+        Preconditions:
+            1 <= start, target <= 65535
+            0 <= arrival <= boarding <= exit_round < 2 ** 32
+            0 <= elevator <= 65535
+        """
+        columns = self.columns
+        columns['start'].append(start)
+        columns['target'].append(target)
+        columns['arrival'].append(arrival)
+        columns['boarding'].append(boarding)
+        columns['exit'].append(exit_round)
+        columns['elevator'].append(elevator)
+
+    def __len__(self) -> int:
+        return len(self.columns['start'])
+
+    def trip_times(self) -> List[int]:
+        """Return the number of rounds every trip took, from arrival to exit,
+        in the order the trips were recorded.
+        """
+        return list(map(operator.sub, self.columns['exit'],
+                        self.columns['arrival']))
+
+    def nbytes(self) -> int:
+        """Return the number of bytes the records take up, not counting the
+        room the columns have left to grow into.
+        """
+        return sum(len(column) * column.itemsize
+                   for column in self.columns.values())
+
+    def to_arrow(self) -> Any:
+        """Return the records as a pyarrow Table with one column per field.
+
+        The table shares the memory of the columns rather than copying it, so
+        no more records should be appended while it is in use.
+        """
+        import pyarrow
+
+        arrays = []
+        for name, code in COLUMNS:
+            column = self.columns[name]
+            arrays.append(pyarrow.Array.from_buffers(
+                getattr(pyarrow, _ARROW_TYPES[code])(), len(column),
+                [None, pyarrow.py_buffer(column)]))
+        return pyarrow.Table.from_arrays(arrays,
+                                         names=[name for name, _ in COLUMNS])
+
+    def write_parquet(self, filename: str, **options: Any) -> None:
+        """Write the records to a Parquet file, passing any options on to
+        pyarrow.parquet.write_table (e.g. compression='zstd').
+        """
+        import pyarrow.parquet
+
+        pyarrow.parquet.write_table(self.to_arrow(), filename, **options)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-attributes': 12,
+        'extra-imports': ['array', 'operator', 'pyarrow', 'pyarrow.parquet'],
+        'max-nested-blocks': 4,
+        'disable': ['R0201']
+    })
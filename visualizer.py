@@ -16,7 +16,7 @@ and in fact you aren't even submitting this file!
 from __future__ import annotations
 import random
 import time
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import pygame
 from algorithms import Direction
@@ -35,11 +35,29 @@ FLOOR_BORDER_HEIGHT = 10  # The height of the border
 # FPS based on config speed
 FPS = 60
 
+# The most floors shown at once; taller buildings are shown through a
+# viewport that scrolls.
+MAX_VISIBLE_FLOORS = 8
+
+# The most people drawn waiting on a floor; when more are waiting, the first
+# of them is drawn with a badge showing how many there are.
+MAX_PEOPLE_SHOWN = 3
+
+# The number of floors a key press or mouse wheel step scrolls by.
+SCROLL_FLOORS = 1
+
 
 class Visualizer:
     """Visualizer for the current state of a simulation.
 
-    All attributes of this class are private; you are not responsible for
+    Buildings with more than MAX_VISIBLE_FLOORS floors are shown through a
+    viewport that only draws the floors in it. It follows an elevator (the
+    first one, to start with) until it is scrolled with the mouse wheel, the
+    arrow keys or Page Up/Page Down, or sent to the bottom or top floor with
+    Home or End; F follows the first elevator again.
+
+    All attributes of this class are private, except sprites_drawn, the
+    number of sprites drawn in the last frame; you are not responsible for
     understanding them, and they are left undocumented.
     """
     def __init__(self,
@@ -51,23 +69,38 @@ class Visualizer:
         If visualize is False, this instance does nothing.
         """
         self._visualize = visualize
+        self.sprites_drawn = 0
         if not self._visualize:
             return
 
         self._num_elevators = len(elevators)
         self._num_floors = num_floors
+        self._elevators = elevators
+
+        # The viewport starts at the bottom of the building, following the
+        # first elevator.
+        self._scroll = self._max_scroll()
+        self._following = 0 if elevators else None
 
         # pygame stuff
         pygame.init()
         self._clock = pygame.time.Clock()
 
         self._screen = pygame.display.set_mode(
-            (WIDTH, self._total_height()), pygame.HWSURFACE | pygame.DOUBLEBUF)
+            (WIDTH, self._screen_height()),
+            pygame.HWSURFACE | pygame.DOUBLEBUF)
         self._screen.fill(WHITE)
 
-        # Contains all sprites in the simulation
+        # Contains the elevators, their passengers and the people moving in
+        # or out of them. The floors and the people waiting on them are
+        # kept by floor, so that only the floors in the viewport are looked
+        # at.
         self._sprite_group = pygame.sprite.Group()
         self._stats_group = pygame.sprite.Group()
+        self._floor_sprites = {}
+        self._waiting = {floor: [] for floor in range(1, num_floors + 1)}
+        self._waiting_floor = {}
+        self._badges = {}
 
         self._setup_sprites(elevators)
         # Initial render.
@@ -79,15 +112,79 @@ class Visualizer:
             return
         self._stats_group.remove(list(self._stats_group))
         self._stats_group.add(sprites.StatLine(0, f'Round {round_num}'))
-        for sprite in self._sprite_group:
+        for sprite in self._sprites_in_view():
             if isinstance(sprite, sprites.PersonSprite):
                 sprite.image = sprite.load_image()
+        for floor in self.visible_floors():
+            for person in self._waiting[floor][:MAX_PEOPLE_SHOWN]:
+                person.image = person.load_image()
         self.render()
 
     def _total_height(self) -> int:
-        """Return the screen height for this visualization."""
+        """Return the height of the whole building, as if it were all on the
+        screen.
+        """
         return self._num_floors * FLOOR_HEIGHT + STAT_WINDOW_HEIGHT
 
+    def _screen_height(self) -> int:
+        """Return the screen height for this visualization."""
+        return min(self._num_floors, MAX_VISIBLE_FLOORS) * FLOOR_HEIGHT + \
+            STAT_WINDOW_HEIGHT
+
+    def _max_scroll(self) -> int:
+        """Return how far down the viewport can scroll, which is when the
+        bottom floor is at the bottom of the screen.
+        """
+        return self._total_height() - self._screen_height()
+
+    def visible_floors(self) -> range:
+        """Return the floors that are (at least partly) in the viewport."""
+        top = self._scroll + STAT_WINDOW_HEIGHT
+        bottom = self._scroll + self._screen_height()
+        lowest = max((self._total_height() - bottom) // FLOOR_HEIGHT, 1)
+        highest = min((self._total_height() - top) // FLOOR_HEIGHT + 1,
+                      self._num_floors)
+        return range(lowest, highest + 1)
+
+    def scroll(self, num_floors: int) -> None:
+        """Scroll the viewport up num_floors floors (or down, if negative),
+        and stop following an elevator.
+        """
+        if not self._visualize:
+            return
+        self._following = None
+        self._scroll_to(self._scroll - num_floors * FLOOR_HEIGHT)
+
+    def follow(self, elevator_index: Optional[int]) -> None:
+        """Keep the viewport centred on the elevator with the given index, or
+        stop following elevators if it is None.
+        """
+        if self._visualize:
+            self._following = elevator_index
+
+    def _scroll_to(self, scroll: int) -> None:
+        """Move the viewport so that it starts scroll pixels down the
+        building, or as close to that as it can go.
+        """
+        self._scroll = min(max(scroll, 0), self._max_scroll())
+
+    def _handle_events(self) -> None:
+        """Scroll the viewport for the key presses and mouse wheel steps
+        since the last frame.
+        """
+        keys = {pygame.K_UP: SCROLL_FLOORS, pygame.K_DOWN: -SCROLL_FLOORS,
+                pygame.K_PAGEUP: MAX_VISIBLE_FLOORS,
+                pygame.K_PAGEDOWN: -MAX_VISIBLE_FLOORS,
+                pygame.K_HOME: -self._num_floors,
+                pygame.K_END: self._num_floors}
+        for event in pygame.event.get([pygame.KEYDOWN, pygame.MOUSEWHEEL]):
+            if event.type == pygame.MOUSEWHEEL:
+                self.scroll(event.y * SCROLL_FLOORS)
+            elif event.key in keys:
+                self.scroll(keys[event.key])
+            elif event.key == pygame.K_f:
+                self.follow(0)
+
     def get_y_of_floor(self, floor: int) -> int:
         """Return the y-coordinate of the given floor."""
         assert self._num_floors >= floor >= 1, f'{self._num_floors}, {floor}'
@@ -105,17 +202,72 @@ class Visualizer:
 
         # Need this on OSX due to pygame bug
         pygame.event.peek(0)
+        self._handle_events()
+        if self._following is not None and \
+                self._following < len(self._elevators):
+            # Put the followed elevator in the middle of the viewport.
+            self._scroll_to(
+                self._elevators[self._following].rect.centery -
+                (STAT_WINDOW_HEIGHT + self._screen_height()) // 2)
 
         self._screen.fill(WHITE)
-        self._sprite_group.draw(self._screen)
+        view = pygame.Rect(0, STAT_WINDOW_HEIGHT, WIDTH,
+                           self._screen_height() - STAT_WINDOW_HEIGHT)
+        self.sprites_drawn = 0
+        for floor in self.visible_floors():
+            shown = list(self._floor_sprites[floor])
+            people = self._waiting[floor]
+            shown.extend(people[:1 if len(people) > MAX_PEOPLE_SHOWN
+                                else MAX_PEOPLE_SHOWN])
+            for sprite in shown:
+                self._draw(sprite.image, sprite.rect, view)
+            if len(people) > MAX_PEOPLE_SHOWN:
+                badge = self._badge(len(people))
+                self._draw(badge, badge.get_rect(
+                    left=people[0].rect.right + 5,
+                    centery=people[0].rect.centery), view)
+        for sprite in self._sprites_in_view():
+            self._draw(sprite.image, sprite.rect, view)
+
+        # Whatever is scrolled up past the floors is hidden by the stats.
+        self._screen.fill(WHITE, (0, 0, WIDTH, STAT_WINDOW_HEIGHT))
         self._stats_group.draw(self._screen)
         self._clock.tick(FPS)
         pygame.display.flip()
 
+    def _sprites_in_view(self) -> List[pygame.sprite.Sprite]:
+        """Return the elevators, passengers and people moving in or out of
+        elevators that are (at least partly) in the viewport.
+        """
+        view = pygame.Rect(0, self._scroll + STAT_WINDOW_HEIGHT, WIDTH,
+                           self._screen_height() - STAT_WINDOW_HEIGHT)
+        group = self._sprite_group.sprites()
+        return [group[i] for i in
+                view.collidelistall([sprite.rect for sprite in group])]
+
+    def _draw(self, image: pygame.Surface, rect: pygame.Rect,
+              view: pygame.Rect) -> None:
+        """Draw image where rect is in the building, if it is in the view."""
+        rect = rect.move(0, -self._scroll)
+        if rect.colliderect(view):
+            self._screen.blit(image, rect)
+            self.sprites_drawn += 1
+
+    def _badge(self, count: int) -> pygame.Surface:
+        """Return the image of a badge showing count people."""
+        if count not in self._badges:
+            self._badges[count] = sprites.COMIC_SANS.render(
+                f'x{count}', True, sprites.BLACK)
+        return self._badges[count]
+
     def show_arrivals(self,
                       arrivals: Dict[int, List[sprites.PersonSprite]]) -> None:
-        """Show new arrivals."""
-        if not self._visualize:
+        """Show new arrivals.
+
+        Only the floors in arrivals are looked at, and nothing is drawn if
+        nobody arrived.
+        """
+        if not self._visualize or not arrivals:
             return
 
         x = 10
@@ -124,7 +276,8 @@ class Visualizer:
             for person in people:
                 person.rect.bottom = y
                 person.rect.centerx = x + random.randint(-3, 3)
-                self._sprite_group.add(person)
+                self._waiting[floor].append(person)
+                self._waiting_floor[id(person)] = floor
         self.render()
 
     def show_boarding(self, person: sprites.PersonSprite,
@@ -136,6 +289,8 @@ class Visualizer:
         if not self._visualize:
             return
 
+        self._stop_waiting(person)
+        self._sprite_group.add(person)
         from_x = 10
         target_x = elevator.rect.centerx + random.randint(-3, 3)
 
@@ -183,6 +338,51 @@ class Visualizer:
 
             self.render()
 
+    def show_state(self, elevators: List['Elevator'],
+                   waiting: Dict[int, List[sprites.PersonSprite]]) -> None:
+        """Show the given state all at once, without animating.
+
+        Every person currently shown is removed. Then each elevator is put on
+        its current_floor with its passengers inside it, and the waiting
+        people are lined up on their floors.
+        """
+        if not self._visualize:
+            return
+
+        for sprite in self._sprite_group.sprites():
+            if isinstance(sprite, sprites.PersonSprite):
+                self._sprite_group.remove(sprite)
+        for people in self._waiting.values():
+            people.clear()
+        self._waiting_floor.clear()
+
+        for elevator in elevators:
+            elevator.rect.bottom = self.get_y_of_floor(elevator.current_floor)
+            elevator.update()
+            for passenger in elevator.passengers:
+                passenger.rect.bottom = elevator.rect.bottom
+                passenger.rect.centerx = \
+                    elevator.rect.centerx + random.randint(-3, 3)
+                self._sprite_group.add(passenger)
+
+        self.show_arrivals(waiting)
+
+    def remove_person(self, person: sprites.PersonSprite) -> None:
+        """Stop showing the given person."""
+        if not self._visualize:
+            return
+
+        self._sprite_group.remove(person)
+        self._stop_waiting(person)
+
+    def _stop_waiting(self, person: sprites.PersonSprite) -> None:
+        """Stop showing the given person waiting on their floor, if they
+        are.
+        """
+        floor = self._waiting_floor.pop(id(person), None)
+        if floor is not None:
+            self._waiting[floor].remove(person)
+
     def wait(self, wait_time: int) -> None:
         """Wait for the specified amount of time, in seconds.
 
@@ -203,13 +403,12 @@ class Visualizer:
             y = self.get_y_of_floor(i)
             floor = sprites.FloorSprite(WIDTH, FLOOR_HEIGHT, y)
             floor_num = sprites.FloorNum(y - 20, str(i))
-            self._sprite_group.add(floor_num)
-            self._sprite_group.add(floor)
+            self._floor_sprites[i] = (floor_num, floor)
 
         for i, elevator in enumerate(elevators):
             elevator.rect.centerx =\
                 (i + 1) * WIDTH // (self._num_elevators + 1)
-            elevator.rect.bottom = self._total_height() - FLOOR_BORDER_HEIGHT
+            elevator.rect.bottom = self.get_y_of_floor(elevator.current_floor)
 
             self._sprite_group.add(elevator)
 